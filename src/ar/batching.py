@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    def __init__(self, visual_recognition, max_batch_size=8, max_wait_ms=10.0, max_pending=64, **detect_kwargs):
+        """
+        Gathers frames submitted by several camera streams into batches and runs
+        one VisualRecognition.detect_batch call per batch on a worker thread.
+        A batch is dispatched as soon as it is full or the oldest frame in it has
+        waited max_wait_ms.
+
+        Args:
+            visual_recognition (VisualRecognition): The detector.
+            max_batch_size (int): Maximum frames per forward pass.
+            max_wait_ms (float): Maximum time a frame waits for the batch to fill.
+            max_pending (int): Queue bound; submit() blocks once this many frames are waiting.
+            **detect_kwargs: Forwarded to detect_batch (thresholds, class_aware).
+        """
+        self.visual_recognition = visual_recognition
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.detect_kwargs = detect_kwargs
+        self.batches = 0
+        self.frames = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, stream_id, frame):
+        """
+        Queue a frame from one stream for detection.
+
+        Args:
+            stream_id: Identifier of the camera stream the frame belongs to.
+            frame (numpy.ndarray): The image frame.
+
+        Returns:
+            concurrent.futures.Future: Resolves to (stream_id, detected_objects).
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is closed.")
+            self._pending.put((stream_id, frame, future))
+        return future
+
+    def detect(self, frames_by_stream, timeout=None):
+        """
+        Convenience wrapper: submit one frame per stream and wait for all results.
+
+        Args:
+            frames_by_stream (dict): Mapping of stream_id to frame.
+
+        Returns:
+            dict: Mapping of stream_id to its detected objects.
+        """
+        futures = [self.submit(stream_id, frame) for stream_id, frame in frames_by_stream.items()]
+        return dict(future.result(timeout) for future in futures)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': self.frames / self.batches if self.batches else 0.0,
+        }
+
+    def close(self, timeout=1.0):
+        """
+        Stop the worker. The batch in flight completes; frames still waiting are
+        cancelled, so their futures raise CancelledError instead of never resolving.
+        """
+        with self._lock:
+            self._closed = True
+        self._stop.set()
+        self._worker.join(timeout)
+        while True:
+            try:
+                _, _, future = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+
+    def _next_batch(self):
+        # Block for the first frame, then keep collecting until full or its deadline passes
+        try:
+            batch = [self._pending.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            frames = [frame for _, frame, _ in batch]
+            try:
+                results = self.visual_recognition.detect_batch(frames, **self.detect_kwargs)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for (stream_id, _, future), detected_objects in zip(batch, results):
+                future.set_result((stream_id, detected_objects))
@@ -0,0 +1,116 @@
+import numpy as np
+from geopy.distance import geodesic
+
+EARTH_RADIUS_KM = 6371.0088  # IUGG mean Earth radius
+
+# WGS-84 ellipsoid
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1 - WGS84_F)
+
+# Accuracy modes for the bulk distance functions:
+#   'haversine': spherical great-circle distance. Fast; relative error versus the
+#                WGS-84 geodesic is at most about 0.56% (worst for north-south lines
+#                near the poles/equator), i.e. under 6 m per km.
+#   'vincenty':  Vincenty's inverse formula on WGS-84, iterated in batch. Agrees with
+#                geopy's geodesic to well under a millimeter; the rare nearly antipodal
+#                pairs where the iteration does not converge fall back to geodesic.
+DISTANCE_MODES = ('haversine', 'vincenty')
+
+
+def haversine_km(lat, lon, lats, lons):
+    """
+    Great-circle distance in kilometers between broadcastable arrays of points (degrees).
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2, tolerance=1e-12, max_iterations=200):
+    """
+    Ellipsoidal (WGS-84) distance in kilometers between broadcastable arrays of
+    points (degrees), using Vincenty's inverse formula iterated for all pairs at once.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)))
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_U1, cos_U1, sin_U2, cos_U2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_U2 * sin_lam, cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam)
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma > 0, cos_U1 * cos_U2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0 and no defined cos(2 sigma_m)
+            cos_2sigma_m = np.where(cos2_alpha > 0, cos_sigma - 2 * sin_U1 * sin_U2 / cos2_alpha, 0.0)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam_next - lam) < tolerance
+            lam = np.where(converged, lam, lam_next)
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A_KM ** 2 - WGS84_B_KM ** 2) / WGS84_B_KM ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = WGS84_B_KM * A * (sigma - delta_sigma)
+
+    distance = np.where(sin_sigma == 0, 0.0, distance)
+    # Nearly antipodal pairs may not converge; geopy's geodesic (Karney) handles them
+    for index in map(tuple, np.argwhere(~converged | ~np.isfinite(distance))):
+        distance[index] = geodesic((lat1[index], lon1[index]), (lat2[index], lon2[index])).kilometers
+    return distance
+
+
+def _pairwise(lat1, lon1, lat2, lon2, mode):
+    if mode == 'haversine':
+        return haversine_km(lat1, lon1, lat2, lon2)
+    if mode == 'vincenty':
+        return vincenty_km(lat1, lon1, lat2, lon2)
+    raise ValueError(f"Unknown distance mode '{mode}'. Choose from {DISTANCE_MODES}.")
+
+
+def distances_km(origin, points, mode='haversine'):
+    """
+    One-to-many distances.
+
+    Args:
+        origin (tuple): (latitude, longitude) in degrees.
+        points: (N, 2) array-like of (latitude, longitude) in degrees.
+        mode (str): 'haversine' (fast) or 'vincenty' (ellipsoidal); see DISTANCE_MODES.
+
+    Returns:
+        numpy.ndarray: Distances in kilometers, shape (N,).
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return _pairwise(origin[0], origin[1], points[:, 0], points[:, 1], mode)
+
+
+def distance_matrix_km(points_a, points_b, mode='haversine'):
+    """
+    Many-to-many distances.
+
+    Args:
+        points_a: (M, 2) array-like of (latitude, longitude) in degrees.
+        points_b: (N, 2) array-like of (latitude, longitude) in degrees.
+        mode (str): 'haversine' (fast) or 'vincenty' (ellipsoidal); see DISTANCE_MODES.
+
+    Returns:
+        numpy.ndarray: Distances in kilometers, shape (M, N).
+    """
+    a = np.asarray(points_a, dtype=float).reshape(-1, 2)
+    b = np.asarray(points_b, dtype=float).reshape(-1, 2)
+    return _pairwise(a[:, None, 0], a[:, None, 1], b[None, :, 0], b[None, :, 1], mode)
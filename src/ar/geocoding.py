@@ -0,0 +1,227 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ar.landmarks import LandmarkStore
+from nlp.cache import TTLCache, canonical_key
+
+# Cached for cells the backend has no address for, so empty areas are not requested
+# again on every fix; a string (unlike an object() sentinel) survives the SQLite tier
+NO_ADDRESS = ''
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        """
+        Thread-safe token bucket: at most `burst` calls at once, refilled at `rate`
+        calls per second. Callers reserve a token under the lock and sleep outside it,
+        so concurrent callers queue up at the right spacing.
+
+        Args:
+            rate (float): Sustained calls per second; None disables limiting.
+            burst (int): Bucket size.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a call is allowed.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class NominatimBackend:
+    def __init__(self, user_agent="ar-navigation", timeout=5, language='en', **geocoder_kwargs):
+        """
+        Online backend using OpenStreetMap's Nominatim service. A single geolocator is
+        shared by all lookups, so its HTTP session keeps connections pooled.
+        """
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout, **geocoder_kwargs)
+        self.language = language
+
+    def reverse(self, location):
+        address = self.geolocator.reverse(location, language=self.language)
+        return address.address if address is not None else None
+
+
+class OfflineBackend:
+    def __init__(self, store, max_distance_km=0.25):
+        """
+        Offline backend answering from a local address/POI dataset: the address of a
+        location is the name of the nearest entry within max_distance_km.
+
+        Args:
+            store (LandmarkStore): Spatial index of addresses (names are the addresses).
+            max_distance_km (float): Beyond this distance the location has no address.
+        """
+        self.store = store
+        self.max_distance_km = max_distance_km
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        # A LandmarkStore index directory or a CSV/GeoJSON/Parquet file with a name column
+        store = LandmarkStore.load(path) if os.path.isdir(path) else LandmarkStore.from_file(path)
+        return cls(store, **kwargs)
+
+    def reverse(self, location):
+        indices, distances = self.store.nearest(location, k=1)
+        if len(indices) == 0 or distances[0] > self.max_distance_km:
+            return None
+        return self.store.name(indices[0])
+
+
+class ReverseGeocoder:
+    def __init__(self, backend, precision=4, cache_entries=4096, cache_ttl=30 * 24 * 3600, cache_path=None,
+                 negative_ttl=24 * 3600, rate_limit=1.0, burst=1, max_concurrency=4, retries=2, retry_backoff=1.0):
+        """
+        Reverse geocoding with a coordinate-quantized cache in front of a backend.
+        Locations are rounded to `precision` decimal places (4 is about 11 m) so nearby
+        fixes share one cache entry and one backend request. The in-memory LRU is
+        backed by an optional SQLite tier that survives restarts.
+
+        Args:
+            backend: Object with reverse((lat, lon)) -> address or None
+                (NominatimBackend, OfflineBackend).
+            precision (int): Decimal places coordinates are rounded to.
+            cache_entries (int): In-memory cache size.
+            cache_ttl (float): Seconds before a cached address is looked up again.
+            cache_path (str): Optional SQLite file for the persistent tier.
+            negative_ttl (float): Seconds before a location without an address is looked
+                up again; shorter than cache_ttl since map data gains new addresses.
+            rate_limit (float): Maximum backend requests per second (None disables).
+                Nominatim's usage policy allows one per second.
+            burst (int): Requests allowed back to back before rate limiting kicks in.
+            max_concurrency (int): Concurrent backend requests for batch lookups.
+            retries (int): Extra attempts after a failed request.
+            retry_backoff (float): Seconds before the first retry, doubling after each.
+        """
+        self.backend = backend
+        self.precision = precision
+        self.cache = TTLCache(max_entries=cache_entries, ttl=cache_ttl, path=cache_path)
+        self.negative_ttl = negative_ttl
+        self.limiter = RateLimiter(rate_limit, burst)
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="geocoder")
+
+    def quantize(self, location):
+        return round(float(location[0]), self.precision), round(float(location[1]), self.precision)
+
+    def cache_key(self, location):
+        return canonical_key('reverse', *self.quantize(location))
+
+    def cached(self, location):
+        """
+        Cached address for the location, or None without contacting the backend.
+        """
+        return self._cached(self.quantize(location)) or None
+
+    def reverse(self, location):
+        """
+        Convert GPS coordinates into a human-readable address.
+
+        Args:
+            location (tuple): (latitude, longitude).
+
+        Returns:
+            str: The address, or None if there is none or every attempt failed.
+        """
+        cell = self.quantize(location)
+        address = self._cached(cell)
+        if address is None:
+            address = self._lookup(cell)
+        return address or None
+
+    async def reverse_many(self, locations):
+        """
+        Look up many locations concurrently. Cache hits are answered immediately,
+        duplicate cells are requested once, and misses go to the backend on a thread
+        pool, at most max_concurrency at a time and within the rate limit.
+
+        Args:
+            locations (list): (latitude, longitude) tuples.
+
+        Returns:
+            list: Addresses (or None) in the order of locations.
+        """
+        loop = asyncio.get_running_loop()
+        cells = [self.quantize(location) for location in locations]
+        results = {cell: self._cached(cell) for cell in set(cells)}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(cell):
+            async with semaphore:
+                results[cell] = await loop.run_in_executor(self._executor, self._lookup, cell)
+
+        await asyncio.gather(*(fetch(cell) for cell, address in results.items() if address is None))
+        return [results[cell] or None for cell in cells]
+
+    def reverse_batch(self, locations):
+        # Synchronous wrapper around reverse_many() for callers without an event loop
+        return asyncio.run(self.reverse_many(locations))
+
+    def stats(self):
+        with self._lock:
+            stats = self.cache.stats()
+        stats.update(requests=self.requests, failures=self.failures)
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.cache.close()
+
+    def _cached(self, cell):
+        # NO_ADDRESS for a cell known to have no address, None if it is not cached
+        with self._lock:
+            return self.cache.get(canonical_key('reverse', *cell))
+
+    def _lookup(self, cell):
+        # Backend request with rate limiting and exponential backoff; failures are not
+        # cached, locations without an address are (for negative_ttl)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            with self._lock:
+                self.requests += 1
+            try:
+                address = self.backend.reverse(cell)
+            except Exception as e:
+                if attempt == self.retries:
+                    with self._lock:
+                        self.failures += 1
+                    print(f"Error in reverse geocoding: {e}")
+                    return None
+                time.sleep(self.retry_backoff * 2 ** attempt)
+                continue
+            with self._lock:
+                if address is None:
+                    self.cache.put(canonical_key('reverse', *cell), NO_ADDRESS, ttl=self.negative_ttl)
+                else:
+                    self.cache.put(canonical_key('reverse', *cell), address)
+            return address
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+from ar.distance import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+_LAT_COLUMNS = ('lat', 'latitude')
+_LON_COLUMNS = ('lon', 'lng', 'long', 'longitude')
+
+
+def _pick_column(columns, candidates, path):
+    for column in columns:
+        if column.lower() in candidates:
+            return column
+    raise ValueError(f"{path}: no column named any of {candidates}.")
+
+
+def read_landmarks(path):
+    """
+    Read landmark names and coordinates from a CSV, GeoJSON or Parquet file.
+
+    CSV and Parquet files need a ``name`` column plus latitude/longitude columns
+    (lat/latitude, lon/lng/longitude); GeoJSON needs Point features with a
+    ``name`` property.
+
+    Returns:
+        tuple: (names, coordinates) with coordinates an (N, 2) array of (lat, lon).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.geojson', '.json'):
+        with open(path, 'r') as f:
+            features = json.load(f)['features']
+        points = [f for f in features if f.get('geometry') and f['geometry']['type'] == 'Point']
+        names = [f['properties'].get('name', '') for f in points]
+        coordinates = [(f['geometry']['coordinates'][1], f['geometry']['coordinates'][0]) for f in points]
+        return names, np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if extension == '.parquet':
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("Reading Parquet landmark files requires pandas and pyarrow.")
+        frame = pd.read_parquet(path)
+        lat = _pick_column(frame.columns, _LAT_COLUMNS, path)
+        lon = _pick_column(frame.columns, _LON_COLUMNS, path)
+        return frame['name'].astype(str).tolist(), frame[[lat, lon]].to_numpy(dtype=np.float64)
+    with open(path, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        lat = _pick_column(reader.fieldnames, _LAT_COLUMNS, path)
+        lon = _pick_column(reader.fieldnames, _LON_COLUMNS, path)
+        rows = list(reader)
+    names = [row['name'] for row in rows]
+    coordinates = np.array([(float(row[lat]), float(row[lon])) for row in rows], dtype=np.float64)
+    return names, coordinates.reshape(-1, 2)
+
+
+class LandmarkStore:
+    def __init__(self, coordinates, name_offsets, name_bytes, cell_keys, cell_starts, cell_deg):
+        """
+        Landmark coordinates bucketed into a regular lat/lon grid (a fixed-precision
+        geohash). Points are sorted by cell so every cell is a contiguous slice; radius
+        and k-nearest queries only compute haversine distances for points in the
+        handful of cells overlapping the search circle.
+
+        Use LandmarkStore.build() to index in memory, save()/load() for the offline,
+        memory-mapped form.
+        """
+        self.coordinates = coordinates
+        self.name_offsets = name_offsets
+        self.name_bytes = name_bytes
+        self.cell_keys = cell_keys
+        self.cell_starts = cell_starts
+        self.cell_deg = cell_deg
+        self.num_lon_cells = int(math.ceil(360.0 / cell_deg))
+        self.num_lat_cells = int(math.ceil(180.0 / cell_deg))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @classmethod
+    def build(cls, names, coordinates, cell_deg=0.01):
+        """
+        Index landmarks in memory.
+
+        Args:
+            names (list): Landmark names.
+            coordinates: (N, 2) array-like of (latitude, longitude) in degrees.
+            cell_deg (float): Grid cell size in degrees (0.01 is about 1.1 km of latitude).
+
+        Returns:
+            LandmarkStore: The indexed store.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        store = cls(coordinates, None, None, None, None, cell_deg)
+        keys = store._cell_key(store._lat_index(coordinates[:, 0]), store._lon_index(coordinates[:, 1]))
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+
+        encoded = [names[i].encode('utf-8') for i in order]
+        store.coordinates = coordinates[order]
+        store.name_offsets = np.concatenate([[0], np.cumsum([len(b) for b in encoded])]).astype(np.int64)
+        store.name_bytes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        store.cell_keys, first = np.unique(keys, return_index=True)
+        store.cell_starts = np.append(first, len(keys)).astype(np.int64)
+        return store
+
+    @classmethod
+    def from_file(cls, path, cell_deg=0.01):
+        # Build an index straight from a CSV/GeoJSON/Parquet landmark file
+        names, coordinates = read_landmarks(path)
+        return cls.build(names, coordinates, cell_deg)
+
+    def save(self, directory):
+        """
+        Write the index as plain .npy files that load() can memory-map.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ('coordinates', 'name_offsets', 'name_bytes', 'cell_keys', 'cell_starts'):
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'cell_deg': self.cell_deg, 'count': len(self)}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Open an index written by save(); with mmap, arrays are paged in on demand,
+        so startup cost does not grow with the dataset.
+        """
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+                  for name in ('coordinates', 'name_offsets', 'name_bytes', 'cell_keys', 'cell_starts')}
+        return cls(cell_deg=meta['cell_deg'], **arrays)
+
+    def name(self, index):
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return bytes(self.name_bytes[start:end]).decode('utf-8')
+
+    def names(self, indices):
+        return [self.name(i) for i in indices]
+
+    def query_radius(self, location, radius_km):
+        """
+        Find all landmarks within radius_km of location.
+
+        Args:
+            location (tuple): (latitude, longitude) in degrees.
+            radius_km (float): Search radius in kilometers.
+
+        Returns:
+            tuple: (indices, distances_km), sorted by increasing distance.
+        """
+        lat, lon = location
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.coordinates[candidates, 0], self.coordinates[candidates, 1])
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    def nearest(self, location, k=5, initial_radius_km=None):
+        """
+        Find the k nearest landmarks to location by searching ever larger radii.
+
+        Returns:
+            tuple: (indices, distances_km) of at most k landmarks, nearest first.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        radius = initial_radius_km or self.cell_deg * KM_PER_DEGREE
+        while True:
+            indices, distances = self.query_radius(location, radius)
+            if len(indices) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return indices[:k], distances[:k]
+            radius *= 2
+
+    def _lat_index(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0) / self.cell_deg), 0, self.num_lat_cells - 1).astype(np.int64)
+
+    def _lon_index(self, lon):
+        return (np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64)) % self.num_lon_cells
+
+    def _cell_key(self, lat_index, lon_index):
+        return lat_index * self.num_lon_cells + lon_index
+
+    def _candidates(self, lat, lon, radius_km):
+        # Indices of points in every grid cell overlapping the search circle's bounding box
+        lat_span = radius_km / KM_PER_DEGREE
+        lat_first, lat_last = self._lat_index(lat - lat_span), self._lat_index(lat + lat_span)
+        # Longitude degrees shrink with latitude; take the widest row in range
+        max_lat = min(abs(lat) + lat_span, 90.0)
+        cos_lat = math.cos(math.radians(max_lat))
+        lon_span = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        if lon_span >= 180.0:
+            lon_cols = np.arange(self.num_lon_cells)
+        else:
+            first = int(self._lon_index(lon - lon_span))
+            count = int(math.ceil(2 * lon_span / self.cell_deg)) + 2
+            lon_cols = np.unique((first + np.arange(count)) % self.num_lon_cells)
+
+        num_cells = (lat_last - lat_first + 1) * len(lon_cols)
+        if num_cells > len(self.cell_keys):
+            # Wide searches: cheaper to test every occupied cell than to enumerate the box
+            lat_index, lon_index = np.divmod(np.asarray(self.cell_keys), self.num_lon_cells)
+            in_box = (lat_index >= lat_first) & (lat_index <= lat_last) & np.isin(lon_index, lon_cols)
+            present = np.nonzero(in_box)[0]
+        else:
+            lat_rows = np.arange(lat_first, lat_last + 1)
+            keys = self._cell_key(lat_rows[:, None], lon_cols[None, :]).reshape(-1)
+            positions = np.searchsorted(self.cell_keys, keys)
+            valid = positions < len(self.cell_keys)
+            positions, keys = positions[valid], keys[valid]
+            present = np.unique(positions[self.cell_keys[positions] == keys])
+
+        # Concatenate the per-cell slices without a Python loop
+        starts = self.cell_starts[present]
+        lengths = self.cell_starts[present + 1] - starts
+        shifts = starts - np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        return np.repeat(shifts, lengths) + np.arange(lengths.sum())
+
+
+# Example usage: build the offline index once, then memory-map it at startup
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a memory-mappable landmark index.")
+    parser.add_argument('source', help="CSV, GeoJSON or Parquet file of landmarks.")
+    parser.add_argument('output', help="Directory to write the index to.")
+    parser.add_argument('--cell-deg', type=float, default=0.01)
+    args = parser.parse_args()
+
+    store = LandmarkStore.from_file(args.source, args.cell_deg)
+    store.save(args.output)
+    print(f"Indexed {len(store)} landmarks into {len(store.cell_keys)} cells at {args.output}")
@@ -0,0 +1,205 @@
+import os
+
+import geopy
+from geopy.distance import geodesic
+
+from ar.distance import distance_matrix_km, distances_km
+from ar.geocoding import NominatimBackend, OfflineBackend, ReverseGeocoder
+from ar.landmarks import LandmarkStore
+from metrics import REGISTRY
+
+# Used when no landmark dataset is configured (local testing)
+SIMULATED_LANDMARKS = [
+    {"name": "Empire State Building", "coordinates": (40.748817, -73.985428)},
+    {"name": "Times Square", "coordinates": (40.758896, -73.985130)},
+    {"name": "Bryant Park", "coordinates": (40.753597, -73.983233)}
+]
+
+class SpatialRecognition:
+    def __init__(self, landmarks_path=None, addresses_path=None, geocode_cache_path=None, geocoder=None,
+                 location_source=None):
+        """
+        Initialize the spatial recognition module using geopy for handling GPS data
+        and location-based queries.
+
+        Args:
+            landmarks_path (str): Landmark index directory written by LandmarkStore.save()
+                (memory-mapped), or a CSV/GeoJSON/Parquet file to index at startup.
+                Defaults to a small simulated set of NYC landmarks.
+            addresses_path (str): Local address/POI dataset (same formats as landmarks_path)
+                for fully offline reverse geocoding. Defaults to OpenStreetMap's Nominatim.
+            geocode_cache_path (str): SQLite file persisting reverse geocoding results.
+            geocoder (ReverseGeocoder): Use this geocoder instead of building one.
+            location_source (callable): Returns the current (latitude, longitude), e.g.
+                session.ReplaySource.get_location; defaults to the simulated location.
+        """
+        if geocoder is None:
+            if addresses_path is not None:
+                # Offline lookups are local, so they need no rate limit
+                geocoder = ReverseGeocoder(OfflineBackend.from_path(addresses_path), rate_limit=None,
+                                           cache_path=geocode_cache_path)
+            else:
+                geocoder = ReverseGeocoder(NominatimBackend(user_agent="ar-navigation"),
+                                           cache_path=geocode_cache_path)
+        self.geocoder = geocoder
+        self.location_source = location_source
+        self.current_location = None
+
+        if landmarks_path is None:
+            self.landmarks = LandmarkStore.build(
+                [landmark["name"] for landmark in SIMULATED_LANDMARKS],
+                [landmark["coordinates"] for landmark in SIMULATED_LANDMARKS]
+            )
+        elif os.path.isdir(landmarks_path):
+            self.landmarks = LandmarkStore.load(landmarks_path)
+        else:
+            self.landmarks = LandmarkStore.from_file(landmarks_path)
+
+    def get_location(self):
+        """
+        Get the current GPS location of the user (latitude, longitude).
+        For local testing, we'll simulate this, but this can be replaced with actual
+        GPS data collection for mobile devices.
+
+        Returns:
+            tuple: (latitude, longitude) representing the user's current location.
+        """
+        if self.location_source is not None:
+            # Before the source has its first fix, fall through to the simulated location
+            location = self.location_source()
+            if location is not None:
+                self.current_location = tuple(location)
+                return self.current_location
+        # Simulate location for local testing
+        # Replace this with actual GPS coordinates when integrating with a real device
+        # e.g., using Android's `location` package or iOS's CoreLocation framework
+        self.current_location = (40.748817, -73.985428)  # Simulating NYC, Empire State Building
+        return self.current_location
+
+    def reverse_geocode(self, location):
+        """
+        Convert GPS coordinates into a human-readable address.
+
+        Args:
+            location (tuple): A tuple (latitude, longitude) representing the GPS location.
+        
+        Returns:
+            str: A human-readable address corresponding to the location.
+        """
+        # Cached per ~11 m cell, rate limited and retried; None if every attempt failed
+        with REGISTRY.timer('reverse_geocode'):
+            return self.geocoder.reverse(location)
+
+    def reverse_geocode_many(self, locations):
+        """
+        Convert many GPS coordinates into addresses with concurrent backend requests.
+        From async code, await self.geocoder.reverse_many(locations) instead.
+
+        Args:
+            locations (list): (latitude, longitude) tuples.
+
+        Returns:
+            list: Addresses (or None) in the order of locations.
+        """
+        return self.geocoder.reverse_batch(locations)
+
+    def get_nearby_landmarks(self, location, radius_km=1.0, with_distances=False):
+        """
+        Search for nearby landmarks or points of interest (POIs) around the current location
+        using the spatial index of the landmark store. Distances are great-circle
+        (haversine) distances, within about 0.5% of the geodesic distance.
+
+        Args:
+            location (tuple): The current GPS coordinates (latitude, longitude).
+            radius_km (float): The search radius around the location in kilometers.
+            with_distances (bool): Return (name, distance_km) pairs instead of names.
+        
+        Returns:
+            list: Nearby landmark names (or (name, distance_km) pairs), nearest first.
+        """
+        with REGISTRY.timer('get_nearby_landmarks'):
+            indices, distances = self.landmarks.query_radius(location, radius_km)
+            names = self.landmarks.names(indices)
+        if with_distances:
+            return list(zip(names, distances.tolist()))
+        return names
+
+    def get_nearest_landmarks(self, location, k=5):
+        """
+        Find the k landmarks closest to the location, whatever their distance.
+
+        Args:
+            location (tuple): The current GPS coordinates (latitude, longitude).
+            k (int): Number of landmarks to return.
+
+        Returns:
+            list: (name, distance_km) pairs, nearest first.
+        """
+        indices, distances = self.landmarks.nearest(location, k)
+        return list(zip(self.landmarks.names(indices), distances.tolist()))
+
+    def calculate_distance(self, loc1, loc2):
+        """
+        Calculate the geodesic distance between two points.
+
+        Args:
+            loc1 (tuple): First GPS location (latitude, longitude).
+            loc2 (tuple): Second GPS location (latitude, longitude).
+        
+        Returns:
+            float: The distance between the two locations in kilometers.
+        """
+        return geodesic(loc1, loc2).kilometers
+
+    def calculate_distances(self, origin, points, mode='haversine'):
+        """
+        Calculate distances from one point to many in a single vectorized pass.
+
+        Args:
+            origin (tuple): GPS location (latitude, longitude).
+            points: (N, 2) array-like of (latitude, longitude).
+            mode (str): 'haversine' (spherical, within about 0.56% of the geodesic) or
+                'vincenty' (WGS-84 ellipsoid, sub-millimeter agreement with geodesic).
+
+        Returns:
+            numpy.ndarray: Distances in kilometers, shape (N,).
+        """
+        return distances_km(origin, points, mode)
+
+    def calculate_distance_matrix(self, points_a, points_b, mode='haversine'):
+        """
+        Calculate all pairwise distances between two sets of points.
+
+        Args:
+            points_a: (M, 2) array-like of (latitude, longitude).
+            points_b: (N, 2) array-like of (latitude, longitude).
+            mode (str): 'haversine' or 'vincenty'; see calculate_distances().
+
+        Returns:
+            numpy.ndarray: Distances in kilometers, shape (M, N).
+        """
+        return distance_matrix_km(points_a, points_b, mode)
+
+
+# Example usage
+if __name__ == "__main__":
+    # Initialize the spatial recognition module
+    spatial_recognition = SpatialRecognition()
+
+    # Get the current location (simulated for now)
+    current_location = spatial_recognition.get_location()
+    print(f"Current Location (latitude, longitude): {current_location}")
+
+    # Reverse geocode to get the address
+    address = spatial_recognition.reverse_geocode(current_location)
+    print(f"Current Address: {address}")
+
+    # Get nearby landmarks within a 1 km radius
+    nearby_landmarks = spatial_recognition.get_nearby_landmarks(current_location, radius_km=1.0)
+    print(f"Nearby Landmarks: {nearby_landmarks}")
+
+    # Calculate distance between two points (e.g., current location and Times Square)
+    times_square_coords = (40.758896, -73.985130)
+    distance_to_times_square = spatial_recognition.calculate_distance(current_location, times_square_coords)
+    print(f"Distance to Times Square: {distance_to_times_square:.2f} km")
+
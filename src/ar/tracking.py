@@ -0,0 +1,231 @@
+import itertools
+import math
+import time
+
+import cv2
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise intersection-over-union of two sets of (x, y, w, h) boxes.
+
+    Returns:
+        numpy.ndarray: Array of shape (len(boxes_a), len(boxes_b)).
+    """
+    a = np.asarray(boxes_a, dtype=float).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=float).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold=0.3, max_misses=2, use_optical_flow=False):
+        """
+        Lightweight multi-object tracker. Keyframe detections are associated with
+        existing tracks by IoU (same label only) so boxes keep stable IDs; between
+        keyframes boxes are carried forward by constant velocity or, optionally,
+        by sparse Lucas-Kanade optical flow.
+
+        Args:
+            iou_threshold (float): Minimum IoU for a detection to continue a track.
+            max_misses (int): Keyframes a track may go unmatched before it is dropped.
+            use_optical_flow (bool): Shift boxes by optical flow instead of velocity.
+        """
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.use_optical_flow = use_optical_flow
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._prev_gray = None
+
+    def update(self, detections, frame=None, frames_elapsed=1):
+        """
+        Associate fresh keyframe detections with the current tracks.
+
+        Args:
+            detections (list): Detections as returned by VisualRecognition.detect_objects.
+            frame (numpy.ndarray): The keyframe (kept as the optical-flow reference).
+            frames_elapsed (int): Frames since the previous keyframe, for velocity estimates.
+
+        Returns:
+            list: Detections annotated with a stable "track_id".
+        """
+        boxes = [d["bounding_box"] for d in detections]
+        ious = iou_matrix([t["bounding_box"] for t in self.tracks], boxes)
+        # Only same-label pairs may be matched
+        for i, track in enumerate(self.tracks):
+            for j, detection in enumerate(detections):
+                if track["label"] != detection["label"]:
+                    ious[i, j] = 0.0
+
+        # Greedy association, best overlaps first
+        matched_tracks, matched_detections = set(), {}
+        for flat in np.argsort(-ious, axis=None):
+            i, j = np.unravel_index(flat, ious.shape)
+            if ious[i, j] < self.iou_threshold:
+                break
+            if i in matched_tracks or j in matched_detections:
+                continue
+            matched_tracks.add(i)
+            matched_detections[j] = i
+
+        tracks = []
+        for j, detection in enumerate(detections):
+            track = dict(detection)
+            if j in matched_detections:
+                previous = self.tracks[matched_detections[j]]
+                track["track_id"] = previous["track_id"]
+                step = np.subtract(detection["bounding_box"][:2], previous["keyframe_box"][:2]) / max(frames_elapsed, 1)
+                track["velocity"] = tuple(step)
+            else:
+                track["track_id"] = next(self._ids)
+                track["velocity"] = (0.0, 0.0)
+            track["keyframe_box"] = detection["bounding_box"]
+            track["misses"] = 0
+            tracks.append(track)
+
+        # Keep unmatched tracks alive for a few keyframes to bridge missed detections
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks and track["misses"] < self.max_misses:
+                tracks.append(dict(track, misses=track["misses"] + 1))
+
+        self.tracks = tracks
+        if frame is not None and self.use_optical_flow:
+            self._prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return self.objects()
+
+    def predict(self, frame=None):
+        """
+        Carry every track forward one frame without running the detector.
+
+        Returns:
+            list: The propagated detections with their track IDs.
+        """
+        if self.use_optical_flow and frame is not None and self._prev_gray is not None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for track in self.tracks:
+                shift = self._flow_shift(self._prev_gray, gray, track["bounding_box"])
+                if shift is not None:
+                    track["velocity"] = shift
+            self._prev_gray = gray
+        for track in self.tracks:
+            x, y, w, h = track["bounding_box"]
+            dx, dy = track["velocity"]
+            track["bounding_box"] = (int(round(x + dx)), int(round(y + dy)), w, h)
+        return self.objects()
+
+    def objects(self):
+        # Public view of the tracks in the detect_objects output format (plus track_id)
+        hidden = ("velocity", "keyframe_box", "misses")
+        return [{k: v for k, v in track.items() if k not in hidden} for track in self.tracks if track["misses"] == 0]
+
+    @staticmethod
+    def _flow_shift(prev_gray, gray, box, max_points=20):
+        # Median displacement of good features inside the box between two frames
+        x, y, w, h = box
+        height, width = prev_gray.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            return None
+        points = cv2.goodFeaturesToTrack(prev_gray[y0:y1, x0:x1], max_points, 0.01, 3)
+        if points is None:
+            return None
+        points = (points + np.array([x0, y0], dtype=np.float32)).astype(np.float32)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+        good = status.reshape(-1) == 1
+        if not good.any():
+            return None
+        dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+        return float(dx), float(dy)
+
+
+class TrackingDetector:
+    def __init__(self, visual_recognition, min_interval=1, max_interval=10, latency_budget_ms=None,
+                 motion_low=0.01, motion_high=0.08, scene_cut=0.25, use_optical_flow=False, **tracker_kwargs):
+        """
+        Runs the detector only on keyframes and a cheap tracker on the frames in
+        between. The keyframe interval adapts to scene motion (more motion, more
+        keyframes) and is kept long enough for the amortized per-frame cost to fit
+        the latency budget.
+
+        Args:
+            visual_recognition (VisualRecognition): The detector.
+            min_interval (int): Shortest keyframe interval (1 = detect every frame).
+            max_interval (int): Longest keyframe interval.
+            latency_budget_ms (float): Target average per-frame processing time; None disables.
+            motion_low (float): Normalized frame difference at or below which the interval is longest.
+            motion_high (float): Normalized frame difference at or above which the interval is shortest.
+            scene_cut (float): Frame difference that forces an immediate keyframe.
+            use_optical_flow (bool): Track with optical flow instead of constant velocity.
+            **tracker_kwargs: Forwarded to IoUTracker.
+        """
+        self.visual_recognition = visual_recognition
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.latency_budget_ms = latency_budget_ms
+        self.motion_low = motion_low
+        self.motion_high = motion_high
+        self.scene_cut = scene_cut
+        self.tracker = IoUTracker(use_optical_flow=use_optical_flow, **tracker_kwargs)
+        self.interval = min_interval
+        self.frames_since_keyframe = None
+        self.detect_ms = 0.0
+        self.track_ms = 0.0
+        self.motion = 0.0
+        self._prev_small = None
+
+    def scene_motion(self, frame):
+        # Mean absolute difference of heavily downscaled grayscale frames, in [0, 1]
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, 48), interpolation=cv2.INTER_AREA)
+        motion = 0.0 if self._prev_small is None else float(np.mean(cv2.absdiff(small, self._prev_small))) / 255.0
+        self._prev_small = small
+        return motion
+
+    def process(self, frame):
+        """
+        Detect or track objects in the next frame.
+
+        Returns:
+            tuple: (detected_objects, is_keyframe). Objects carry a stable "track_id".
+        """
+        self.motion = self.scene_motion(frame)
+        keyframe = (self.frames_since_keyframe is None
+                    or self.frames_since_keyframe + 1 >= self.interval
+                    or self.motion >= self.scene_cut)
+
+        began = time.perf_counter()
+        if keyframe:
+            detections, _ = self.visual_recognition.detect_objects(frame, render=False)
+            objects = self.tracker.update(detections, frame, frames_elapsed=(self.frames_since_keyframe or 0) + 1)
+            self.detect_ms = self._smooth(self.detect_ms, 1000 * (time.perf_counter() - began))
+            self.frames_since_keyframe = 0
+        else:
+            objects = self.tracker.predict(frame)
+            self.track_ms = self._smooth(self.track_ms, 1000 * (time.perf_counter() - began))
+            self.frames_since_keyframe += 1
+        self.interval = self.next_interval()
+        return objects, keyframe
+
+    def next_interval(self):
+        # Motion maps linearly from the longest interval (static scene) to the shortest
+        span = max(self.motion_high - self.motion_low, 1e-9)
+        agitation = min(max((self.motion - self.motion_low) / span, 0.0), 1.0)
+        interval = self.max_interval - agitation * (self.max_interval - self.min_interval)
+
+        # Amortized cost detect_ms / interval + track_ms must fit the budget
+        if self.latency_budget_ms is not None and self.detect_ms > 0:
+            headroom = self.latency_budget_ms - self.track_ms
+            needed = math.ceil(self.detect_ms / headroom) if headroom > 0 else self.max_interval
+            interval = max(interval, needed)
+        return int(min(max(round(interval), self.min_interval), self.max_interval))
+
+    @staticmethod
+    def _smooth(average, sample, alpha=0.2):
+        return sample if average == 0.0 else (1 - alpha) * average + alpha * sample
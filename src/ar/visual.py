@@ -0,0 +1,425 @@
+import time
+
+import cv2
+import numpy as np
+
+from metrics import REGISTRY
+
+# Detector input sizes (multiples of the 32-pixel YOLO stride), trading speed for small-object recall
+INPUT_SIZES = (320, 416, 608)
+
+# OpenCV DNN backends and targets by name; those missing from the installed OpenCV build are left out
+DNN_BACKENDS = {name: getattr(cv2.dnn, constant) for name, constant in [
+    ('default', 'DNN_BACKEND_DEFAULT'),
+    ('opencv', 'DNN_BACKEND_OPENCV'),
+    ('openvino', 'DNN_BACKEND_INFERENCE_ENGINE'),
+    ('cuda', 'DNN_BACKEND_CUDA'),
+] if hasattr(cv2.dnn, constant)}
+DNN_TARGETS = {name: getattr(cv2.dnn, constant) for name, constant in [
+    ('cpu', 'DNN_TARGET_CPU'),
+    ('cpu_fp16', 'DNN_TARGET_CPU_FP16'),
+    ('opencl', 'DNN_TARGET_OPENCL'),
+    ('opencl_fp16', 'DNN_TARGET_OPENCL_FP16'),
+    ('myriad', 'DNN_TARGET_MYRIAD'),
+    ('cuda', 'DNN_TARGET_CUDA'),
+    ('cuda_fp16', 'DNN_TARGET_CUDA_FP16'),
+] if hasattr(cv2.dnn, constant)}
+
+
+def decode_detections(outputs, width, height, conf_threshold=0.5, nms_threshold=0.4, class_aware=False):
+    """
+    Decode raw YOLO output layers into boxes in pixel coordinates, fully vectorized.
+
+    Args:
+        outputs (list): Output arrays of shape (rows, 5 + num_classes) from the YOLO layers,
+            each row being (cx, cy, w, h, objectness, class scores...) relative to the image size.
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        conf_threshold (float): Minimum class score for a detection to be kept.
+        nms_threshold (float): IoU threshold for non-maxima suppression.
+        class_aware (bool): Only suppress overlapping boxes of the same class.
+
+    Returns:
+        tuple: (boxes, confidences, class_ids) arrays of shapes (K, 4), (K,), (K,) after NMS,
+        boxes being integer (x, y, w, h).
+    """
+    rows = np.concatenate([np.asarray(output).reshape(-1, output.shape[-1]) for output in outputs])
+    scores = rows[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(rows)), class_ids]
+
+    # Filter weak detections before doing any box arithmetic
+    keep = confidences > conf_threshold
+    rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+
+    centers_x = (rows[:, 0] * width).astype(np.int32)
+    centers_y = (rows[:, 1] * height).astype(np.int32)
+    widths = (rows[:, 2] * width).astype(np.int32)
+    heights = (rows[:, 3] * height).astype(np.int32)
+    boxes = np.stack([
+        (centers_x - widths / 2).astype(np.int32),
+        (centers_y - heights / 2).astype(np.int32),
+        widths,
+        heights,
+    ], axis=1)
+
+    # Apply non-maxima suppression to remove redundant overlapping boxes
+    indices = non_max_suppression(boxes, confidences, class_ids, conf_threshold, nms_threshold, class_aware)
+    return boxes[indices], confidences[indices].astype(float), class_ids[indices]
+
+
+def split_batch_outputs(outputs, batch_size):
+    """
+    Split the output layers of a batched forward pass into per-image output lists.
+
+    OpenCV returns YOLO outputs either as (batch, rows, cols) or, for some layer
+    implementations, with the batch folded into the rows as (batch * rows, cols).
+
+    Returns:
+        list: batch_size lists of per-layer (rows, cols) arrays.
+    """
+    per_image = [[] for _ in range(batch_size)]
+    for output in outputs:
+        output = np.asarray(output)
+        if output.ndim == 2:
+            output = output.reshape(batch_size, -1, output.shape[-1])
+        for index in range(batch_size):
+            per_image[index].append(output[index])
+    return per_image
+
+
+def non_max_suppression(boxes, confidences, class_ids, conf_threshold=0.5, nms_threshold=0.4, class_aware=False):
+    """
+    Run OpenCV NMS on box arrays, optionally per class.
+
+    Returns:
+        numpy.ndarray: Indices of the kept boxes, in descending confidence order.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    scores = confidences.astype(float).tolist()
+    if not class_aware:
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores, conf_threshold, nms_threshold)
+    elif hasattr(cv2.dnn, 'NMSBoxesBatched'):
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), scores, class_ids.tolist(), conf_threshold, nms_threshold)
+    else:
+        # Older OpenCV: shift each class into its own disjoint region so boxes of
+        # different classes can never overlap, then run plain NMS once
+        offset = class_ids.astype(np.int64) * (int(np.abs(boxes).max()) * 4 + 1)
+        shifted = boxes.astype(np.int64)
+        shifted[:, 0] += offset
+        shifted[:, 1] += offset
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), scores, conf_threshold, nms_threshold)
+    # OpenCV < 4.5.4 returns an (N, 1) array, newer versions a flat one
+    return np.asarray(indices, dtype=np.intp).reshape(-1)
+
+
+def available_dnn_targets(backend):
+    """
+    Returns:
+        list: Names of the targets the given backend supports on this machine.
+    """
+    try:
+        available = set(np.asarray(cv2.dnn.getAvailableTargets(DNN_BACKENDS[backend])).reshape(-1).tolist())
+    except cv2.error:
+        return []
+    return [name for name, target in DNN_TARGETS.items() if target in available]
+
+
+def select_dnn_preference(net, backend='default', target='cpu'):
+    """
+    Set the network's preferred backend and target (e.g. 'openvino' on 'cpu', or
+    'opencl_fp16' for half precision), falling back to OpenCV on the CPU when this
+    build or machine does not provide the requested pair.
+
+    Returns:
+        tuple: The (backend, target) names in use.
+    """
+    if backend not in DNN_BACKENDS:
+        raise ValueError(f"Unknown DNN backend '{backend}'. Choose from {tuple(DNN_BACKENDS)}.")
+    if target not in DNN_TARGETS:
+        raise ValueError(f"Unknown DNN target '{target}'. Choose from {tuple(DNN_TARGETS)}.")
+    if target not in available_dnn_targets(backend):
+        print(f"DNN backend '{backend}' with target '{target}' is not available here; using opencv on cpu.")
+        backend, target = 'opencv', 'cpu'
+    net.setPreferableBackend(DNN_BACKENDS[backend])
+    net.setPreferableTarget(DNN_TARGETS[target])
+    return backend, target
+
+
+def load_detector(model_path, config_path=None):
+    # ONNX exports carry their own graph; Darknet/Caffe/TensorFlow models need the config file
+    if model_path.lower().endswith('.onnx'):
+        return cv2.dnn.readNetFromONNX(model_path)
+    return cv2.dnn.readNet(model_path, config_path)
+
+
+class InputSizeController:
+    def __init__(self, sizes=INPUT_SIZES, latency_budget_ms=None, initial_size=None, crowded=20,
+                 small_object_area=0.005, patience=5):
+        """
+        Chooses the detector input size frame by frame. Scene complexity (many objects,
+        or small ones that need more pixels) selects a size, and the latency budget caps
+        it at the largest size whose detection cost fits. Cost is tracked as a smoothed
+        time per input megapixel, so every measurement (at whatever size) updates the
+        estimate for all sizes and follows changes in machine load. Complexity-driven
+        changes wait for patience consecutive frames to agree, so the size does not
+        oscillate; budget overruns shrink the input at once.
+
+        Args:
+            sizes (tuple): Allowed square input sizes, multiples of 32.
+            latency_budget_ms (float): Per-detection time budget; None only follows complexity.
+            initial_size (int): Starting size; defaults to the middle one.
+            crowded (int): Detections at which a scene counts as fully complex.
+            small_object_area (float): Box area, as a fraction of the frame, below which an
+                object counts as small.
+            patience (int): Consecutive frames a complexity-driven change must persist.
+        """
+        self.sizes = tuple(sorted(sizes))
+        self.latency_budget_ms = latency_budget_ms
+        self.size = initial_size or self.sizes[len(self.sizes) // 2]
+        self.crowded = crowded
+        self.small_object_area = small_object_area
+        self.patience = patience
+        self.ms_per_megapixel = None
+        self.scene_complexity = 0.0
+        self._pending = None
+        self._pending_frames = 0
+
+    def complexity(self, detections, frame_shape):
+        # The larger of crowding and the share of small objects, in [0, 1]
+        if not detections:
+            return 0.0
+        frame_area = float(frame_shape[0] * frame_shape[1])
+        areas = np.array([obj["bounding_box"][2] * obj["bounding_box"][3] for obj in detections]) / frame_area
+        return max(min(len(detections) / self.crowded, 1.0), float(np.mean(areas < self.small_object_area)))
+
+    def estimated_ms(self, size):
+        # Detection time at the given size; 0.0 until the first measurement
+        return (self.ms_per_megapixel or 0.0) * size * size / 1e6
+
+    def update(self, detect_ms, detections, frame_shape):
+        """
+        Record the cost and detections of a frame detected at the current size.
+
+        Returns:
+            int: Input size for the next frame.
+        """
+        sample = detect_ms * 1e6 / (self.size * self.size)
+        self.ms_per_megapixel = sample if self.ms_per_megapixel is None else 0.8 * self.ms_per_megapixel + 0.2 * sample
+        self.scene_complexity = self.complexity(detections, frame_shape)
+
+        wanted = self.sizes[int(round(self.scene_complexity * (len(self.sizes) - 1)))]
+        if self.latency_budget_ms is not None:
+            affordable = [size for size in self.sizes
+                          if size <= wanted and self.estimated_ms(size) <= self.latency_budget_ms]
+            wanted = affordable[-1] if affordable else self.sizes[0]
+            if wanted < self.size and self.estimated_ms(self.size) > self.latency_budget_ms:
+                return self._switch(wanted)
+
+        if wanted == self.size:
+            self._pending, self._pending_frames = None, 0
+        elif wanted == self._pending:
+            self._pending_frames += 1
+            if self._pending_frames >= self.patience:
+                return self._switch(wanted)
+        else:
+            self._pending, self._pending_frames = wanted, 1
+        return self.size
+
+    def _switch(self, size):
+        self.size = size
+        self._pending, self._pending_frames = None, 0
+        return size
+
+
+class VisualRecognition:
+    def __init__(self, model_path='yolov3.weights', config_path='yolov3.cfg', labels_path='coco.names',
+                 backend='default', target='cpu', input_size=416, size_controller=None, box_units=None):
+        """
+        Initialize the object detection model (YOLO in this case) using OpenCV.
+        
+        Args:
+            model_path (str): Path to the pre-trained weights for the detection model, or
+                to an ONNX export (config_path is then ignored).
+            config_path (str): Path to the model configuration file.
+            labels_path (str): Path to the file containing labels for the detected objects.
+            backend (str): OpenCV DNN backend, one of DNN_BACKENDS (e.g. 'openvino').
+            target (str): OpenCV DNN target, one of DNN_TARGETS (e.g. 'opencl_fp16').
+            input_size (int): Square network input size; with a size_controller, the
+                starting size. ONNX exports without dynamic axes only accept their export size.
+            size_controller (InputSizeController): Adapts the input size to the latency
+                budget and scene complexity after every detection, batched or not.
+            box_units (str): 'normalized' when the outputs' box columns are fractions of
+                the image (Darknet) or 'pixels' when they are in network input pixels
+                (typical of ONNX exports); defaults by model format. Rows must follow the
+                YOLOv3 layout (cx, cy, w, h, objectness, class scores).
+        """
+        # Load YOLO model
+        self.net = load_detector(model_path, config_path)
+        self.backend, self.target = select_dnn_preference(self.net, backend, target)
+        self.output_layers = list(self.net.getUnconnectedOutLayersNames())
+        self.box_units = box_units or ('pixels' if model_path.lower().endswith('.onnx') else 'normalized')
+        self.size_controller = size_controller
+        self.input_size = size_controller.size if size_controller is not None else input_size
+        
+        # Load the labels (e.g., COCO dataset labels)
+        with open(labels_path, 'r') as f:
+            self.labels = f.read().strip().split("\n")
+        
+        # Set up color scheme for detected object bounding boxes
+        self.colors = np.random.uniform(0, 255, size=(len(self.labels), 3))
+
+    def detect_objects(self, frame, conf_threshold=0.5, nms_threshold=0.4, class_aware=False, render=True):
+        """
+        Perform object detection on the given video frame.
+
+        Args:
+            frame (numpy.ndarray): The image frame from the video feed (or camera).
+            conf_threshold (float): Minimum class score for a detection to be kept.
+            nms_threshold (float): IoU threshold for non-maxima suppression.
+            class_aware (bool): Only suppress overlapping boxes of the same class.
+            render (bool): Draw the detections on a copy of the frame.
+        
+        Returns:
+            detected_objects (list): A list of detected objects, each containing:
+                - label (str): The object label (e.g., "person", "car").
+                - confidence (float): The confidence score for the detection.
+                - bounding_box (tuple): The bounding box coordinates (x, y, w, h).
+            frame (numpy.ndarray): The annotated copy when render is set, otherwise the input frame.
+        """
+        with REGISTRY.timer('detect_objects'):
+            detected_objects = self.detect_batch([frame], conf_threshold, nms_threshold, class_aware)[0]
+
+        if render:
+            frame = self.draw_detections(frame.copy(), detected_objects)
+        return detected_objects, frame
+
+    def detect_batch(self, frames, conf_threshold=0.5, nms_threshold=0.4, class_aware=False):
+        """
+        Detect objects in several frames (e.g. from different camera streams) with a
+        single blob and a single forward pass. With a size controller, every frame
+        of the batch reports its share of the batch time and its detections.
+
+        Args:
+            frames (list): Image frames; they may differ in size.
+            conf_threshold (float): Minimum class score for a detection to be kept.
+            nms_threshold (float): IoU threshold for non-maxima suppression.
+            class_aware (bool): Only suppress overlapping boxes of the same class.
+
+        Returns:
+            list: One list of detected objects per input frame, in input order.
+        """
+        began = time.perf_counter()
+        # Preprocess the frames for YOLO (resize and normalization)
+        size = self.input_size
+        blob = cv2.dnn.blobFromImages(frames, 0.00392, (size, size), (0, 0, 0), True, crop=False)
+        self.net.setInput(blob)
+
+        # Perform forward pass through YOLO network
+        detections = self.net.forward(self.output_layers)
+        if self.box_units == 'pixels':
+            # decode_detections expects box columns as fractions of the image
+            detections = [np.concatenate([output[..., :4] / size, output[..., 4:]], axis=-1) for output in detections]
+
+        results = []
+        for outputs, frame in zip(split_batch_outputs(detections, len(frames)), frames):
+            height, width = frame.shape[:2]
+            boxes, confidences, class_ids = decode_detections(
+                outputs, width, height, conf_threshold, nms_threshold, class_aware)
+            results.append(self.to_objects(boxes, confidences, class_ids))
+
+        if self.size_controller is not None:
+            frame_ms = 1000 * (time.perf_counter() - began) / len(frames)
+            for detected_objects, frame in zip(results, frames):
+                self.input_size = self.size_controller.update(frame_ms, detected_objects, frame.shape)
+                if self.input_size != size:
+                    break  # The remaining frames were measured at the old size
+        return results
+
+    def to_objects(self, boxes, confidences, class_ids):
+        # Convert decoded detection arrays into the list-of-dicts format used downstream
+        return [
+            {
+                "label": self.labels[class_id],
+                "class_id": class_id,
+                "confidence": confidence,
+                "bounding_box": tuple(box),
+            }
+            for box, confidence, class_id in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist())
+        ]
+
+    def draw_detections(self, frame, detected_objects):
+        """
+        Draw bounding boxes and labels onto the frame (in place).
+
+        Args:
+            frame (numpy.ndarray): The image to draw on.
+            detected_objects (list): Detections as returned by detect_objects.
+
+        Returns:
+            numpy.ndarray: The same frame, annotated.
+        """
+        for obj in detected_objects:
+            x, y, w, h = obj["bounding_box"]
+            color = self.colors[obj["class_id"]]
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(frame, f"{obj['label']} {obj['confidence']:.2f}", (x, y - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        return frame
+
+    def recognize_landmark(self, detected_objects):
+        """
+        A placeholder function to map detected objects to specific landmarks (e.g., known buildings or monuments).
+        This can be extended with a database of known landmarks.
+
+        Args:
+            detected_objects (list): The list of detected objects from the video frame.
+
+        Returns:
+            landmark (str): The identified landmark, if any.
+        """
+        # Example: Check if certain objects (like 'building', 'sign', etc.) correspond to landmarks
+        landmark = None
+        for obj in detected_objects:
+            if obj['label'] in ['building', 'statue', 'monument']:  # Example labels
+                landmark = obj['label']
+                break
+        
+        return landmark
+
+# Example usage
+if __name__ == "__main__":
+    # Initialize the visual recognition module
+    visual_recognition = VisualRecognition(
+        model_path='yolov3.weights',
+        config_path='yolov3.cfg',
+        labels_path='coco.names'
+    )
+
+    # Open a video stream (using your device's camera)
+    cap = cv2.VideoCapture(0)
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        # Detect objects in the current frame
+        detected_objects, frame_with_boxes = visual_recognition.detect_objects(frame)
+
+        # Display the video feed with bounding boxes
+        cv2.imshow('Object Detection', frame_with_boxes)
+
+        # Example: Check if any landmarks are recognized
+        landmark = visual_recognition.recognize_landmark(detected_objects)
+        if landmark:
+            print(f"Landmark detected: {landmark}")
+
+        # Press 'q' to quit
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+
@@ -0,0 +1,296 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Relative slowdown of a benchmark's median versus the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def time_call(fn, repeat=20, warmup=2, min_time=None):
+    """
+    Time repeated calls of fn.
+
+    Args:
+        fn (callable): Zero-argument function to time.
+        repeat (int): Timed calls.
+        warmup (int): Untimed calls first (caches, lazy initialization).
+        min_time (float): Keep repeating until this many seconds have been measured.
+
+    Returns:
+        dict: median_ms, p90_ms, min_ms and the number of runs.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    began = time.perf_counter()
+    while len(samples) < repeat or (min_time is not None and time.perf_counter() - began < min_time):
+        start = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - start))
+    samples = np.asarray(samples)
+    return {
+        'median_ms': float(np.median(samples)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'min_ms': float(samples.min()),
+        'runs': len(samples),
+    }
+
+
+def bench_smc_step(quick=False):
+    # TwistedSMC.step with vectorized twist/likelihood, so the engine itself dominates
+    from nlp.twisted_smc import TwistedSMC
+
+    class GaussianProposal:
+        def sample(self, num_particles, initial_state):
+            return np.random.default_rng(0).normal(initial_state, 1.0, size=(num_particles, 2))
+
+    def twist(particles, context):
+        return particles + np.random.normal(scale=0.1, size=particles.shape)
+
+    def log_likelihood(particles, context):
+        return -0.5 * np.sum((particles - context['target']) ** 2, axis=1)
+
+    for num_particles in ([100, 1000, 10000] if quick else [100, 1000, 10000, 100000]):
+        np.random.seed(0)
+        smc = TwistedSMC(num_particles, GaussianProposal(), twist, log_likelihood)
+        smc.rng = np.random.default_rng(0)
+        smc.initialize_particles(0.0)
+        yield f"smc_step[n={num_particles}]", lambda smc=smc: smc.step({'target': 0.5})
+
+
+def synthetic_yolo_outputs(num_classes=80, input_size=416, num_objects=20, seed=0):
+    """
+    YOLOv3-shaped output tensors (three scales, 3 anchors per cell) with num_objects
+    confident, overlapping candidate clusters and low-confidence noise elsewhere.
+    """
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for stride in (32, 16, 8):
+        cells = (input_size // stride) ** 2 * 3
+        layer = np.zeros((cells, 5 + num_classes), dtype=np.float32)
+        layer[:, :4] = rng.random((cells, 4), dtype=np.float32)
+        layer[:, 4] = rng.random(cells, dtype=np.float32) * 0.3
+        layer[:, 5:] = rng.random((cells, num_classes), dtype=np.float32) * 0.3
+        outputs.append(layer)
+    # Each object is detected by several neighbouring anchors with jittered boxes
+    for _ in range(num_objects):
+        layer = outputs[rng.integers(len(outputs))]
+        rows = rng.choice(len(layer), size=4, replace=False)
+        center = rng.random(2, dtype=np.float32) * 0.8 + 0.1
+        layer[rows, :2] = center + rng.normal(0, 0.005, size=(4, 2)).astype(np.float32)
+        layer[rows, 2:4] = rng.random(2, dtype=np.float32) * 0.2 + 0.05
+        layer[rows, 4] = 0.9
+        layer[rows, 5 + rng.integers(num_classes)] = 0.95
+    return outputs
+
+
+def bench_detect_postprocess(quick=False):
+    # decode_detections (the detect_objects post-processing) on synthetic YOLO tensors
+    from ar.visual import decode_detections
+
+    for num_objects in ([10, 100] if quick else [10, 100, 1000]):
+        outputs = synthetic_yolo_outputs(num_objects=num_objects)
+        yield (f"detect_postprocess[objects={num_objects}]",
+               lambda outputs=outputs: decode_detections(outputs, 640, 480))
+
+
+def bench_nearby_landmarks(quick=False):
+    # get_nearby_landmarks (1 km radius) over uniformly spread POIs in a city-sized area
+    from ar.landmarks import LandmarkStore
+    from ar.spatial import SpatialRecognition
+
+    spatial = SpatialRecognition()
+    for count in ([1000, 100000] if quick else [1000, 10000, 100000, 1000000]):
+        # Seeded per size, so quick and full runs time the same data
+        rng = np.random.default_rng(count)
+        coordinates = np.column_stack([rng.uniform(40.5, 41.0, count), rng.uniform(-74.3, -73.7, count)])
+        spatial.landmarks = LandmarkStore.build([f"poi-{i}" for i in range(count)], coordinates)
+        queries = iter(np.column_stack([rng.uniform(40.6, 40.9, 100000), rng.uniform(-74.2, -73.8, 100000)]))
+        yield (f"nearby_landmarks[pois={count}]",
+               lambda spatial=spatial, queries=queries: spatial.get_nearby_landmarks(tuple(next(queries)), 1.0))
+
+
+def bench_twist_cache(quick=False):
+    # Learned-twist stand-in (embedding mean + MLP) on a resampled population, evaluated
+    # for every particle versus once per distinct prefix through a fresh CachedTwist
+    from nlp.twist_cache import CachedTwist
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(1000, 64))
+    weights = rng.normal(size=(64, 64)) / 8
+
+    def twist(tokens, context):
+        return np.tanh(embeddings[np.asarray(tokens)].mean(axis=1) @ weights).sum(axis=1)
+
+    for num_particles in ([1000] if quick else [1000, 10000]):
+        # 50 surviving ancestors after resampling, 20 tokens each
+        ancestors = rng.integers(0, 1000, size=(50, 20))
+        tokens = ancestors[rng.integers(0, 50, size=num_particles)]
+        cache = CachedTwist(twist)
+        yield f"twist[n={num_particles},uncached]", lambda tokens=tokens: twist(tokens, None)
+        yield (f"twist[n={num_particles},cached_cold]",
+               lambda tokens=tokens, cache=cache: (cache.clear(), cache(tokens, None)))
+
+
+def build_tiny_checkpoint(path):
+    """
+    Write a tiny randomly initialized BART checkpoint with a word-level tokenizer,
+    so language model benchmarks run offline.
+    """
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors, trainers
+    from transformers import BartConfig, BartForConditionalGeneration, PreTrainedTokenizerFast
+
+    from nlp.inference_modes import DEFAULT_QUERIES
+
+    tokenizer = Tokenizer(models.WordLevel(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.train_from_iterator(DEFAULT_QUERIES, trainers.WordLevelTrainer(
+        special_tokens=["<s>", "<pad>", "</s>", "<unk>"]))
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 0), ("</s>", 2)])
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>",
+                                   pad_token="<pad>", unk_token="<unk>")
+    fast.save_pretrained(path)
+    config = BartConfig(
+        vocab_size=len(fast), d_model=64, encoder_layers=2, decoder_layers=2, encoder_attention_heads=4,
+        decoder_attention_heads=4, encoder_ffn_dim=128, decoder_ffn_dim=128, max_position_embeddings=128,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2, forced_bos_token_id=0)
+    torch.manual_seed(0)
+    BartForConditionalGeneration(config).save_pretrained(path)
+    return path
+
+
+def bench_language_model(quick=False, checkpoint=None):
+    # Generation with a tiny local checkpoint; forced lengths keep the work per call fixed
+    import torch
+
+    from nlp.inference_modes import DEFAULT_QUERIES
+    from nlp.model import LanguageModel
+
+    with tempfile.TemporaryDirectory() as directory:
+        lm = LanguageModel(checkpoint or build_tiny_checkpoint(directory))
+    torch.manual_seed(0)
+    length = {'max_length': 20, 'min_length': 20}
+    yield "lm_generate[batch=1]", lambda: lm._generate(DEFAULT_QUERIES[0], **length)
+    yield "lm_generate_batch[batch=8]", lambda: lm.generate_batch(DEFAULT_QUERIES, **length)
+    yield ("lm_weighted[particles=16]",
+           lambda: lm.get_weighted_interpretations(DEFAULT_QUERIES[0], num_particles=16, max_length=20))
+
+
+BENCHMARKS = {
+    'smc': bench_smc_step,
+    'detect': bench_detect_postprocess,
+    'spatial': bench_nearby_landmarks,
+    'twist': bench_twist_cache,
+    'lm': bench_language_model,
+}
+
+
+def run_benchmarks(groups=None, quick=False, repeat=20, min_time=0.2, lm_checkpoint=None, log=print):
+    """
+    Run benchmark groups and collect their timings.
+
+    Args:
+        groups (list): Names from BENCHMARKS; None runs them all.
+        quick (bool): Skip the largest problem sizes.
+        repeat (int): Timed calls per case.
+        min_time (float): Minimum measured seconds per case, to steady fast cases.
+        lm_checkpoint (str): Language model checkpoint; defaults to a generated tiny one.
+
+    Returns:
+        dict: Case name to timing dict (see time_call), or {'skipped': reason}.
+    """
+    results = {}
+    for group in groups or BENCHMARKS:
+        kwargs = {'checkpoint': lm_checkpoint} if group == 'lm' else {}
+        try:
+            for name, fn in BENCHMARKS[group](quick, **kwargs):
+                results[name] = time_call(fn, repeat=repeat, min_time=min_time)
+                log(f"{name:<40} {results[name]['median_ms']:10.3f} ms (p90 {results[name]['p90_ms']:.3f})")
+        except ImportError as e:
+            # Optional dependencies (torch, transformers, cv2) may be absent
+            results[group] = {'skipped': str(e)}
+            log(f"{group:<40} skipped: {e}")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare median timings against a baseline run.
+
+    Args:
+        results (dict): Current results (run_benchmarks output).
+        baseline (dict): Baseline results in the same format.
+        tolerance (float): Allowed relative slowdown before a case is flagged.
+
+    Returns:
+        dict: Case name to {'baseline_ms', 'current_ms', 'ratio', 'regression'} for every
+        case timed in both runs.
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or 'median_ms' not in current or 'median_ms' not in previous:
+            continue
+        ratio = current['median_ms'] / max(previous['median_ms'], 1e-9)
+        comparison[name] = {
+            'baseline_ms': previous['median_ms'],
+            'current_ms': current['median_ms'],
+            'ratio': ratio,
+            'regression': ratio > 1 + tolerance,
+        }
+    return comparison
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+# Example usage:
+#   python src/benchmarks.py --output bench.json
+#   python src/benchmarks.py --baseline bench.json --tolerance 0.2   (exit code 1 on regressions)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the SMC, detection, spatial, twist and NLP hot paths.")
+    parser.add_argument('groups', nargs='*', choices=list(BENCHMARKS), default=None,
+                        help="Benchmark groups to run (default: all).")
+    parser.add_argument('--quick', action='store_true', help="Skip the largest problem sizes.")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed calls per case.")
+    parser.add_argument('--lm-checkpoint', default=None, help="Local checkpoint instead of a generated tiny BART.")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    parser.add_argument('--baseline', default=None, help="JSON results of an earlier run to compare against.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative slowdown flagged as a regression (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.groups or None, args.quick, args.repeat, lm_checkpoint=args.lm_checkpoint)
+    report = {'environment': environment(), 'quick': args.quick, 'results': results}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        report['comparison'] = compare_to_baseline(results, baseline, args.tolerance)
+        print("\nAgainst baseline:")
+        for name, entry in report['comparison'].items():
+            flag = "REGRESSION" if entry['regression'] else ""
+            print(f"{name:<40} {entry['baseline_ms']:10.3f} -> {entry['current_ms']:10.3f} ms "
+                  f"(x{entry['ratio']:.2f}) {flag}")
+            if entry['regression']:
+                regressions.append(name)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
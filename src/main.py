@@ -1,68 +1,353 @@
-from nlp.model import LanguageModel
-from nlp.twisted_smc import TwistedSMC
-from ar.visual import VisualRecognition
-from ar.spatial import SpatialRecognition
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
 
-import cv2
+from metrics import REGISTRY, MetricsServer, SamplingProfiler
+from pipeline import Pipeline
+from session import ReplaySource, SessionReader, SessionRecorder
+from startup import LazyComponent, StartupTimer
 
-def main():
-    # Initialize the NLP model and Twisted SMC engine
+# Started at import so the report covers interpreter-level imports as well
+startup_timer = StartupTimer()
+
+
+def build_language_model(snapshot_path=None):
+    # Heavy imports (torch, transformers) are deferred until the model is needed
+    from nlp.model import LanguageModel
+
+    if snapshot_path and os.path.exists(snapshot_path):
+        return LanguageModel.from_snapshot(snapshot_path)
     language_model = LanguageModel()
-    twisted_smc = TwistedSMC(num_particles=100, proposal_dist=None, twist_function=None)  # Placeholder for SMC functions
-    
-    # Initialize the Visual and Spatial recognition modules
-    visual_recognition = VisualRecognition(
-        model_path='yolov3.weights', 
-        config_path='yolov3.cfg', 
-        labels_path='coco.names'
+    if snapshot_path:
+        # Write the ready-to-run snapshot so the next start skips from_pretrained
+        language_model.save_snapshot(snapshot_path)
+    return language_model
+
+
+def build_visual_recognition(args):
+    from ar.visual import InputSizeController, VisualRecognition
+
+    size_controller = None
+    if args.adaptive_input_size:
+        size_controller = InputSizeController(latency_budget_ms=args.detect_budget_ms, initial_size=args.input_size)
+    return VisualRecognition(
+        model_path=args.detector_model,
+        config_path='yolov3.cfg',
+        labels_path='coco.names',
+        backend=args.dnn_backend,
+        target=args.dnn_target,
+        input_size=args.input_size,
+        size_controller=size_controller
     )
-    spatial_recognition = SpatialRecognition()
 
-    # Start the video capture for AR
-    cap = cv2.VideoCapture(0)
+
+def build_spatial_recognition(landmarks_path=None, location_source=None):
+    from ar.spatial import SpatialRecognition
+
+    return SpatialRecognition(landmarks_path=landmarks_path, location_source=location_source)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AR Navigation System")
+    parser.add_argument('--lm-snapshot', default=os.environ.get('LM_SNAPSHOT_PATH'),
+                        help="Language model snapshot to load (written on first run if missing).")
+    parser.add_argument('--landmarks', default=os.environ.get('LANDMARKS_PATH'),
+                        help="Landmark index directory (see ar.landmarks) or CSV/GeoJSON/Parquet file.")
+    parser.add_argument('--detector-model', default=os.environ.get('DETECTOR_MODEL', 'yolov3.weights'),
+                        help="Detector weights (with yolov3.cfg) or an ONNX export.")
+    parser.add_argument('--dnn-backend', default='default',
+                        help="OpenCV DNN backend: default, opencv, openvino or cuda.")
+    parser.add_argument('--dnn-target', default='cpu',
+                        help="OpenCV DNN target: cpu, cpu_fp16, opencl, opencl_fp16, myriad, cuda or cuda_fp16.")
+    parser.add_argument('--input-size', type=int, default=416, choices=[320, 416, 608],
+                        help="Detector input size (the starting size with --adaptive-input-size).")
+    parser.add_argument('--adaptive-input-size', action='store_true',
+                        help="Move between input sizes with scene complexity and --detect-budget-ms.")
+    parser.add_argument('--detect-budget-ms', type=float, default=None,
+                        help="Per-detection time budget for --adaptive-input-size.")
+    parser.add_argument('--no-warmup', action='store_true',
+                        help="Build models on first use instead of warming them in the background.")
+    parser.add_argument('--max-keyframe-interval', type=int, default=1,
+                        help="Run the detector at most every N frames and track in between (1 disables tracking).")
+    parser.add_argument('--latency-budget-ms', type=float, default=None,
+                        help="Average per-frame detection budget used to adapt the keyframe interval.")
+    parser.add_argument('--optical-flow', action='store_true',
+                        help="Carry boxes between keyframes with optical flow instead of constant velocity.")
+    parser.add_argument('--report-interval', type=float, default=10.0,
+                        help="Seconds between per-stage throughput reports.")
+    parser.add_argument('--metrics-port', type=int, default=os.environ.get('METRICS_PORT'),
+                        help="Serve stage latencies and SMC health on /metrics (Prometheus) and /metrics.json.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Run the sampling profiler; stacks are served on /profile and the hottest printed at exit.")
+    parser.add_argument('--record', default=None,
+                        help="Record frames, GPS fixes and queries to this session file.")
+    parser.add_argument('--record-codec', choices=['jpg', 'png', 'raw'], default='jpg',
+                        help="Frame encoding for --record ('raw' replays without decoding but is large).")
+    parser.add_argument('--replay', default=None,
+                        help="Replay a recorded session instead of the camera, GPS and stdin.")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Replay rate relative to real time; 0 replays as fast as possible.")
+    parser.add_argument('--replay-loop', action='store_true', help="Restart the replay when it ends.")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed the random number generators, so replays are repeatable.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics_server, profiler = start_metrics(args)
+    if args.seed is not None:
+        seed_everything(args.seed)
+    replay = ReplaySource(SessionReader(args.replay), args.replay_speed, args.replay_loop) if args.replay else None
+    recorder = SessionRecorder(args.record, codec=args.record_codec) if args.record else None
+
+    # Models are constructed lazily; unless disabled they are warmed in background threads
+    # while the camera starts, so the first frame does not wait on the language model
+    language_model = LazyComponent("language model", lambda: build_language_model(args.lm_snapshot), startup_timer)
+    visual_recognition = LazyComponent("visual recognition", lambda: build_visual_recognition(args), startup_timer)
+    location_source = replay.get_location if replay is not None else None
+    spatial_recognition = LazyComponent("spatial recognition",
+                                        lambda: build_spatial_recognition(args.landmarks, location_source),
+                                        startup_timer)
+    if not args.no_warmup:
+        for component in (visual_recognition, language_model, spatial_recognition):
+            component.warm()
+
+    with startup_timer.phase("import cv2"):
+        import cv2
+    with startup_timer.phase("import twisted_smc"):
+        from nlp.twisted_smc import TwistedSMC
+
+    # Initialize the Twisted SMC engine
+    twisted_smc = TwistedSMC(num_particles=100, proposal_dist=None, twist_function=None)  # Placeholder for SMC functions
+
+    # Start the video capture for AR (or the recorded session standing in for camera, GPS and stdin)
+    with startup_timer.phase("open capture"):
+        cap = replay if replay is not None else cv2.VideoCapture(0)
+
+    pipeline = build_pipeline(cap, visual_recognition, spatial_recognition, language_model, args, recorder)
+    render_queue = pipeline.queues['render']
+    render_stats = pipeline.add_stats('render')
+    pipeline.start()
 
     print("AR Navigation System is running...")
-    print("Press 'q' to quit.")
+    print("Type a question and press Enter at any time; press 'q' in the video window to quit.")
+
+    # Rendering stays on the main thread (GUI toolkits require it); every other stage runs
+    # on a worker thread and hands over the freshest packet through drop-oldest queues
+    last_report = time.perf_counter()
+    try:
+        while pipeline.running:
+            try:
+                packet = render_queue.get(timeout=0.1)
+            except queue.Empty:
+                packet = None
+
+            if packet is not None:
+                began = time.perf_counter()
+                frame_with_boxes = visual_recognition.get().draw_detections(packet['frame'], packet['detections'])
+                # Display the current frame with bounding boxes drawn around detected objects
+                cv2.imshow("AR View - Object Detection", frame_with_boxes)
+                render_stats.record(time.perf_counter() - began)
+                startup_timer.mark("time to first frame")
+
+            # Press 'q' to quit the loop and end the program
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
 
-    while True:
+            if time.perf_counter() - last_report >= args.report_interval:
+                pipeline.print_report()
+                last_report = time.perf_counter()
+    finally:
+        pipeline.stop()
+        pipeline.print_report()
+
+        # Release the video capture and close windows
+        cap.release()
+        cv2.destroyAllWindows()
+        if recorder is not None:
+            recorder.close()
+        if replay is not None:
+            print(f"Replay: {replay.stats()}")
+
+        if profiler is not None:
+            profiler.stop()
+            print("Hottest functions (samples):")
+            for function, samples in profiler.top(10):
+                print(f"  {samples:6d}  {function}")
+        if metrics_server is not None:
+            metrics_server.stop()
+
+
+def seed_everything(seed):
+    # SMC resampling and sampled decoding draw from these generators
+    import random
+
+    import numpy as np
+
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.manual_seed(seed)
+
+
+def start_metrics(args):
+    # Metrics stay disabled (a flag check per instrumented call) unless they are exported
+    profiler = SamplingProfiler().start() if args.profile else None
+    metrics_server = None
+    if args.metrics_port is not None:
+        REGISTRY.enable()
+        metrics_server = MetricsServer(REGISTRY, port=int(args.metrics_port), profiler=profiler).start()
+        print(f"Metrics on http://127.0.0.1:{metrics_server.port}/metrics")
+    return metrics_server, profiler
+
+
+def build_pipeline(cap, visual_recognition, spatial_recognition, language_model, args, recorder=None):
+    """
+    Wire capture -> detect -> context -> render stages, plus an asynchronous query path
+    (stdin reader -> answer) that interprets questions against the latest context
+    without ever blocking the video. When cap is a ReplaySource, recorded queries take
+    the place of stdin; with a recorder, frames, fixes and queries are also recorded.
+
+    Replayed queries are queued without blocking, because they are submitted from the
+    capture thread: when the answer queue is full a query is dropped and counted rather
+    than stalling capture. Once the replay ends, capture waits for the queued queries
+    to be answered before it stops the pipeline.
+    """
+    pipeline = Pipeline()
+    frames = pipeline.queue('frames')
+    detections = pipeline.queue('detections')
+    render = pipeline.queue('render')
+    queries = pipeline.queue('queries', maxsize=8, drop_oldest=False)
+    latest_context = {'landmarks': []}
+    frame_ids = itertools.count()
+    dropped_queries = 0
+    tracker = LazyComponent("tracker", lambda: build_tracker(visual_recognition.get(), args))
+
+    def capture():
         # Capture the current frame from the video stream (simulating AR view)
-        ret, frame = cap.read()
+        with REGISTRY.timer('capture'):
+            ret, frame = cap.read()
         if not ret:
-            print("Error capturing video frame.")
-            break
+            if not isinstance(cap, ReplaySource):
+                print("Error capturing video frame.")
+                return None
+            # Answer what the replay queued before the source ends the pipeline
+            while queries.unfinished_tasks and pipeline.running:
+                time.sleep(0.05)
+            print(f"Replay finished ({dropped_queries} queries dropped on a full answer queue)."
+                  if dropped_queries else "Replay finished.")
+            return None
+        if recorder is not None:
+            recorder.add_frame(frame)
+        packet = {'frame_id': next(frame_ids), 'frame': frame, 'captured_at': time.perf_counter()}
+        if isinstance(cap, ReplaySource):
+            # The fix replayed with this frame; read later, it would depend on thread timing
+            packet['location'] = cap.get_location()
+        return packet
+
+    def detect(packet):
+        # Detect objects in the current frame (or track them between keyframes);
+        # drawing happens later in the render stage
+        if args.max_keyframe_interval > 1:
+            packet['detections'], packet['keyframe'] = tracker.get().process(packet['frame'])
+        else:
+            packet['detections'], _ = visual_recognition.get().detect_objects(packet['frame'], render=False)
+        return packet
+
+    def fuse_context(packet):
+        # Get the current spatial (GPS) location of the user and the landmarks around it
+        spatial = spatial_recognition.get()
+        if packet.get('location') is None:
+            packet['location'] = spatial.get_location()
+        if recorder is not None:
+            recorder.add_fix(packet['location'])
+        packet['landmarks'] = spatial.get_nearby_landmarks(packet['location'], radius_km=1.0)
+        if packet['landmarks'] != latest_context['landmarks']:
+            print(f"Nearby landmarks: {packet['landmarks']}")
+        latest_context.update(location=packet['location'], landmarks=packet['landmarks'],
+                              detections=packet['detections'])
+        return packet
 
-        # Detect objects in the current frame using the visual recognition module
-        detected_objects, frame_with_boxes = visual_recognition.detect_objects(frame)
+    def read_query():
+        # User input (text query) arrives asynchronously, so the AR view never stalls
+        submit_query(input("Ask something (e.g., 'What's special here?'): "))
 
-        # Display the current frame with bounding boxes drawn around detected objects
-        cv2.imshow("AR View - Object Detection", frame_with_boxes)
+    def submit_query(query):
+        if recorder is not None:
+            recorder.add_query(query)
+        queries.put(query)
 
-        # Get the current spatial (GPS) location of the user
-        current_location = spatial_recognition.get_location()
-        nearby_landmarks = spatial_recognition.get_nearby_landmarks(current_location, radius_km=1.0)
-        print(f"Nearby landmarks: {nearby_landmarks}")
+    def replay_query(query):
+        # Runs inside ReplaySource.read() on the capture thread, so it must not block
+        nonlocal dropped_queries
+        if recorder is not None:
+            recorder.add_query(query)
+        try:
+            queries.put_nowait(query)
+        except queue.Full:
+            dropped_queries += 1
 
-        # User input (simulate text query input)
-        query = input("Ask something (e.g., 'What's special here?'): ")
+    def answer(query):
+        try:
+            return answer_query(query)
+        finally:
+            queries.task_done()  # lets the end of a replay wait for queued queries
 
-        # Generate multiple probabilistic interpretations using twisted SMC (placeholder)
+    def answer_query(query):
+        lm = language_model.get()
+        # Generate multiple probabilistic interpretations
         print("Interpreting query with multiple possible outcomes...")
-        probabilistic_interpretations = language_model.get_probabilistic_interpretations(query, num_samples=3)
+        probabilistic_interpretations = lm.get_probabilistic_interpretations(query, num_samples=3)
         print(f"Possible interpretations: {probabilistic_interpretations}")
 
-        # Example: Use visual context (landmarks) to refine query interpretation
-        if nearby_landmarks:
-            refined_interpretation = language_model.interpret_with_context(query, {"landmark": nearby_landmarks[0]})
+        # Use the latest visual/spatial context (landmarks) to refine query interpretation
+        landmarks = latest_context['landmarks']
+        if landmarks:
+            refined_interpretation = lm.interpret_with_context(query, {"landmark": landmarks[0]})
             print(f"Refined interpretation with context: {refined_interpretation}")
-        
-        # Press 'q' to quit the loop and end the program
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        if "time to first answer" not in startup_timer.milestones:
+            startup_timer.mark("time to first answer")
+            startup_timer.print_report()
+        return None
+
+    pipeline.add_stage('capture', capture, outbox=frames)
+    pipeline.add_stage('detect', detect, inbox=frames, outbox=detections)
+    pipeline.add_stage('context', fuse_context, inbox=detections, outbox=render)
+    pipeline.add_stage('answer', answer, inbox=queries)
+    if isinstance(cap, ReplaySource):
+        # Recorded queries arrive in order with the frames they were asked during
+        cap.on_query = replay_query
+    else:
+        # The stdin reader blocks in input(), so it runs outside the pipeline's shutdown handling
+        threading.Thread(target=_repeat, args=(read_query, pipeline), name="query-reader", daemon=True).start()
+    return pipeline
+
 
-    # Release the video capture and close windows
-    cap.release()
-    cv2.destroyAllWindows()
+def build_tracker(visual_recognition, args):
+    from ar.tracking import TrackingDetector
+
+    return TrackingDetector(
+        visual_recognition,
+        max_interval=args.max_keyframe_interval,
+        latency_budget_ms=args.latency_budget_ms,
+        use_optical_flow=args.optical_flow
+    )
+
+
+def _repeat(fn, pipeline):
+    # Call fn until the pipeline stops or stdin is closed
+    while pipeline.running:
+        try:
+            fn()
+        except EOFError:
+            break
 
 if __name__ == "__main__":
     main()
-
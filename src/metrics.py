@@ -0,0 +1,348 @@
+import bisect
+import functools
+import json
+import math
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from 100 us to 10 s
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                           0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        Cumulative-bucket histogram in the Prometheus style.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile (bucket resolution)
+        with self._lock:
+            rank, seen = q * self.count, 0
+            for bound, count in zip(self.buckets + (math.inf,), self.counts):
+                seen += count
+                if seen >= rank and seen > 0:
+                    return bound
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, total = [], 0
+            for count in self.counts:
+                total += count
+                cumulative.append(total)
+            return {'buckets': dict(zip([*map(str, self.buckets), '+Inf'], cumulative)),
+                    'sum': self.sum, 'count': self.count}
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = float(value)
+
+    def snapshot(self):
+        return self.value
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class _NullTimer:
+    # Shared no-op context manager handed out while metrics are disabled
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.began)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=False, prefix='arnav_'):
+        """
+        Collection of labelled histograms, gauges and counters. Disabled registries
+        hand out a shared no-op timer and skip every update, so instrumented hot
+        paths cost a flag check when metrics are off.
+
+        Args:
+            enabled (bool): Start collecting immediately.
+            prefix (str): Prepended to every metric name on export.
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.help = {}
+        self._metrics = {}  # (kind, name, labels) -> metric
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _get(self, kind, factory, name, labels):
+        key = (kind, name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, factory())
+        return metric
+
+    def histogram(self, name, **labels):
+        return self._get('histogram', Histogram, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get('gauge', Gauge, name, labels)
+
+    def counter(self, name, **labels):
+        return self._get('counter', Counter, name, labels)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def timer(self, stage):
+        """
+        Context manager recording the block's duration in stage_latency_seconds{stage=...}.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram('stage_latency_seconds', stage=stage))
+
+    def timed(self, stage):
+        """
+        Decorator recording every call's duration under the given stage.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self.histogram('stage_latency_seconds', stage=stage)):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def to_json(self):
+        """
+        Returns:
+            dict: kind -> metric name -> list of {'labels', 'value'} entries.
+        """
+        result = {'histogram': {}, 'gauge': {}, 'counter': {}}
+        for (kind, name, labels), metric in sorted(self._metrics.items()):
+            result[kind].setdefault(name, []).append({'labels': dict(labels), 'value': metric.snapshot()})
+        return result
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format.
+        """
+        lines, described = [], set()
+        for (kind, name, labels), metric in sorted(self._metrics.items()):
+            full_name = self.prefix + name
+            if full_name not in described:
+                if name in self.help:
+                    lines.append(f"# HELP {full_name} {self.help[name]}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                described.add(full_name)
+            if kind == 'histogram':
+                snapshot = metric.snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {snapshot['sum']}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {snapshot['count']}")
+            else:
+                lines.append(f"{full_name}{_format_labels(labels)} {metric.snapshot()}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+# Process-wide registry used by the instrumented modules; disabled until enable() is called
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('stage_latency_seconds', "Latency of an instrumented stage in seconds.")
+REGISTRY.describe('smc_ess', "Effective sample size after the latest step.")
+REGISTRY.describe('smc_weight_entropy', "Entropy of the normalized weights after the latest step (nats).")
+REGISTRY.describe('smc_num_particles', "Particles in the population.")
+REGISTRY.describe('smc_resample_fraction', "Fraction of steps that resampled.")
+REGISTRY.describe('smc_steps_total', "SMC steps taken.")
+REGISTRY.describe('smc_resamples_total', "SMC resampling events.")
+
+
+def record_smc_step(engine, diagnostics, step, registry=REGISTRY):
+    """
+    Publish the health of one SMC step as gauges and counters labelled by engine.
+
+    Args:
+        engine (str): Label distinguishing SMC engines (e.g. the class name).
+        diagnostics (dict): The step's diagnostics (ess, entropy, num_particles,
+            resampled, resample_count).
+        step (int): Steps taken so far, for the resample frequency.
+    """
+    if not registry.enabled:
+        return
+    registry.gauge('smc_ess', engine=engine).set(diagnostics['ess'])
+    registry.gauge('smc_weight_entropy', engine=engine).set(diagnostics['entropy'])
+    registry.gauge('smc_num_particles', engine=engine).set(diagnostics['num_particles'])
+    registry.gauge('smc_resample_fraction', engine=engine).set(diagnostics['resample_count'] / max(step, 1))
+    registry.counter('smc_steps_total', engine=engine).inc()
+    if diagnostics['resampled']:
+        registry.counter('smc_resamples_total', engine=engine).inc()
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.01, max_depth=64):
+        """
+        Statistical profiler: a background thread samples every other thread's stack
+        at a fixed interval and tallies them, at a cost independent of how much code
+        runs. Output is in the collapsed-stack format flame graph tools read.
+
+        Args:
+            interval (float): Seconds between samples.
+            max_depth (int): Innermost frames kept per stack.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self):
+        # "thread;outer;...;inner count" lines, heaviest first
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def top(self, n=20):
+        """
+        Returns:
+            list: (function, samples) pairs for the functions most often on top of a stack.
+        """
+        leaves = _Tally()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(n)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class MetricsServer:
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9100, profiler=None):
+        """
+        HTTP endpoint exporting the registry on a daemon thread:
+        /metrics (Prometheus text), /metrics.json, and /profile (collapsed stacks)
+        when a SamplingProfiler is attached.
+
+        Args:
+            registry (MetricsRegistry): Metrics to export.
+            host (str): Interface to bind.
+            port (int): Port to bind (0 picks a free one).
+            profiler (SamplingProfiler): Optional profiler to expose.
+        """
+        self.registry = registry
+        self.profiler = profiler
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = server.registry.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(server.registry.to_json()), 'application/json'
+                elif self.path == '/profile' and server.profiler is not None:
+                    body, content_type = server.profiler.collapsed(), 'text/plain'
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass  # Scrapes would otherwise flood stderr
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,255 @@
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries=128, max_bytes=None, size_fn=None):
+        """
+        Least-recently-used cache bounded by entry count and, optionally, by a
+        memory budget.
+
+        Args:
+            max_entries (int): Maximum number of cached entries.
+            max_bytes (int): Memory budget in bytes; None disables size-based eviction.
+            size_fn (callable): Returns the size in bytes of a cached value.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn or (lambda value: 0)
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        Look up a key, marking it as most recently used.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Insert or replace a key, evicting least recently used entries as needed.
+        """
+        self._discard(key)
+        size = self.size_fn(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Larger than the whole budget; not worth caching
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def values(self):
+        # Cached values, least recently used first (does not count as a use)
+        return list(self._entries.values())
+
+    def invalidate(self, key):
+        """
+        Remove a key if present.
+
+        Returns:
+            bool: Whether the key was cached.
+        """
+        return self._discard(key)
+
+    def _discard(self, key):
+        # In-memory removal only; subclasses with persistent tiers extend invalidate()
+        if key not in self._entries:
+            return False
+        del self._entries[key]
+        self.total_bytes -= self._sizes.pop(key)
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters, entry count and memory usage.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+        }
+
+
+def canonical_key(*parts):
+    """
+    Build a stable string key from JSON-like parts (dicts are sorted by key), so
+    equal contexts map to the same cache entry regardless of insertion order.
+    """
+    return json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class DiskCache:
+    def __init__(self, path, max_entries=None, purge_every=256):
+        """
+        Persistent key/value tier backed by SQLite, surviving process restarts.
+        Every purge_every writes, expired rows are deleted and, beyond max_entries,
+        the least recently written ones, so the file stays bounded on long runs.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_entries (int): Maximum rows kept; None only purges expired rows.
+            purge_every (int): Writes between purges.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+
+    def get(self, key, now=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and now is not None and expires <= now:
+            self.invalidate(key)
+            return None
+        return pickle.loads(value), expires
+
+    def put(self, key, value, expires=None, now=None):
+        with self._lock, self._conn:
+            # REPLACE deletes and re-inserts, so rowid order is write order
+            self._conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                               (key, pickle.dumps(value), expires))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge(now)
+
+    def purge(self, now=None):
+        """
+        Delete expired rows, then the least recently written rows beyond max_entries.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        with self._lock, self._conn:
+            return self._purge(now)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def invalidate(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        self._conn.close()
+
+    def _purge(self, now):
+        now = time.time() if now is None else now
+        deleted = self._conn.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?",
+                                     (now,)).rowcount
+        if self.max_entries is not None:
+            deleted += self._conn.execute(
+                "DELETE FROM cache WHERE rowid NOT IN (SELECT rowid FROM cache ORDER BY rowid DESC LIMIT ?)",
+                (self.max_entries,)).rowcount
+        return deleted
+
+
+class TTLCache(LRUCache):
+    def __init__(self, max_entries=1024, ttl=None, max_bytes=None, size_fn=None, path=None, clock=time.time,
+                 max_disk_entries=100000):
+        """
+        LRU cache whose entries also expire after a time-to-live, with an optional
+        on-disk tier that is consulted on in-memory misses.
+
+        Args:
+            max_entries (int): Maximum number of in-memory entries.
+            ttl (float): Lifetime of an entry in seconds; None never expires.
+            max_bytes (int): Optional in-memory byte budget.
+            size_fn (callable): Returns the size in bytes of a cached value.
+            path (str): Optional SQLite file for the persistent tier.
+            clock (callable): Wall-clock time source (wall time, so expiry survives restarts).
+            max_disk_entries (int): Row bound of the on-disk tier; None only drops expired rows.
+        """
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes,
+                         size_fn=(lambda entry: size_fn(entry[1])) if size_fn else None)
+        self.ttl = ttl
+        self.clock = clock
+        self.disk = DiskCache(path, max_entries=max_disk_entries) if path else None
+
+    def get(self, key, default=None):
+        now = self.clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= now:
+            self._discard(key)
+            entry = None
+        if entry is not None:
+            return super().get(key)[1]
+
+        if self.disk is not None:
+            stored = self.disk.get(key, now)
+            if stored is not None:
+                value, expires = stored
+                super().put(key, (expires, value))
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value, ttl=None):
+        # ttl overrides the cache-wide lifetime for this entry
+        ttl = self.ttl if ttl is None else ttl
+        now = self.clock()
+        expires = now + ttl if ttl is not None else None
+        super().put(key, (expires, value))
+        if self.disk is not None:
+            self.disk.put(key, value, expires, now)
+
+    def invalidate(self, key):
+        if self.disk is not None:
+            self.disk.invalidate(key)
+        return super().invalidate(key)
+
+    def clear(self):
+        if self.disk is not None:
+            self.disk.clear()
+        super().clear()
+
+    def close(self):
+        # Close the on-disk tier's connection; the in-memory entries stay usable
+        if self.disk is not None:
+            self.disk.close()
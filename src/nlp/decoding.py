@@ -0,0 +1,157 @@
+import numpy as np
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+from nlp.twisted_smc import TwistedSMC
+
+
+def fork_cache(past_key_values, indices):
+    """
+    Reorder a decoder KV-cache along the batch axis so each particle inherits its
+    ancestor's cache instead of recomputing it.
+
+    Args:
+        past_key_values: A transformers Cache object or the legacy tuple-of-tuples cache.
+        indices (numpy.ndarray): Ancestor index of each particle.
+
+    Returns:
+        The forked cache.
+    """
+    index = torch.as_tensor(np.asarray(indices), dtype=torch.long)
+    if hasattr(past_key_values, 'reorder_cache'):
+        past_key_values.reorder_cache(index)
+        return past_key_values
+    # Legacy layout: (self_key, self_value, cross_key, cross_value) per layer. The
+    # cross-attention entries are identical for every particle and are left shared.
+    return tuple(
+        tuple(state.index_select(0, index) for state in layer[:2]) + tuple(layer[2:])
+        for layer in past_key_values
+    )
+
+
+class TokenTwistedSMC(TwistedSMC):
+    def __init__(self, model, encoder_outputs, attention_mask, num_particles, twist_function=None,
+                 max_length=50, temperature=1.0, top_k=50, **kwargs):
+        """
+        Twisted SMC over partial seq2seq decodes. All particles are advanced one
+        token per step as a single batch through the decoder, reweighted by the
+        target/proposal ratio and the twist, and resampled with the decoder
+        KV-cache forked by ancestor index.
+
+        Args:
+            model: A transformers encoder-decoder model (e.g. BART).
+            encoder_outputs: Encoder output for the query (batch size 1); shared by all particles.
+            attention_mask (torch.Tensor): Encoder attention mask of shape (1, seq_len).
+            num_particles (int): Number of partial decodes.
+            twist_function (callable): Optional ``twist_function(tokens, context)``
+                returning the log-twist of each prefix in an (N, t) token array.
+                The twist at the final step acts as a terminal potential.
+                Wrap learned twists in nlp.twist_cache.CachedTwist to evaluate each
+                distinct prefix once.
+            max_length (int): Maximum decoded length, including start tokens.
+            temperature (float): Proposal temperature.
+            top_k (int): Proposal restricted to the k most probable tokens (0 disables).
+            **kwargs: Resampling options forwarded to TwistedSMC.
+        """
+        super().__init__(num_particles, proposal_dist=None, twist_function=twist_function,
+                         log_likelihood_fn=self._incremental_log_weights, **kwargs)
+        self.model = model
+        self.max_length = max_length
+        self.temperature = temperature
+        self.top_k = top_k
+        config = model.config
+        self.eos_token_id = config.eos_token_id
+        self.pad_token_id = config.pad_token_id
+        self.start_tokens = [config.decoder_start_token_id]
+        if getattr(config, 'forced_bos_token_id', None) is not None:
+            self.start_tokens.append(config.forced_bos_token_id)
+
+        # Broadcast the single encoder pass over the particle batch (expand, no copy)
+        hidden = encoder_outputs.last_hidden_state
+        self.encoder_outputs = BaseModelOutput(last_hidden_state=hidden.expand(num_particles, *hidden.shape[1:]))
+        self.attention_mask = attention_mask.expand(num_particles, -1)
+        self.past_key_values = None
+        self._increment = np.zeros(num_particles)
+
+    def initialize_particles(self, initial_state=None):
+        # Every particle starts from the decoder start tokens with an empty cache
+        tokens = np.tile(np.array(self.start_tokens, dtype=np.int64), (self.num_particles, 1))
+        self.particles = {
+            'tokens': tokens,
+            'finished': np.zeros(self.num_particles, dtype=bool),
+            'log_twist': np.zeros(self.num_particles),
+        }
+        self.past_key_values = None
+        self.reset_weights()
+        self.log_evidence = 0.0
+        self.resample_count = 0
+        self.history = []
+
+    @property
+    def done(self):
+        particles = self.particles
+        return bool(particles['finished'].all()) or particles['tokens'].shape[1] >= self.max_length
+
+    @torch.no_grad()
+    def twist(self, particles, context):
+        # Propose the next token for every particle from one batched decoder call
+        tokens = particles['tokens']
+        decoder_input = tokens if self.past_key_values is None else tokens[:, -1:]
+        outputs = self.model(
+            encoder_outputs=self.encoder_outputs,
+            attention_mask=self.attention_mask,
+            decoder_input_ids=torch.from_numpy(np.ascontiguousarray(decoder_input)),
+            past_key_values=self.past_key_values,
+            use_cache=True,
+        )
+        self.past_key_values = outputs.past_key_values
+        logits = outputs.logits[:, -1, :].float()
+
+        # Target is the untempered model; the proposal is tempered and top-k truncated
+        log_p = torch.log_softmax(logits, dim=-1)
+        proposal_logits = logits / self.temperature
+        if self.top_k:
+            kth = torch.topk(proposal_logits, min(self.top_k, proposal_logits.shape[-1]), dim=-1).values[:, -1:]
+            proposal_logits = proposal_logits.masked_fill(proposal_logits < kth, float('-inf'))
+        log_q = torch.log_softmax(proposal_logits, dim=-1)
+        next_tokens = torch.multinomial(log_q.exp(), 1)
+
+        log_ratio = (log_p.gather(1, next_tokens) - log_q.gather(1, next_tokens)).squeeze(1).numpy()
+        next_tokens = next_tokens.squeeze(1).numpy()
+
+        # Finished decodes are padded and carry their weight forward unchanged
+        finished = particles['finished']
+        next_tokens = np.where(finished, self.pad_token_id, next_tokens)
+        tokens = np.concatenate([tokens, next_tokens[:, None]], axis=1)
+
+        log_twist = particles['log_twist']
+        if self.twist_function is not None:
+            log_twist = np.where(finished, log_twist,
+                                 np.asarray(self.twist_function(tokens, context), dtype=float))
+        self._increment = np.where(finished, 0.0, log_ratio + log_twist - particles['log_twist'])
+        return {
+            'tokens': tokens,
+            'finished': finished | (next_tokens == self.eos_token_id),
+            'log_twist': log_twist,
+        }
+
+    def _incremental_log_weights(self, particles, context):
+        # Increments are computed alongside the proposal in twist()
+        return self._increment
+
+    def resample(self):
+        indices = super().resample()
+        self.past_key_values = fork_cache(self.past_key_values, indices)
+        return indices
+
+    def run(self, context=None):
+        """
+        Decode until every particle has emitted EOS or max_length is reached.
+
+        Returns:
+            tuple: (tokens, weights) for the final particle population.
+        """
+        self.initialize_particles()
+        while not self.done:
+            self.step(context)
+        return self.particles['tokens'], self.weights
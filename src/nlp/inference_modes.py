@@ -0,0 +1,163 @@
+import argparse
+import difflib
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+INFERENCE_MODES = ('fp32', 'int8', 'bf16')
+
+# Fixed query set used to compare modes against the fp32 baseline
+DEFAULT_QUERIES = [
+    "What's special here?",
+    "What is the capital of France?",
+    "Where is the nearest subway station?",
+    "Tell me about the Empire State Building.",
+    "Is this restaurant open now?",
+    "How tall is this building?",
+    "What events are happening in Bryant Park today?",
+    "Which way is Times Square?",
+]
+
+
+def bf16_supported():
+    # oneDNN reports whether this CPU runs bf16 natively (AVX512-BF16/AMX, or the
+    # AVX512 subsets it accelerates); elsewhere bf16 is emulated and slower than fp32
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):  # Older torch builds without the query
+        return False
+
+
+def apply_inference_mode(model, mode='fp32', compile=False):
+    """
+    Convert a model in place (where possible) to a reduced-precision CPU inference mode.
+
+    Args:
+        model (torch.nn.Module): The full-precision model.
+        mode (str): 'fp32', 'int8' (dynamic quantization of nn.Linear layers) or 'bf16'.
+        compile (bool): Wrap the forward pass with torch.compile.
+
+    Returns:
+        tuple: (model, effective_mode). bf16 falls back to fp32 when unsupported.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{mode}'. Choose from {INFERENCE_MODES}.")
+    model.eval()
+    if mode == 'int8':
+        quantization = getattr(torch, 'ao', torch).quantization
+        model = quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif mode == 'bf16':
+        if bf16_supported():
+            model = model.to(torch.bfloat16)
+        else:
+            print("bf16 is not natively supported on this CPU; falling back to fp32.")
+            mode = 'fp32'
+    if compile:
+        if hasattr(torch, 'compile'):
+            # dynamic=True avoids recompiling for every new sequence length during generate
+            model.forward = torch.compile(model.forward, dynamic=True)
+        else:
+            print("torch.compile is not available in this torch version; running eagerly.")
+    return model, mode
+
+
+def _benchmark_mode(model_name, mode, queries, repeats, compile):
+    # Runs in a fresh process so peak RSS reflects this mode alone
+    from nlp.model import LanguageModel
+
+    torch.manual_seed(0)
+    language_model = LanguageModel(model_name, inference_mode=mode, compile=compile)
+    language_model.generate_response(queries[0])  # Warm-up (and compilation, if enabled)
+
+    latencies = []
+    outputs = []
+    for _ in range(repeats):
+        language_model.encoder_cache.clear()
+        outputs = []
+        for query in queries:
+            began = time.perf_counter()
+            outputs.append(language_model.generate_response(query))
+            latencies.append(time.perf_counter() - began)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (2**20 if sys.platform == 'darwin' else 2**10)
+    return {
+        'mode': language_model.inference_mode,
+        'latency_ms_median': 1000 * float(np.median(latencies)),
+        'latency_ms_p90': 1000 * float(np.percentile(latencies, 90)),
+        'peak_rss_mb': peak_rss_mb,
+        'outputs': outputs,
+    }
+
+
+def compare_inference_modes(model_name='facebook/bart-large', modes=INFERENCE_MODES, queries=None,
+                            repeats=3, compile=False):
+    """
+    Measure latency, peak RSS and output agreement of each inference mode against
+    the fp32 baseline on a fixed query set. Every mode runs in its own process.
+
+    Args:
+        model_name (str): Model to load.
+        modes (iterable): Inference modes to compare; fp32 is always included as baseline.
+        queries (list): Queries to run (defaults to DEFAULT_QUERIES).
+        repeats (int): Passes over the query set per mode.
+        compile (bool): Also apply torch.compile.
+
+    Returns:
+        list: One report dict per mode with latency, memory, exact-match rate and
+        mean string similarity against fp32.
+    """
+    queries = queries or DEFAULT_QUERIES
+    modes = ['fp32'] + [mode for mode in modes if mode != 'fp32']
+    context = multiprocessing.get_context('spawn')
+
+    reports = []
+    for mode in modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report = pool.submit(_benchmark_mode, model_name, mode, queries, repeats, compile).result()
+        report['requested_mode'] = mode
+        reports.append(report)
+
+    baseline = reports[0]['outputs']
+    for report in reports:
+        pairs = list(zip(baseline, report['outputs']))
+        report['exact_match'] = sum(a == b for a, b in pairs) / len(pairs)
+        report['similarity'] = float(np.mean([difflib.SequenceMatcher(None, a, b).ratio() for a, b in pairs]))
+    return reports
+
+
+def pick_cheapest(reports, min_similarity=0.9):
+    """
+    Pick the fastest mode whose outputs stay within the similarity tolerance of fp32,
+    or fp32 itself when no report qualifies.
+    """
+    eligible = [report for report in reports if report['similarity'] >= min_similarity]
+    if not eligible:
+        return 'fp32'
+    return min(eligible, key=lambda report: report['latency_ms_median'])['mode']
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare reduced-precision inference modes against fp32.")
+    parser.add_argument('--model', default='facebook/bart-large')
+    parser.add_argument('--modes', nargs='+', default=list(INFERENCE_MODES), choices=INFERENCE_MODES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--compile', action='store_true')
+    parser.add_argument('--min-similarity', type=float, default=0.9)
+    args = parser.parse_args()
+
+    reports = compare_inference_modes(args.model, args.modes, repeats=args.repeats, compile=args.compile)
+    print(f"{'mode':<8}{'median ms':>12}{'p90 ms':>10}{'peak RSS MB':>14}{'exact':>8}{'similarity':>12}")
+    for report in reports:
+        print(f"{report['requested_mode']:<8}{report['latency_ms_median']:>12.1f}{report['latency_ms_p90']:>10.1f}"
+              f"{report['peak_rss_mb']:>14.0f}{report['exact_match']:>8.2f}{report['similarity']:>12.3f}")
+    print(f"Cheapest mode within tolerance: {pick_cheapest(reports, args.min_similarity)}")
@@ -1,15 +1,102 @@
+import inspect
+
 import torch
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers.modeling_outputs import BaseModelOutput
+
+from metrics import REGISTRY
+from nlp.cache import LRUCache, TTLCache, canonical_key
+from nlp.decoding import TokenTwistedSMC
+from nlp.inference_modes import apply_inference_mode
+
+
+def _encoded_nbytes(entry):
+    # Memory held by a cached (inputs, encoder hidden states) pair
+    inputs, hidden = entry
+    tensors = list(inputs.values()) + [hidden]
+    return sum(t.element_size() * t.nelement() for t in tensors if isinstance(t, torch.Tensor))
+
 
 class LanguageModel:
-    def __init__(self, model_name='facebook/bart-large'):
+    def __init__(self, model_name='facebook/bart-large', cache_entries=64, cache_bytes=256 * 2**20,
+                 result_cache_entries=1024, result_cache_ttl=600, result_cache_path=None,
+                 tokenizer=None, model=None, inference_mode='fp32', compile=False):
         """
         Initialize the language model and tokenizer.
         The default model used here is a BART model for query interpretation,
         but this can be replaced with other models like GPT or T5.
+
+        Args:
+            model_name (str): Hugging Face model name or local checkpoint path.
+            cache_entries (int): Maximum number of queries kept in the encoder cache.
+            cache_bytes (int): Memory budget of the encoder cache in bytes.
+            result_cache_entries (int): Maximum number of cached interpretation results.
+            result_cache_ttl (float): Lifetime of a cached interpretation in seconds.
+            result_cache_path (str): Optional SQLite file persisting results across restarts.
+            tokenizer: Already constructed tokenizer (skips from_pretrained).
+            model: Already constructed model (skips from_pretrained).
+            inference_mode (str): CPU inference precision: 'fp32', 'int8' (dynamic
+                quantization of linear layers) or 'bf16' (falls back to fp32 when unsupported).
+                See nlp.inference_modes.compare_inference_modes to pick one.
+            compile (bool): Compile the forward pass with torch.compile.
+        """
+        self.model_name = model_name
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_name)
+        self.model = model or AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        self.inference_mode = 'fp32'
+        if inference_mode != 'fp32' or compile:
+            self.model, self.inference_mode = apply_inference_mode(self.model, inference_mode, compile)
+        # Tokenized inputs and encoder hidden states, keyed by the normalized query
+        self.encoder_cache = LRUCache(max_entries=cache_entries, max_bytes=cache_bytes, size_fn=_encoded_nbytes)
+        # Final interpretations, keyed by the normalized query plus the canonicalized context
+        self.result_cache = TTLCache(max_entries=result_cache_entries, ttl=result_cache_ttl, path=result_cache_path)
+
+    def save_snapshot(self, path):
+        """
+        Serialize the ready-to-run tokenizer and model into a single file that
+        from_snapshot() loads faster than from_pretrained() (no config resolution,
+        weight initialization or checkpoint key mapping). A torch.compile'd forward
+        does not pickle, so it is left out; pass compile=True to from_snapshot() instead.
+
+        Args:
+            path (str): Destination file.
         """
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        compiled_forward = self.model.__dict__.pop('forward', None)
+        try:
+            torch.save({'model_name': self.model_name, 'tokenizer': self.tokenizer, 'model': self.model,
+                        'inference_mode': self.inference_mode}, path)
+        finally:
+            if compiled_forward is not None:
+                self.model.forward = compiled_forward
+
+    @classmethod
+    def from_snapshot(cls, path, **kwargs):
+        """
+        Build a LanguageModel from a file written by save_snapshot().
+
+        Args:
+            path (str): Snapshot file.
+            **kwargs: Cache options forwarded to the constructor.
+
+        Returns:
+            LanguageModel: The restored model, in eval mode.
+        """
+        load_kwargs = {'map_location': 'cpu', 'weights_only': False}
+        if 'mmap' in inspect.signature(torch.load).parameters:
+            load_kwargs['mmap'] = True  # Page weights in lazily where torch supports it
+        snapshot = torch.load(path, **load_kwargs)
+        snapshot['model'].eval()
+        language_model = cls(model_name=snapshot['model_name'], tokenizer=snapshot['tokenizer'],
+                             model=snapshot['model'], **kwargs)
+        if language_model.inference_mode == 'fp32':
+            # Snapshots of quantized/bf16 models are restored already converted
+            language_model.inference_mode = snapshot.get('inference_mode', 'fp32')
+        return language_model
+
+    @staticmethod
+    def normalize_query(query):
+        # Collapse whitespace so trivially different spellings share a cache entry
+        return " ".join(query.split())
 
     def preprocess_query(self, query):
         """
@@ -21,9 +108,108 @@ class LanguageModel:
         Returns:
             torch.Tensor: The tokenized input in tensor format.
         """
-        inputs = self.tokenizer(query, return_tensors="pt")
+        with REGISTRY.timer('tokenize'):
+            inputs = self.tokenizer(query, return_tensors="pt")
         return inputs
 
+    def encode_query(self, query):
+        """
+        Tokenize the query and run the encoder, reusing cached results for repeated queries.
+
+        Args:
+            query (str): The user input query in natural language.
+
+        Returns:
+            tuple: (inputs, encoder_hidden_states) for the normalized query.
+        """
+        key = self.normalize_query(query)
+        entry = self.encoder_cache.get(key)
+        if entry is None:
+            inputs = self.preprocess_query(key)
+            with torch.no_grad(), REGISTRY.timer('encoder'):
+                hidden = self.model.get_encoder()(
+                    input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).last_hidden_state
+            entry = (inputs, hidden)
+            self.encoder_cache.put(key, entry)
+        return entry
+
+    def encode_batch(self, queries):
+        """
+        Encode several queries as one right-padded batch. Queries missing from the
+        encoder cache go through a single padded encoder call and are cached unpadded,
+        so later single or batched calls reuse them.
+
+        Args:
+            queries (list): User input queries.
+
+        Returns:
+            tuple: (input_ids, attention_mask, encoder_hidden_states), padded to the longest query.
+        """
+        keys = [self.normalize_query(query) for query in queries]
+        entries = {key: self.encoder_cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, entry in entries.items() if entry is None]
+        if missing:
+            with REGISTRY.timer('tokenize'):
+                inputs = self.tokenizer(missing, return_tensors="pt", padding=True)
+            with torch.no_grad(), REGISTRY.timer('encoder'):
+                hidden = self.model.get_encoder()(
+                    input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).last_hidden_state
+            for i, key in enumerate(missing):
+                keep = inputs['attention_mask'][i].bool()
+                entry = ({'input_ids': inputs['input_ids'][i:i + 1, keep],
+                          'attention_mask': inputs['attention_mask'][i:i + 1, keep]}, hidden[i:i + 1, keep])
+                entries[key] = entry
+                self.encoder_cache.put(key, entry)
+
+        length = max(entry[0]['input_ids'].shape[1] for entry in entries.values())
+        hidden_size = next(iter(entries.values()))[1].shape[-1]
+        input_ids = torch.full((len(keys), length), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(keys), length), dtype=torch.long)
+        hidden = torch.zeros((len(keys), length, hidden_size), dtype=next(iter(entries.values()))[1].dtype)
+        for i, key in enumerate(keys):
+            inputs, states = entries[key]
+            n = inputs['input_ids'].shape[1]
+            input_ids[i, :n] = inputs['input_ids'][0]
+            attention_mask[i, :n] = inputs['attention_mask'][0]
+            hidden[i, :n] = states[0]
+        return input_ids, attention_mask, hidden
+
+    def generate_batch(self, queries, **generate_kwargs):
+        """
+        Generate responses for several queries with one padded generate call.
+
+        Args:
+            queries (list): User input queries.
+            **generate_kwargs: Forwarded to generate (defaults to max_length=50).
+
+        Returns:
+            List[str]: One decoded response per query, in order.
+        """
+        if not queries:
+            return []
+        generate_kwargs.setdefault('max_length', 50)
+        input_ids, attention_mask, hidden = self.encode_batch(queries)
+        with REGISTRY.timer('generate'):
+            output_ids = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                **generate_kwargs
+            )
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+    def _generate(self, query, **generate_kwargs):
+        # generate() skips the encoder when handed its outputs; wrap the cached hidden
+        # states in a fresh output object because generate expands it in place
+        inputs, hidden = self.encode_query(query)
+        with REGISTRY.timer('generate'):
+            return self.model.generate(
+                inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                **generate_kwargs
+            )
+
     def generate_response(self, query):
         """
         Generate a response from the language model based on the query.
@@ -34,12 +220,11 @@ class LanguageModel:
         Returns:
             str: The language model's best guess for the query interpretation.
         """
-        inputs = self.preprocess_query(query)
-        output_ids = self.model.generate(inputs['input_ids'], max_length=50)
+        output_ids = self._generate(query, max_length=50)
         response = self.tokenizer.decode(output_ids[0], skip_special_tokens=True)
         return response
 
-    def get_probabilistic_interpretations(self, query, num_samples=5):
+    def get_probabilistic_interpretations(self, query, num_samples=5, use_cache=False):
         """
         Generate multiple probabilistic interpretations of the query.
         This method can be integrated with Twisted SMC to sample different 
@@ -48,29 +233,106 @@ class LanguageModel:
         Args:
             query (str): The user input query.
             num_samples (int): Number of probabilistic interpretations to generate.
+            use_cache (bool): Reuse a previous set of samples for this query from the result
+                cache. Off by default, since sampled calls are expected to vary.
         
         Returns:
             List[str]: A list of generated interpretations of the query.
         """
-        interpretations = []
-        
-        for _ in range(num_samples):
-            # Sample different responses based on slight variations or randomness
-            # In practice, this would integrate with the Twisted SMC for proposal distribution adjustments
-            inputs = self.preprocess_query(query)
-            output_ids = self.model.generate(
-                inputs['input_ids'], 
-                do_sample=True,         # Enable sampling to get diverse outputs
-                max_length=50, 
-                top_k=50,               # Randomly sample from top k most probable words
-                temperature=0.7         # Introduce randomness for diversity
-            )
-            interpretation = self.tokenizer.decode(output_ids[0], skip_special_tokens=True)
-            interpretations.append(interpretation)
-        
+        key = self.result_key('get_probabilistic_interpretations', query, {'num_samples': num_samples})
+        if use_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return list(cached)
+
+        # Encode once and draw every sample from a single batched generate call
+        output_ids = self._generate(
+            query,
+            do_sample=True,         # Enable sampling to get diverse outputs
+            max_length=50,
+            top_k=50,               # Randomly sample from top k most probable words
+            temperature=0.7,        # Introduce randomness for diversity
+            num_return_sequences=num_samples
+        )
+        interpretations = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        if use_cache:
+            self.result_cache.put(key, list(interpretations))
         return interpretations
 
-    def interpret_with_context(self, query, context):
+    def get_weighted_interpretations(self, query, num_particles=16, context=None, twist_function=None,
+                                     max_length=50, temperature=0.7, top_k=50, deadline=None, **smc_kwargs):
+        """
+        Generate weighted interpretations of the query with token-level twisted SMC.
+        Particles are partial decodes advanced one token at a time as a single batch,
+        reweighted by the twist and resampled, with the decoder KV-cache forked by index.
+
+        Args:
+            query (str): The user input query.
+            num_particles (int): Number of partial decodes in the population.
+            context (dict): Contextual information passed to the twist function.
+            twist_function (callable): Optional ``twist_function(tokens, context)`` returning
+                the log-twist of each prefix in an (N, t) token array.
+            max_length (int): Maximum decoded length.
+            temperature (float): Proposal temperature.
+            top_k (int): Proposal top-k truncation.
+            deadline (float): Optional time.perf_counter() value; decoding stops before
+                it and the (possibly partial) interpretations so far are returned.
+            **smc_kwargs: Resampling options forwarded to TwistedSMC (e.g. resampling, ess_threshold).
+
+        Returns:
+            List[tuple]: (interpretation, weight) pairs, merged by text and sorted by weight.
+        """
+        smc = self._token_smc(query, num_particles, twist_function, max_length, temperature, top_k, **smc_kwargs)
+        if deadline is None:
+            tokens, weights = smc.run(context)
+        else:
+            smc.initialize_particles()
+            smc.run_until(deadline, context, top_k=0)
+            tokens, weights = smc.particles['tokens'], smc.weights
+        return self._merge_interpretations(tokens, weights)
+
+    def stream_weighted_interpretations(self, query, num_particles=16, context=None, twist_function=None,
+                                        max_length=50, temperature=0.7, top_k=50, num_results=5, **smc_kwargs):
+        """
+        Anytime variant of get_weighted_interpretations(): yields the weighted posterior
+        after every decoded token, so the caller can stop whenever its budget runs out.
+
+        Args:
+            num_results (int): Interpretations included in each update.
+            Other arguments as for get_weighted_interpretations().
+
+        Yields:
+            dict: step, ess, log_evidence, done, and interpretations as (text, weight)
+            pairs of the partial decodes, heaviest first.
+        """
+        smc = self._token_smc(query, num_particles, twist_function, max_length, temperature, top_k, **smc_kwargs)
+        smc.initialize_particles()
+        for summary in smc.iterate(context, top_k=0):
+            interpretations = self._merge_interpretations(smc.particles['tokens'], smc.weights)
+            yield {
+                'step': summary['step'],
+                'ess': summary['ess'],
+                'log_evidence': summary['log_evidence'],
+                'done': summary['done'],
+                'interpretations': interpretations[:num_results],
+            }
+
+    def _token_smc(self, query, num_particles, twist_function, max_length, temperature, top_k, **smc_kwargs):
+        inputs, hidden = self.encode_query(query)
+        return TokenTwistedSMC(
+            self.model, BaseModelOutput(last_hidden_state=hidden), inputs['attention_mask'], num_particles,
+            twist_function=twist_function, max_length=max_length,
+            temperature=temperature, top_k=top_k, **smc_kwargs
+        )
+
+    def _merge_interpretations(self, tokens, weights):
+        # Merge particles that decode to the same text
+        totals = {}
+        for text, weight in zip(self.tokenizer.batch_decode(tokens, skip_special_tokens=True), weights):
+            totals[text] = totals.get(text, 0.0) + float(weight)
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def interpret_with_context(self, query, context, use_cache=True):
         """
         Use the context (visual, spatial, or otherwise) to influence the interpretation
         of the query. This function could interact with the twisted SMC framework to refine 
@@ -79,19 +341,75 @@ class LanguageModel:
         Args:
             query (str): The user input query.
             context (dict): Contextual information such as location, visual input, etc.
+            use_cache (bool): Serve and store the result in the result cache.
 
         Returns:
             str: The refined query interpretation.
         """
+        key = self.result_key('interpret_with_context', query, context)
+        if use_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Generate a response after modifying the query with context
+        response = self.generate_response(self.contextual_query(query, context))
+        if use_cache:
+            self.result_cache.put(key, response)
+        return response
+
+    def interpret_with_context_batch(self, queries, contexts, use_cache=True):
+        """
+        Batched interpret_with_context(): cached results are served directly and the
+        remaining queries share one padded generate call.
+
+        Args:
+            queries (list): User input queries.
+            contexts (list): One context dict per query.
+            use_cache (bool): Serve and store results in the result cache.
+
+        Returns:
+            List[str]: One refined interpretation per query, in order.
+        """
+        keys = [self.result_key('interpret_with_context', query, context) for query, context in zip(queries, contexts)]
+        results = [self.result_cache.get(key) if use_cache else None for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        responses = self.generate_batch([self.contextual_query(queries[i], contexts[i]) for i in pending])
+        for i, response in zip(pending, responses):
+            results[i] = response
+            if use_cache:
+                self.result_cache.put(keys[i], response)
+        return results
+
+    @staticmethod
+    def contextual_query(query, context):
         # For now, we assume context is a dictionary with relevant info (like location or recognized objects)
         # In practice, context would influence the twisted SMC sampling to guide the query interpretation.
-        
+
         # Placeholder: Use the context in some simple way (could be expanded)
-        if 'landmark' in context:
+        if isinstance(context, dict) and 'landmark' in context:
             query += f" about {context['landmark']}"
-        
-        # Generate a response after modifying the query with context
-        return self.generate_response(query)
+        return query
+
+    def result_key(self, method, query, context=None):
+        # Cache key for a result: the method, the normalized query and the context dict
+        return canonical_key(method, self.normalize_query(query), context or {})
+
+    def invalidate_interpretations(self, query=None, context=None):
+        """
+        Drop cached interpretation results.
+
+        Args:
+            query (str): Query whose cached result should be dropped; None clears everything.
+            context (dict): Context the result was computed with.
+
+        Returns:
+            bool: Whether anything was removed (always True when clearing).
+        """
+        if query is None:
+            self.result_cache.clear()
+            return True
+        return self.result_cache.invalidate(self.result_key('interpret_with_context', query, context))
 
 # Example usage
 if __name__ == "__main__":
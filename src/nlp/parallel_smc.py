@@ -0,0 +1,303 @@
+import multiprocessing as mp
+import os
+import traceback
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.special import logsumexp
+
+from nlp.particles import ParticleStore
+from nlp.resampling import effective_sample_size, get_resampler, weight_entropy
+from nlp.twisted_smc import TwistedSMC, batched_log_likelihood
+
+PARALLEL_MODES = ('global', 'island')
+
+
+def _attach(name, shape, dtype):
+    # Map a shared-memory block as an array; the block must outlive the array
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _shard_worker(conn, buffers, start, end, twist_function, log_likelihood_fn, resampling, ess_threshold, seed):
+    """
+    Worker process owning particles [start, end) of the shared buffers. It moves and
+    scores its shard on request; in island mode it also normalizes and resamples it.
+    """
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in buffers.items():
+        block, array = _attach(block_name, shape, dtype)
+        blocks.append(block)
+        arrays[name] = array[start:end]
+    particles, incremental, log_weights = arrays['particles'], arrays['incremental'], arrays['log_weights']
+    ancestors = arrays['ancestors']
+    # Per-shard streams: results depend on the seed and shard layout, never on scheduling
+    np.random.seed(seed.generate_state(1)[0])  # for twist/likelihood functions using np.random
+    rng = np.random.default_rng(seed)
+    resampler = get_resampler(resampling)
+    num_particles = end - start
+
+    try:
+        while True:
+            command, context = conn.recv()
+            if command == 'close':
+                break
+            try:
+                particles[...] = twist_function(particles, context)
+                incremental[:] = log_likelihood_fn(particles, context)
+                if command == 'move':
+                    conn.send(('ok', None))
+                    continue
+                # Island step: local normalization, and resampling once the island degenerates
+                updated = log_weights + incremental
+                log_norm = logsumexp(updated)
+                if not np.isfinite(log_norm):
+                    raise ValueError("All particle weights in an island are zero; cannot normalize.")
+                updated -= log_norm
+                ess = effective_sample_size(np.exp(updated))
+                resampled = ess < ess_threshold * num_particles
+                if resampled:
+                    indices = resampler(np.exp(updated), num_particles, rng)
+                    particles[...] = particles[indices]
+                    updated[:] = -np.log(num_particles)
+                    # Parent indices in the whole population, so the store can trace lineages
+                    ancestors[:] = start + indices
+                else:
+                    ancestors[:] = np.arange(start, end)
+                log_weights[:] = updated
+                conn.send(('ok', (log_norm, ess, resampled)))
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def _shutdown(processes, connections, blocks):
+    # Stop workers and free shared memory; also run by weakref.finalize on garbage collection
+    for conn in connections:
+        try:
+            conn.send(('close', None))
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+class ParallelTwistedSMC(TwistedSMC):
+    def __init__(self, num_particles, proposal_dist, twist_function, log_likelihood_fn=None, num_workers=None,
+                 mode='global', exchange_interval=5, seed=None, start_method=None, **smc_kwargs):
+        """
+        TwistedSMC with the particle population sharded across worker processes.
+        Particles, incremental log-weights and (island mode) log-weights live in shared
+        memory; each worker moves and scores its own slice in place, so only contexts
+        and small replies cross process boundaries.
+
+        In 'global' mode every step ends at a barrier where the parent normalizes all
+        weights and resamples the whole population, exactly like TwistedSMC. In
+        'island' mode every shard is an independent SMC that normalizes and resamples
+        locally; every exchange_interval steps the islands are pooled and resampled
+        globally, with each island weighted by its evidence since the last exchange.
+        Workers report their local ancestor indices, so store.lineage() traces
+        particles across island resampling as well as exchanges.
+
+        Runs are reproducible for a fixed seed and number of workers: each shard and
+        the parent draw from their own streams of one np.random.SeedSequence. With
+        deterministic twist and likelihood, global mode is also independent of the
+        number of workers.
+
+        Args:
+            num_particles (int): Total particles across all shards.
+            proposal_dist: Object with sample(num_particles, initial_state) returning a
+                numeric array with a leading particle axis.
+            twist_function (callable): twist_function(particles, context) -> moved
+                particles of the same shape; runs in the workers.
+            log_likelihood_fn (callable): Batched log-likelihood(particles, context);
+                runs in the workers. With the 'spawn' start method both functions must
+                be picklable (module-level).
+            num_workers (int): Worker processes (and shards); defaults to the core count.
+            mode (str): 'global' or 'island'.
+            exchange_interval (int): Island mode: steps between global exchanges.
+            seed: Seed for np.random.SeedSequence; None draws fresh entropy.
+            start_method (str): multiprocessing start method; None uses the platform default.
+            **smc_kwargs: resampling and ess_threshold, as for TwistedSMC.
+        """
+        if mode not in PARALLEL_MODES:
+            raise ValueError(f"Unknown parallel mode '{mode}'. Choose from {PARALLEL_MODES}.")
+        if smc_kwargs.get('keep_history'):
+            raise ValueError("keep_history is not supported: workers overwrite the shared buffers in place.")
+        super().__init__(num_particles, proposal_dist, twist_function, log_likelihood_fn=self._shared_increments,
+                         **smc_kwargs)
+        self.worker_log_likelihood_fn = log_likelihood_fn or batched_log_likelihood(self.likelihood)
+        self.resampling = smc_kwargs.get('resampling', 'systematic')
+        self.mode = mode
+        self.exchange_interval = exchange_interval
+        self.num_workers = max(1, min(num_workers or os.cpu_count() or 1, num_particles))
+        sizes = [len(shard) for shard in np.array_split(np.arange(num_particles), self.num_workers)]
+        self.bounds = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        # The parent's stream is spawned first, so it does not depend on the worker count
+        seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+        self.worker_seeds = seed_sequence.spawn(self.num_workers)
+        self.mp_context = mp.get_context(start_method)
+        self.exchange_count = 0
+        self._processes = []
+        self._connections = []
+        self._buffers = None
+        self._finalizer = None
+        self._reset_islands()
+
+    @property
+    def particles(self):
+        return self.store.data
+
+    @particles.setter
+    def particles(self, particles):
+        particles = np.asarray(particles)
+        if particles.dtype == object or len(particles) != self.num_particles:
+            raise TypeError("Parallel SMC needs a fixed-size numeric array with num_particles rows.")
+        if self._buffers is None or self._particles.shape != particles.shape or self._particles.dtype != particles.dtype:
+            self._start_workers(particles.shape, particles.dtype)
+        self._particles[...] = particles
+        self.store = ParticleStore(self._particles)
+
+    def initialize_particles(self, initial_state):
+        super().initialize_particles(initial_state)
+        self.exchange_count = 0
+        self._reset_islands()
+
+    def twist(self, particles, context):
+        # Workers move and score their shards in place; the barrier is _call() returning
+        self._call('move', context)
+        return self._particles
+
+    def resample(self):
+        indices = super().resample()
+        # ParticleStore gathered into a new array; copy it back into shared memory
+        self._particles[...] = self.store.data
+        self.store.data = self._particles
+        return indices
+
+    def step(self, context):
+        if self.mode == 'global':
+            return super().step(context)
+
+        replies = self._call('island', context)
+        resampled = any(resampled for _, _, resampled in replies)
+        self.store.advance(self._particles, self._ancestors.copy() if resampled else None)
+        self.island_log_evidence += np.array([log_norm for log_norm, _, _ in replies])
+        self._steps_since_exchange += 1
+        exchanged = self._steps_since_exchange >= self.exchange_interval
+        if exchanged:
+            self.exchange()
+        else:
+            self._update_global_weights()
+        self.history.append({
+            'ess': self.effective_sample_size(),
+            'entropy': weight_entropy(self.weights),
+            'num_particles': self.num_particles,
+            'resampled': exchanged or resampled,
+            'resample_count': self.resample_count,
+            'island_ess': [ess for _, ess, _ in replies],
+            'exchanged': exchanged,
+        })
+        self.record_health(self.history[-1])
+        return self.history[-1]
+
+    def exchange(self):
+        """
+        Island mode: pool all islands, weighting each by its evidence since the last
+        exchange, and resample the whole population globally.
+        """
+        self._update_global_weights()
+        self._exchanged_log_evidence = self.log_evidence
+        self.resample()
+        self.exchange_count += 1
+        self._reset_islands()
+
+    def close(self):
+        # Stop the workers and release the shared memory, keeping a private copy of the particles
+        if self._buffers is not None:
+            self.store.data = np.array(self._particles)
+            # Views must be gone before the blocks can be closed
+            del self._particles, self._incremental, self._log_weights, self._ancestors
+            self._buffers = None
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shared_increments(self, particles, context):
+        # Log-likelihood increments the workers wrote during twist()
+        return self._incremental.copy()
+
+    def _reset_islands(self):
+        self.island_log_evidence = np.zeros(self.num_workers)
+        self._exchanged_log_evidence = self.log_evidence
+        self._steps_since_exchange = 0
+        if self._buffers is not None:
+            for k in range(self.num_workers):
+                start, end = self.bounds[k], self.bounds[k + 1]
+                self._log_weights[start:end] = -np.log(end - start)
+
+    def _update_global_weights(self):
+        # Global weight of a particle: island share * island evidence * local weight
+        sizes = np.diff(self.bounds)
+        island_log_weight = np.log(sizes / self.num_particles) + self.island_log_evidence
+        log_weights = self._log_weights + np.repeat(island_log_weight, sizes)
+        log_norm = logsumexp(log_weights)
+        self.log_evidence = self._exchanged_log_evidence + log_norm
+        self.log_weights = log_weights - log_norm
+        self.weights = np.exp(self.log_weights)
+
+    def _call(self, command, context):
+        # Broadcast one command and wait for every shard: the synchronization barrier
+        for conn in self._connections:
+            conn.send((command, context))
+        replies = [conn.recv() for conn in self._connections]
+        errors = [payload for status, payload in replies if status == 'error']
+        if errors:
+            raise RuntimeError(f"SMC worker failed:\n{errors[0]}")
+        return [payload for _, payload in replies]
+
+    def _start_workers(self, shape, dtype):
+        self.close()
+        layouts = {
+            'particles': (shape, dtype),
+            'incremental': ((self.num_particles,), np.dtype(float)),
+            'log_weights': ((self.num_particles,), np.dtype(float)),
+            'ancestors': ((self.num_particles,), np.dtype(np.intp)),
+        }
+        blocks, buffers = [], {}
+        for name, (array_shape, array_dtype) in layouts.items():
+            size = max(int(np.prod(array_shape)) * np.dtype(array_dtype).itemsize, 1)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            blocks.append(block)
+            buffers[name] = (block.name, array_shape, array_dtype)
+            setattr(self, f"_{name}", np.ndarray(array_shape, dtype=array_dtype, buffer=block.buf))
+        self._buffers = buffers
+
+        self._processes, self._connections = [], []
+        for k in range(self.num_workers):
+            parent, child = self.mp_context.Pipe()
+            process = self.mp_context.Process(
+                target=_shard_worker, name=f"smc-shard-{k}", daemon=True,
+                args=(child, buffers, self.bounds[k], self.bounds[k + 1], self.twist_function,
+                      self.worker_log_likelihood_fn, self.resampling, self.ess_threshold, self.worker_seeds[k]))
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._connections.append(parent)
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._connections, blocks)
+        self._reset_islands()
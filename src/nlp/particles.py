@@ -0,0 +1,143 @@
+import numpy as np
+
+
+def _to_arrays(particles):
+    # Convert a particle population into struct-of-arrays form: either a single
+    # array with a leading particle axis, or a dict of such arrays per field
+    if isinstance(particles, dict):
+        return {name: np.asarray(values) for name, values in particles.items()}
+    if isinstance(particles, np.ndarray):
+        return particles
+    particles = list(particles)
+    if particles and isinstance(particles[0], dict):
+        return {name: _to_array([p[name] for p in particles]) for name in particles[0]}
+    return _to_array(particles)
+
+
+def _to_array(values):
+    try:
+        return np.asarray(values)
+    except ValueError:
+        # Ragged payloads (e.g. variable-length token lists) fall back to an object
+        # array, which still resamples by gathering pointers rather than copying
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+
+def _gather(data, indices):
+    if isinstance(data, dict):
+        return {name: values[indices] for name, values in data.items()}
+    return data[indices]
+
+
+class ParticleStore:
+    def __init__(self, particles, keep_history=False):
+        """
+        Struct-of-arrays container for an SMC particle population.
+
+        Resampling gathers rows of the underlying NumPy buffers and records the
+        ancestor indices of each generation, so lineages can be traced without
+        copying payloads around.
+
+        Args:
+            particles: A list of particles (scalars, arrays or dicts of fields),
+                an array with a leading particle axis, or a dict of such arrays.
+            keep_history (bool): Keep a reference to each generation's buffers so
+                full particle paths can be reconstructed.
+        """
+        self.data = _to_arrays(particles)
+        self.keep_history = keep_history
+        # ancestors[t][i] is the index in generation t - 1 of particle i's parent
+        # (generation 0 points into the initial draw); None means identity
+        self.ancestors = [None]
+        self.history = []
+
+    def __len__(self):
+        if isinstance(self.data, dict):
+            return len(next(iter(self.data.values()))) if self.data else 0
+        return len(self.data)
+
+    @property
+    def generation(self):
+        return len(self.ancestors) - 1
+
+    def particle(self, index):
+        """
+        Particle at index of the current generation; a dict of field values for
+        structured populations.
+        """
+        return _gather(self.data, index)
+
+    def advance(self, particles, ancestors=None):
+        """
+        Start a new generation from moved particles aligned with the current ones.
+
+        Args:
+            particles: The new population, particle i being the child of current particle i.
+            ancestors (numpy.ndarray): Parent indices of the new particles, for populations
+                that were already resampled elsewhere (e.g. in SMC worker processes).
+        """
+        if self.keep_history:
+            self.history.append(self.data)
+        self.data = _to_arrays(particles)
+        self.ancestors.append(None if ancestors is None else np.asarray(ancestors, dtype=np.intp))
+
+    def resample(self, indices):
+        """
+        Replace the population by the particles at the given ancestor indices.
+
+        Args:
+            indices (numpy.ndarray): Ancestor indices into the current population.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        self.data = _gather(self.data, indices)
+        # Compose with any earlier resampling within the same generation
+        parents = self.ancestors[-1]
+        self.ancestors[-1] = indices if parents is None else parents[indices]
+
+    def lineage(self):
+        """
+        Trace every current particle back through all generations.
+
+        Returns:
+            numpy.ndarray: Array of shape (generation + 1, N) whose row t holds the
+            index, within generation t, of each current particle's ancestor.
+        """
+        num_particles = len(self)
+        lineage = np.empty((len(self.ancestors), num_particles), dtype=np.intp)
+        index = np.arange(num_particles)
+        for t in range(len(self.ancestors) - 1, -1, -1):
+            lineage[t] = index
+            parents = self.ancestors[t]
+            if parents is not None:
+                index = parents[index]
+        return lineage
+
+    def origins(self):
+        """
+        Index in the initial draw that each current particle descends from.
+        """
+        index = np.arange(len(self))
+        for parents in reversed(self.ancestors):
+            if parents is not None:
+                index = parents[index]
+        return index
+
+    def path(self, index):
+        """
+        Reconstruct the states of one particle across all kept generations.
+
+        Args:
+            index (int): Index of the particle in the current generation.
+
+        Returns:
+            list: The particle's states from the oldest kept generation to now.
+        """
+        if not self.keep_history:
+            raise ValueError("Path reconstruction requires keep_history=True.")
+        lineage = self.lineage()[:, index]
+        path = [_gather(self.data, lineage[-1])]
+        for t in range(len(self.history) - 1, -1, -1):
+            path.append(_gather(self.history[t], lineage[t]))
+        return path[::-1]
@@ -0,0 +1,118 @@
+import numpy as np
+
+
+def effective_sample_size(weights):
+    """
+    Effective sample size (ESS) of a set of normalized weights.
+
+    Args:
+        weights (numpy.ndarray): Normalized particle weights.
+
+    Returns:
+        float: 1 / sum(w^2), between 1 (fully degenerate) and N (uniform).
+    """
+    weights = np.asarray(weights, dtype=float)
+    return 1.0 / np.dot(weights, weights)
+
+
+def weight_entropy(weights):
+    """
+    Shannon entropy of a set of normalized weights, in nats.
+
+    Args:
+        weights (numpy.ndarray): Normalized particle weights.
+
+    Returns:
+        float: -sum(w log w), between 0 (fully degenerate) and log N (uniform).
+    """
+    weights = np.asarray(weights, dtype=float)
+    positive = weights[weights > 0]
+    return float(-np.dot(positive, np.log(positive)))
+
+
+def _inverse_cdf(weights, positions):
+    # Map sorted positions in [0, 1) onto ancestor indices through the weight CDF
+    cumulative = np.cumsum(weights)
+    cumulative[-1] = 1.0  # Guard against round-off leaving the last bin short
+    return np.searchsorted(cumulative, positions, side='right')
+
+
+def multinomial_resample(weights, num_samples=None, rng=np.random):
+    """
+    Draw ancestor indices independently from the weights.
+
+    Args:
+        weights (numpy.ndarray): Normalized particle weights.
+        num_samples (int): Number of indices to draw (defaults to len(weights)).
+        rng: Random generator exposing ``random(size)``.
+
+    Returns:
+        numpy.ndarray: Ancestor indices of shape (num_samples,).
+    """
+    num_samples = num_samples or len(weights)
+    return _inverse_cdf(weights, np.sort(rng.random(num_samples)))
+
+
+def systematic_resample(weights, num_samples=None, rng=np.random):
+    """
+    Systematic resampling: one uniform offset shared by N evenly spaced positions.
+    Lowest variance of the O(N) schemes in practice.
+    """
+    num_samples = num_samples or len(weights)
+    positions = (rng.random() + np.arange(num_samples)) / num_samples
+    return _inverse_cdf(weights, positions)
+
+
+def stratified_resample(weights, num_samples=None, rng=np.random):
+    """
+    Stratified resampling: one independent uniform draw inside each of N equal strata.
+    """
+    num_samples = num_samples or len(weights)
+    positions = (rng.random(num_samples) + np.arange(num_samples)) / num_samples
+    return _inverse_cdf(weights, positions)
+
+
+def residual_resample(weights, num_samples=None, rng=np.random):
+    """
+    Residual resampling: copy floor(N * w) of each particle deterministically and
+    fill the remainder by multinomial draws on the residual weights.
+    """
+    weights = np.asarray(weights, dtype=float)
+    num_samples = num_samples or len(weights)
+    scaled = num_samples * weights
+    counts = np.floor(scaled).astype(int)
+    indices = np.repeat(np.arange(len(weights)), counts)
+
+    remaining = num_samples - counts.sum()
+    if remaining > 0:
+        residual = scaled - counts
+        residual /= residual.sum()
+        indices = np.concatenate([indices, multinomial_resample(residual, remaining, rng)])
+    return indices
+
+
+RESAMPLERS = {
+    'multinomial': multinomial_resample,
+    'systematic': systematic_resample,
+    'stratified': stratified_resample,
+    'residual': residual_resample,
+}
+
+
+def get_resampler(name):
+    """
+    Look up a resampling strategy by name, or pass a callable through unchanged.
+
+    Args:
+        name (str or callable): One of RESAMPLERS, or a function
+            ``resampler(weights, num_samples, rng) -> indices``.
+
+    Returns:
+        callable: The resampling function.
+    """
+    if callable(name):
+        return name
+    try:
+        return RESAMPLERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown resampling strategy '{name}'. Choose from {sorted(RESAMPLERS)}.")
@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """The request queue is full; the client should back off and retry."""
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it was answered."""
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10.0, max_queue=256, executor=None):
+        """
+        Coalesces concurrent requests into micro-batches for one blocking
+        process_batch(payloads) call, run on an executor so the event loop stays
+        responsive. A batch is dispatched as soon as it is full or its oldest request
+        has waited max_wait_ms; requests whose deadline already passed are dropped
+        before dispatch.
+
+        Args:
+            process_batch (callable): Maps a list of payloads to a list of results.
+            max_batch_size (int): Maximum requests per call.
+            max_wait_ms (float): Maximum time a request waits for the batch to fill.
+            max_queue (int): Queue bound; further submits fail with Overloaded.
+            executor (concurrent.futures.Executor): Where process_batch runs; share one
+                single-thread executor between batchers that use the same model.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.executor = executor
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self.expired = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        # Must be called from the event loop that will serve requests
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, payload, deadline=None):
+        """
+        Queue a request and wait for its result.
+
+        Args:
+            payload: One item for process_batch.
+            deadline (float): Absolute event-loop time (loop.time()) by which the
+                result is needed; None waits indefinitely.
+
+        Returns:
+            The result for this payload.
+
+        Raises:
+            Overloaded: The queue is full.
+            DeadlineExceeded: The deadline passed first.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((payload, deadline, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded(f"More than {self.max_queue} requests are waiting.")
+        timeout = None if deadline is None else max(deadline - loop.time(), 0.0)
+        try:
+            # On timeout the future is cancelled, which also removes it from its batch
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise DeadlineExceeded("Deadline exceeded.")
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'rejected': self.rejected,
+            'expired': self.expired,
+        }
+
+    async def _next_batch(self, loop):
+        # Block for the first request, then keep collecting until full or its wait runs out
+        batch = [await self._queue.get()]
+        flush_at = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = flush_at - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch(loop)
+            now = loop.time()
+            live = [(payload, future) for payload, deadline, future in batch
+                    if not future.done() and (deadline is None or deadline > now)]
+            if not live:
+                continue
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch,
+                                                     [payload for payload, _ in live])
+            except Exception as e:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(live)
+            for (_, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class QueryServer:
+    def __init__(self, language_model, host='127.0.0.1', port=8080, max_batch_size=8, max_wait_ms=10.0,
+                 max_queue=256, default_deadline_ms=None, max_particles=64):
+        """
+        Asyncio HTTP front end serving many concurrent users from one LanguageModel.
+
+        Endpoints (JSON bodies):
+            POST /interpret           {"query", "context", "deadline_ms"} -> {"interpretation"}
+            POST /interpret/weighted  {"query", "context", "num_particles", "deadline_ms"}
+                                      -> {"interpretations": [[text, weight], ...]}
+            GET  /stats               Batching and cache counters.
+
+        Concurrent /interpret requests are coalesced into padded micro-batches that
+        share one generate call. Weighted (twisted SMC) requests already decode a batch
+        of particles each, so they run one at a time. All model calls go through a
+        single worker thread. A full queue answers 503 and a missed deadline 504.
+
+        Args:
+            language_model (LanguageModel): The model to serve.
+            host (str): Interface to bind.
+            port (int): Port to bind (0 picks a free one).
+            max_batch_size (int): Maximum queries per generate call.
+            max_wait_ms (float): Maximum time a query waits for its batch to fill.
+            max_queue (int): Waiting requests per endpoint before new ones are refused.
+            default_deadline_ms (float): Deadline for requests that do not set one.
+            max_particles (int): Upper bound on num_particles for weighted requests;
+                larger values are clamped, so one request cannot exhaust memory.
+        """
+        self.language_model = language_model
+        self.host = host
+        self.port = port
+        self.default_deadline_ms = default_deadline_ms
+        self.max_particles = max_particles
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="language-model")
+        self.batchers = {
+            '/interpret': MicroBatcher(self._interpret_batch, max_batch_size, max_wait_ms, max_queue, self.executor),
+            '/interpret/weighted': MicroBatcher(self._weighted_batch, 1, 0.0, max_queue, self.executor),
+        }
+        self._server = None
+
+    async def start(self):
+        for batcher in self.batchers.values():
+            batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        stats = {path: batcher.stats() for path, batcher in self.batchers.items()}
+        stats['result_cache'] = self.language_model.result_cache.stats()
+        return stats
+
+    async def handle(self, path, request):
+        """
+        Answer one decoded request; transport independent.
+
+        Returns:
+            tuple: (HTTP status code, JSON-serializable body).
+        """
+        batcher = self.batchers.get(path)
+        if batcher is None:
+            return 404, {'error': f"Unknown endpoint {path}"}
+        if not isinstance(request, dict) or not isinstance(request.get('query'), str):
+            return 400, {'error': "Request body must be a JSON object with a 'query' string."}
+
+        deadline_ms = request.get('deadline_ms', self.default_deadline_ms)
+        if deadline_ms is not None and (not _is_number(deadline_ms) or deadline_ms <= 0):
+            return 400, {'error': "'deadline_ms' must be a positive number."}
+        num_particles = request.get('num_particles', 16)
+        if not isinstance(num_particles, int) or isinstance(num_particles, bool) or num_particles < 1:
+            return 400, {'error': "'num_particles' must be a positive integer."}
+        if request.get('context') is not None and not isinstance(request['context'], dict):
+            # Rejected here: inside a micro-batch it would fail every request batched with it
+            return 400, {'error': "'context' must be a JSON object."}
+        request = dict(request, num_particles=min(num_particles, self.max_particles))
+        deadline = None if deadline_ms is None else asyncio.get_running_loop().time() + deadline_ms / 1000.0
+        try:
+            result = await batcher.submit(request, deadline)
+        except Overloaded as e:
+            return 503, {'error': str(e)}
+        except DeadlineExceeded as e:
+            return 504, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+        if path == '/interpret':
+            return 200, {'interpretation': result}
+        return 200, {'interpretations': result}
+
+    def _interpret_batch(self, requests):
+        return self.language_model.interpret_with_context_batch(
+            [request['query'] for request in requests], [request.get('context') or {} for request in requests])
+
+    def _weighted_batch(self, requests):
+        return [self.language_model.get_weighted_interpretations(
+            request['query'], num_particles=request['num_particles'], context=request.get('context'))
+            for request in requests]
+
+    async def _handle_connection(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: request line, headers, Content-Length body
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if method == 'GET' and path == '/stats':
+                    status, response = 200, self.stats()
+                elif method != 'POST':
+                    status, response = 405, {'error': "Use POST."}
+                else:
+                    try:
+                        request = json.loads(body or b'{}')
+                    except ValueError:
+                        status, response = 400, {'error': "Body is not valid JSON."}
+                    else:
+                        status, response = await self.handle(path, request)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write_response(writer, status, body, keep_alive):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+        payload = json.dumps(body).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {reasons.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(payload)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+        await writer.drain()
+
+
+def _is_number(value):
+    # bool is an int subclass, but true/false is not a deadline
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Example usage (from the repository root): PYTHONPATH=src python -m nlp.serving --snapshot lm.pt --port 8080
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve query interpretations over HTTP.")
+    parser.add_argument('--model', default='facebook/bart-large', help="Model name or local checkpoint.")
+    parser.add_argument('--snapshot', default=None, help="LanguageModel snapshot to load instead of --model.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    parser.add_argument('--max-queue', type=int, default=256)
+    parser.add_argument('--deadline-ms', type=float, default=None, help="Default per-request deadline.")
+    parser.add_argument('--max-particles', type=int, default=64, help="Upper bound on num_particles per request.")
+    args = parser.parse_args()
+
+    from nlp.model import LanguageModel
+
+    lm = LanguageModel.from_snapshot(args.snapshot) if args.snapshot else LanguageModel(args.model)
+    server = QueryServer(lm, args.host, args.port, args.max_batch_size, args.max_wait_ms, args.max_queue,
+                         args.deadline_ms, args.max_particles)
+    print(f"Serving on http://{args.host}:{args.port}")
+    asyncio.run(server.serve_forever())
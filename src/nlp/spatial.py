@@ -1,110 +0,0 @@
-import geopy
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-
-class SpatialRecognition:
-    def __init__(self):
-        """
-        Initialize the spatial recognition module using geopy for handling GPS data
-        and location-based queries.
-        """
-        # Initialize the geolocator (uses OpenStreetMap's Nominatim service)
-        self.geolocator = Nominatim(user_agent="ar-navigation")
-        self.current_location = None
-
-    def get_location(self):
-        """
-        Get the current GPS location of the user (latitude, longitude).
-        For local testing, we'll simulate this, but this can be replaced with actual
-        GPS data collection for mobile devices.
-
-        Returns:
-            tuple: (latitude, longitude) representing the user's current location.
-        """
-        # Simulate location for local testing
-        # Replace this with actual GPS coordinates when integrating with a real device
-        # e.g., using Android's `location` package or iOS's CoreLocation framework
-        self.current_location = (40.748817, -73.985428)  # Simulating NYC, Empire State Building
-        return self.current_location
-
-    def reverse_geocode(self, location):
-        """
-        Convert GPS coordinates into a human-readable address.
-
-        Args:
-            location (tuple): A tuple (latitude, longitude) representing the GPS location.
-        
-        Returns:
-            str: A human-readable address corresponding to the location.
-        """
-        try:
-            address = self.geolocator.reverse(location, language='en')
-            return address.address
-        except Exception as e:
-            print(f"Error in reverse geocoding: {e}")
-            return None
-
-    def get_nearby_landmarks(self, location, radius_km=1.0):
-        """
-        Search for nearby landmarks or points of interest (POIs) around the current location.
-        This function can be further extended with APIs like Google Places API for more
-        detailed landmark data.
-
-        Args:
-            location (tuple): The current GPS coordinates (latitude, longitude).
-            radius_km (float): The search radius around the location in kilometers.
-        
-        Returns:
-            list: A list of nearby landmarks (as addresses or place names).
-        """
-        # For now, we'll simulate nearby landmarks. In practice, you'd use an API like Google Places.
-        simulated_landmarks = [
-            {"name": "Empire State Building", "coordinates": (40.748817, -73.985428)},
-            {"name": "Times Square", "coordinates": (40.758896, -73.985130)},
-            {"name": "Bryant Park", "coordinates": (40.753597, -73.983233)}
-        ]
-
-        nearby_landmarks = []
-        for landmark in simulated_landmarks:
-            distance = geodesic(location, landmark["coordinates"]).kilometers
-            if distance <= radius_km:
-                nearby_landmarks.append(landmark["name"])
-
-        return nearby_landmarks
-
-    def calculate_distance(self, loc1, loc2):
-        """
-        Calculate the geodesic distance between two points.
-
-        Args:
-            loc1 (tuple): First GPS location (latitude, longitude).
-            loc2 (tuple): Second GPS location (latitude, longitude).
-        
-        Returns:
-            float: The distance between the two locations in kilometers.
-        """
-        return geodesic(loc1, loc2).kilometers
-
-
-# Example usage
-if __name__ == "__main__":
-    # Initialize the spatial recognition module
-    spatial_recognition = SpatialRecognition()
-
-    # Get the current location (simulated for now)
-    current_location = spatial_recognition.get_location()
-    print(f"Current Location (latitude, longitude): {current_location}")
-
-    # Reverse geocode to get the address
-    address = spatial_recognition.reverse_geocode(current_location)
-    print(f"Current Address: {address}")
-
-    # Get nearby landmarks within a 1 km radius
-    nearby_landmarks = spatial_recognition.get_nearby_landmarks(current_location, radius_km=1.0)
-    print(f"Nearby Landmarks: {nearby_landmarks}")
-
-    # Calculate distance between two points (e.g., current location and Times Square)
-    times_square_coords = (40.758896, -73.985130)
-    distance_to_times_square = spatial_recognition.calculate_distance(current_location, times_square_coords)
-    print(f"Distance to Times Square: {distance_to_times_square:.2f} km")
-
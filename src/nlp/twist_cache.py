@@ -0,0 +1,231 @@
+import heapq
+
+import numpy as np
+
+from nlp.cache import LRUCache, canonical_key
+
+try:
+    import torch
+except ImportError:  # Only needed for torch-module twists
+    torch = None
+
+
+class _Node:
+    __slots__ = ('children', 'value', 'tick')
+
+    def __init__(self, tick=0):
+        self.children = {}
+        self.value = None
+        self.tick = tick
+
+
+class PrefixTrie:
+    def __init__(self, max_nodes=100000, prune_fraction=0.75):
+        """
+        Twist values keyed by token prefix. Prefixes share their common nodes, so a
+        population of decodes that branched from each other costs one node per
+        distinct token position rather than one key per prefix.
+
+        Args:
+            max_nodes (int): Node budget; exceeding it prunes least recently used leaves.
+            prune_fraction (float): Pruning stops at this fraction of max_nodes, so the
+                cost of a prune is amortized over many inserts.
+        """
+        self.max_nodes = max_nodes
+        self.prune_fraction = prune_fraction
+        self.root = _Node()
+        self.num_nodes = 0
+        self.evictions = 0
+        self._tick = 0
+
+    def __len__(self):
+        return self.num_nodes
+
+    def node(self, prefix, create=False):
+        """
+        Walk to the node of a prefix, marking the path as recently used.
+
+        Returns:
+            _Node: The node, or None if it does not exist and create is False.
+        """
+        self._tick += 1
+        node = self.root
+        node.tick = self._tick
+        for token in prefix:
+            child = node.children.get(token)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[token] = _Node()
+                self.num_nodes += 1
+            child.tick = self._tick
+            node = child
+        return node
+
+    def get(self, prefix):
+        node = self.node(prefix)
+        return None if node is None else node.value
+
+    def put(self, prefix, value):
+        self.node(prefix, create=True).value = value
+        self.prune()
+
+    def prune(self):
+        # A walk touches every ancestor, so ancestors are never older than their
+        # descendants and dropping the oldest leaves first is LRU over prefixes
+        if self.num_nodes <= self.max_nodes:
+            return
+        target = int(self.max_nodes * self.prune_fraction)
+        leaves, parents, order = [], {}, 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for token, child in node.children.items():
+                parents[id(child)] = (node, token)
+                if child.children:
+                    stack.append(child)
+                else:
+                    leaves.append((child.tick, order, child))
+                    order += 1
+        heapq.heapify(leaves)
+        while leaves and self.num_nodes > target:
+            _, _, leaf = heapq.heappop(leaves)
+            parent, token = parents[id(leaf)]
+            del parent.children[token]
+            self.num_nodes -= 1
+            self.evictions += 1
+            if not parent.children and parent is not self.root:
+                heapq.heappush(leaves, (parent.tick, order, parent))
+                order += 1
+
+
+def unique_prefixes(particles):
+    """
+    Dedupe a population of token prefixes.
+
+    Args:
+        particles: An (N, t) integer array or a list of token sequences.
+
+    Returns:
+        tuple: (first, inverse): the index of the first particle with each distinct
+        prefix, and for every particle the position of its prefix in first.
+    """
+    if isinstance(particles, np.ndarray) and particles.ndim == 2:
+        # Compare whole rows at once by viewing each as a single opaque value
+        rows = np.ascontiguousarray(particles)
+        keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).reshape(-1)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return first.tolist(), inverse.reshape(-1)
+    slots, first, inverse = {}, [], np.empty(len(particles), dtype=np.intp)
+    for i, row in enumerate(particles):
+        slot = slots.setdefault(tuple(row), len(first))
+        if slot == len(first):
+            first.append(i)
+        inverse[i] = slot
+    return first, inverse
+
+
+class CachedTwist:
+    def __init__(self, twist_function, max_nodes=100000, max_contexts=8, batch_size=None, device=None):
+        """
+        Batched, memoized twist evaluation for TokenTwistedSMC. Each call dedupes the
+        particles by prefix, answers known prefixes from a per-context PrefixTrie, and
+        evaluates only the remaining distinct prefixes, so the cost of a learned twist
+        scales with the number of distinct prefixes rather than the particle count.
+        Resampled duplicates and decodes revisiting a context are served from cache.
+
+        The twist must depend only on (prefix, context); a twist that also depends on
+        the query needs one CachedTwist per query, or the query in the context.
+
+        Args:
+            twist_function: Either a callable twist_function(prefixes, context) returning
+                one log-twist per prefix, or a torch.nn.Module mapping an (U, t) LongTensor
+                of prefixes to (U,) or (U, 1) log-twists (the context is not passed).
+            max_nodes (int): Trie node budget per context.
+            max_contexts (int): Contexts kept; the least recently used trie is dropped.
+            batch_size (int): Maximum prefixes per twist evaluation; None evaluates all
+                misses at once.
+            device: Torch device for module inputs; defaults to the module's parameters.
+        """
+        self.twist_function = twist_function
+        self.max_nodes = max_nodes
+        self.batch_size = batch_size
+        self.is_module = torch is not None and isinstance(twist_function, torch.nn.Module)
+        if self.is_module and device is None:
+            device = next(twist_function.parameters(), torch.empty(0)).device
+        self.device = device
+        self.tries = LRUCache(max_entries=max_contexts)
+        self.calls = 0
+        self.seen = 0
+        self.unique = 0
+        self.evaluated = 0
+
+    def __call__(self, particles, context=None):
+        """
+        Returns:
+            numpy.ndarray: Log-twist of each particle, shape (N,).
+        """
+        key = canonical_key(context)
+        trie = self.tries.get(key)
+        if trie is None:
+            trie = PrefixTrie(self.max_nodes)
+            self.tries.put(key, trie)
+
+        first, inverse = unique_prefixes(particles)
+        # Walk the trie with plain ints; hashing numpy scalars is several times slower
+        prefixes = particles[first].tolist() if isinstance(particles, np.ndarray) else [particles[i] for i in first]
+        values = np.empty(len(first))
+        nodes, missing = [], []
+        for slot, prefix in enumerate(prefixes):
+            node = trie.node(prefix, create=True)
+            if node.value is None:
+                nodes.append(node)
+                missing.append(slot)
+            else:
+                values[slot] = node.value
+        if missing:
+            indices = [first[slot] for slot in missing]
+            computed = self._evaluate(particles, indices, context)
+            values[missing] = computed
+            for node, value in zip(nodes, computed):
+                node.value = float(value)
+            trie.prune()
+
+        self.calls += 1
+        self.seen += len(inverse)
+        self.unique += len(first)
+        self.evaluated += len(missing)
+        return values[inverse]
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'particles': self.seen,
+            'unique_prefixes': self.unique,
+            'evaluated': self.evaluated,
+            'hit_rate': 1.0 - self.evaluated / self.unique if self.unique else 0.0,
+            'contexts': len(self.tries),
+            'nodes': sum(len(trie) for trie in self.tries.values()),
+        }
+
+    def clear(self):
+        self.tries = LRUCache(max_entries=self.tries.max_entries)
+
+    def _evaluate(self, particles, indices, context):
+        # Only the distinct, uncached prefixes reach the twist, in bounded batches
+        batch_size = self.batch_size or len(indices)
+        values = []
+        for start in range(0, len(indices), batch_size):
+            chosen = indices[start:start + batch_size]
+            if isinstance(particles, np.ndarray):
+                batch = particles[chosen]
+            else:
+                batch = [particles[i] for i in chosen]
+            if self.is_module:
+                with torch.no_grad():
+                    inputs = torch.as_tensor(np.asarray(batch), dtype=torch.long, device=self.device)
+                    output = self.twist_function(inputs).reshape(len(chosen), -1)[:, 0]
+                values.append(output.float().cpu().numpy())
+            else:
+                values.append(np.asarray(self.twist_function(batch, context), dtype=float).reshape(-1))
+        return np.concatenate(values)
@@ -0,0 +1,190 @@
+import time
+
+import numpy as np
+from scipy.special import logsumexp
+
+from metrics import REGISTRY, record_smc_step
+from nlp.particles import ParticleStore
+from nlp.resampling import effective_sample_size, get_resampler, weight_entropy
+
+
+def batched_log_likelihood(likelihood):
+    # Adapt a scalar likelihood(particle, context) into a batched log-likelihood
+    # that scores the whole population in one call
+    def log_likelihood(particles, context):
+        values = np.array([likelihood(p, context) for p in particles], dtype=float)
+        with np.errstate(divide='ignore'):
+            return np.log(values)
+    return log_likelihood
+
+
+class TwistedSMC:
+    def __init__(self, num_particles, proposal_dist, twist_function, log_likelihood_fn=None,
+                 resampling='systematic', ess_threshold=0.5, keep_history=False):
+        self.num_particles = num_particles
+        self.proposal_dist = proposal_dist
+        self.twist_function = twist_function
+        # Resampling strategy (see nlp.resampling.RESAMPLERS) and the ESS fraction of
+        # num_particles below which a step triggers resampling (above 1.0 = every step)
+        self.resampler = get_resampler(resampling)
+        self.ess_threshold = ess_threshold
+        # Random source for resampling; replace with a seeded np.random.Generator for reproducibility
+        self.rng = np.random
+        # Registry receiving the health metrics; assign a private MetricsRegistry to keep them separate
+        self.metrics = REGISTRY
+        # Batched scorer: log_likelihood_fn(particles, context) -> array of shape (N,)
+        # Falls back to the scalar likelihood() method through the adapter
+        self.log_likelihood_fn = log_likelihood_fn or batched_log_likelihood(self.likelihood)
+        # Particles live in a struct-of-arrays store that records ancestor indices;
+        # keep_history additionally retains each generation for path reconstruction
+        self.keep_history = keep_history
+        self.store = ParticleStore([], keep_history=keep_history)
+        self.log_weights = np.full(num_particles, -np.log(num_particles))
+        self.weights = np.ones(num_particles) / num_particles
+        self.log_evidence = 0.0
+        self.resample_count = 0
+        self.history = []
+
+    def initialize_particles(self, initial_state):
+        # Initialize particles from the proposal distribution
+        self.particles = self.proposal_dist.sample(self.num_particles, initial_state)
+        self.reset_weights()
+        self.log_evidence = 0.0
+        self.resample_count = 0
+        self.history = []
+
+    @property
+    def particles(self):
+        # Current population as an array (or dict of arrays) with a leading particle axis
+        return self.store.data
+
+    @particles.setter
+    def particles(self, particles):
+        self.store = ParticleStore(particles, keep_history=self.keep_history)
+
+    def reset_weights(self):
+        # Uniform weights, kept in log-space alongside their linear counterpart
+        self.log_weights = np.full(self.num_particles, -np.log(self.num_particles))
+        self.weights = np.ones(self.num_particles) / self.num_particles
+
+    def twist(self, particles, context):
+        # Modify proposal distribution with the twist function
+        return self.twist_function(particles, context)
+
+    def effective_sample_size(self):
+        return effective_sample_size(self.weights)
+
+    def resample(self):
+        # Resample particles based on their weights
+        indices = self.resampler(self.weights, len(self.store), self.rng)
+        self.store.resample(indices)
+        self.reset_weights()
+        self.resample_count += 1
+        return indices
+
+    def step(self, context):
+        # Propose new particles based on context
+        self.store.advance(self.twist(self.particles, context))
+        # Accumulate the incremental log-weights and renormalize
+        self.weights = self.compute_weights(self.particles, context)
+        # Only resample once the weights have degenerated
+        ess = self.effective_sample_size()
+        entropy = weight_entropy(self.weights)
+        resampled = ess < self.ess_threshold * self.num_particles
+        if resampled:
+            self.resample()
+        self.history.append({'ess': ess, 'entropy': entropy, 'num_particles': self.num_particles,
+                             'resampled': resampled, 'resample_count': self.resample_count})
+        self.record_health(self.history[-1])
+        return self.history[-1]
+
+    def record_health(self, diagnostics):
+        # Publish ESS, weight entropy, resample frequency and population size (no-op while metrics are off)
+        record_smc_step(type(self).__name__, diagnostics, len(self.history), self.metrics)
+
+    @property
+    def done(self):
+        # Whether inference has converged; subclasses with a natural end (e.g. EOS) override
+        return False
+
+    def summary(self, top_k=5):
+        """
+        Snapshot of the current weighted posterior.
+
+        Args:
+            top_k (int): Number of highest-weight particles to include.
+
+        Returns:
+            dict: step, ess, log_evidence, resample_count, done, and top as a list of
+            (particle, weight) pairs, heaviest first.
+        """
+        order = np.argsort(-self.weights, kind='stable')[:top_k]
+        return {
+            'step': len(self.history),
+            'ess': self.effective_sample_size(),
+            'log_evidence': self.log_evidence,
+            'resample_count': self.resample_count,
+            'done': self.done,
+            'top': [(self.store.particle(i), float(self.weights[i])) for i in order],
+        }
+
+    def iterate(self, context=None, num_steps=None, top_k=5):
+        """
+        Anytime inference: step until done (or num_steps) and yield the posterior
+        summary after every step, so callers can stop as soon as the answer is good
+        enough. Particles must already be initialized.
+
+        Yields:
+            dict: summary(top_k) after each step.
+        """
+        steps = 0
+        while not self.done and (num_steps is None or steps < num_steps):
+            self.step(context)
+            steps += 1
+            yield self.summary(top_k)
+
+    def run_until(self, deadline, context=None, max_steps=None, top_k=5, clock=time.perf_counter):
+        """
+        Step until done or until the next step would overrun the deadline, then return
+        the best current answer. Step cost is predicted from a running average, so the
+        call returns before the deadline instead of shortly after it.
+
+        Args:
+            deadline (float): Absolute time on clock by which to return.
+            context (dict): Passed to every step.
+            max_steps (int): Optional cap on the number of steps.
+            top_k (int): Number of particles in the summary.
+            clock (callable): Time source the deadline refers to.
+
+        Returns:
+            dict: The last summary(top_k), plus 'timed_out' (stopped by the deadline).
+        """
+        summary, steps, average = self.summary(top_k), 0, 0.0
+        began = clock()
+        if began < deadline:
+            for summary in self.iterate(context, max_steps, top_k):
+                now = clock()
+                elapsed, began = now - began, now
+                steps += 1
+                average = elapsed if steps == 1 else 0.8 * average + 0.2 * elapsed
+                # Predict conservatively: a slow last step is likely to be followed by another
+                if now + max(average, elapsed) > deadline:
+                    break
+        summary['timed_out'] = not summary['done'] and (max_steps is None or steps < max_steps)
+        return summary
+
+    def compute_weights(self, particles, context):
+        # Score the whole population at once and fold the increment into the running log-weights
+        incremental = np.asarray(self.log_likelihood_fn(particles, context), dtype=float)
+        log_weights = self.log_weights + incremental
+        log_norm = logsumexp(log_weights)
+        if not np.isfinite(log_norm):
+            raise ValueError("All particle weights are zero; cannot normalize.")
+        # log_weights were normalized before the update, so log_norm is the evidence increment
+        self.log_evidence += log_norm
+        self.log_weights = log_weights - log_norm
+        return np.exp(self.log_weights)
+
+    def likelihood(self, particle, context):
+        # Compute likelihood of a particle given the context
+        return np.random.random()  # Placeholder for actual likelihood computation
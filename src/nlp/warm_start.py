@@ -0,0 +1,230 @@
+import numpy as np
+
+
+def _hashable(item):
+    # Detections and landmarks compare by label when they carry one
+    if isinstance(item, dict):
+        return item['label'] if 'label' in item else tuple(sorted((k, _hashable(v)) for k, v in item.items()))
+    if isinstance(item, (list, tuple, np.ndarray)):
+        return tuple(_hashable(v) for v in item)
+    return item
+
+
+def _is_numeric(value):
+    try:
+        return np.asarray(value).dtype.kind in 'biuf'
+    except (TypeError, ValueError):
+        return False
+
+
+def context_distance(previous, current, scales=None):
+    """
+    Per-key change between two context dicts, each in [0, 1].
+
+    Numbers and coordinate tuples use the Euclidean distance divided by the key's
+    scale (capped at 1); collections (landmarks, detections) use the Jaccard
+    distance of their elements, by label when they have one; anything else is 0 if
+    equal and 1 otherwise. A key present in only one context counts as 1.
+
+    Args:
+        previous (dict): Earlier context.
+        current (dict): New context.
+        scales (dict): Change in a numeric key that counts as completely different
+            (e.g. {'location': 0.005} for about 500 m of latitude); default 1.0.
+
+    Returns:
+        dict: Key to distance.
+    """
+    scales = scales or {}
+    distances = {}
+    for key in set(previous) | set(current):
+        if key not in previous or key not in current:
+            distances[key] = 1.0
+            continue
+        a, b = previous[key], current[key]
+        if _is_numeric(a) and _is_numeric(b) and np.shape(a) == np.shape(b):
+            difference = np.linalg.norm(np.subtract(a, b, dtype=float))
+            distances[key] = float(min(difference / scales.get(key, 1.0), 1.0))
+        elif isinstance(a, (list, tuple, set)) and isinstance(b, (list, tuple, set)):
+            a, b = {_hashable(x) for x in a}, {_hashable(x) for x in b}
+            union = a | b
+            distances[key] = 1.0 - len(a & b) / len(union) if union else 0.0
+        else:
+            distances[key] = 0.0 if _hashable(a) == _hashable(b) else 1.0
+    return distances
+
+
+class ContextChangeDetector:
+    def __init__(self, threshold=0.5, scales=None, distance_fn=None):
+        """
+        Decides whether a new context is close enough to the previous one for the
+        previous posterior to be a useful prior.
+
+        Args:
+            threshold (float): Largest per-key change still treated as the same scene.
+            scales (dict): Per-key scales for numeric context entries (see context_distance).
+            distance_fn (callable): Replaces context_distance(previous, current) -> dict of distances.
+        """
+        self.threshold = threshold
+        self.scales = scales
+        self.distance_fn = distance_fn or (lambda previous, current: context_distance(previous, current, self.scales))
+        self.previous = None
+        self.last_distances = {}
+
+    def changed(self, context):
+        """
+        Compare a context with the previous one and remember it.
+
+        Returns:
+            str: The key that changed most if any change exceeds the threshold, else None.
+                The first context always counts as a change ('initial').
+        """
+        previous, self.previous = self.previous, dict(context or {})
+        if previous is None:
+            return 'initial'
+        self.last_distances = self.distance_fn(previous, self.previous)
+        if not self.last_distances:
+            return None
+        key = max(self.last_distances, key=self.last_distances.get)
+        return key if self.last_distances[key] > self.threshold else None
+
+    def reset(self):
+        self.previous = None
+        self.last_distances = {}
+
+
+class MetropolisMove:
+    def __init__(self, log_target, proposal, num_steps=1, rng=None):
+        """
+        Rejuvenation kernel: Metropolis-Hastings steps that leave the posterior
+        invariant while spreading resampled duplicates apart.
+
+        Args:
+            log_target (callable): log_target(particles, context) -> (N,) unnormalized
+                log-density the particles should follow.
+            proposal (callable): Symmetric proposal(particles, rng) -> proposed particles.
+            num_steps (int): MH steps per move.
+            rng (numpy.random.Generator): Random source; defaults to a fresh generator.
+        """
+        self.log_target = log_target
+        self.proposal = proposal
+        self.num_steps = num_steps
+        self.rng = rng or np.random.default_rng()
+        self.accepted = 0
+        self.proposed = 0
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    def __call__(self, particles, context):
+        particles = np.asarray(particles)
+        current = np.asarray(self.log_target(particles, context), dtype=float)
+        for _ in range(self.num_steps):
+            proposed = np.asarray(self.proposal(particles, self.rng))
+            log_density = np.asarray(self.log_target(proposed, context), dtype=float)
+            accept = np.log(self.rng.random(len(particles))) < log_density - current
+            particles = np.where(accept.reshape(-1, *[1] * (particles.ndim - 1)), proposed, particles)
+            current = np.where(accept, log_density, current)
+            self.accepted += int(accept.sum())
+            self.proposed += len(accept)
+        return particles
+
+
+class WarmStartSMC:
+    def __init__(self, smc, initial_state=None, detector=None, move=None, cold_steps=10, warm_steps=1,
+                 warm_particles=None, reset_ess_fraction=0.05):
+        """
+        Keeps a TwistedSMC population alive across frames and queries. While the
+        context changes only slightly, the previous posterior is the prior for the
+        next update: a few steps reweight it by the new context, with a rejuvenation
+        move after each resampling. A scene change (per the detector) or a collapse of
+        the ESS when reweighting (the prior no longer explains the context) restarts
+        from initialize_particles().
+
+        Args:
+            smc (TwistedSMC): The engine whose population is carried forward.
+            initial_state: Passed to initialize_particles() on every reset.
+            detector (ContextChangeDetector): Decides when to reset; defaults to one with
+                threshold 0.5 and unit scales.
+            move (callable): Rejuvenation move(particles, context) -> particles, e.g.
+                MetropolisMove; None skips rejuvenation.
+            cold_steps (int): Steps after a reset.
+            warm_steps (int): Steps per warm update.
+            warm_particles (int): Population size while warm (smaller than a cold start's
+                num_particles); None keeps the full population. Not supported by
+                ParallelTwistedSMC, whose shards have a fixed size.
+            reset_ess_fraction (float): Reset when the first warm reweighting leaves an
+                ESS below this fraction of the population.
+        """
+        self.smc = smc
+        self.initial_state = initial_state
+        self.detector = detector or ContextChangeDetector()
+        self.move = move
+        self.cold_steps = cold_steps
+        self.warm_steps = warm_steps
+        self.warm_particles = warm_particles
+        self.reset_ess_fraction = reset_ess_fraction
+        self.num_particles = smc.num_particles
+        self.resets = 0
+        self.warm_updates = 0
+
+    def update(self, context, top_k=5):
+        """
+        Bring the posterior up to date with a new context.
+
+        Returns:
+            dict: The SMC summary plus 'reset' (None when warm, else the reason:
+            'initial', 'ess', or the context key that changed) and 'steps' taken.
+        """
+        reason = self.detector.changed(context)
+        if reason is None:
+            summary = self._warm_update(context, top_k)
+            if summary is not None:
+                self.warm_updates += 1
+                return summary
+            reason = 'ess'
+        return self._cold_start(context, top_k, reason)
+
+    def reset(self):
+        # Force the next update to start from scratch
+        self.detector.reset()
+
+    def _cold_start(self, context, top_k, reason):
+        self.resets += 1
+        self._resize(self.num_particles, initialize=True)
+        steps = self._run(context, self.cold_steps)
+        if self.warm_particles:
+            self._resize(self.warm_particles)
+        return dict(self.smc.summary(top_k), reset=reason, steps=steps)
+
+    def _warm_update(self, context, top_k):
+        diagnostics = self.smc.step(context)
+        if diagnostics['ess'] < self.reset_ess_fraction * self.smc.num_particles:
+            return None
+        self._rejuvenate(diagnostics, context)
+        steps = 1 + self._run(context, self.warm_steps - 1)
+        return dict(self.smc.summary(top_k), reset=None, steps=steps)
+
+    def _run(self, context, num_steps):
+        steps = 0
+        while steps < num_steps and not self.smc.done:
+            self._rejuvenate(self.smc.step(context), context)
+            steps += 1
+        return steps
+
+    def _rejuvenate(self, diagnostics, context):
+        # Resampling duplicates particles; moving them restores diversity
+        if self.move is not None and diagnostics['resampled']:
+            self.smc.store.advance(self.move(self.smc.particles, context))
+
+    def _resize(self, num_particles, initialize=False):
+        smc = self.smc
+        if initialize:
+            smc.num_particles = num_particles
+            smc.initialize_particles(self.initial_state)
+        elif num_particles != smc.num_particles:
+            # Downsample by resampling, so the smaller population still follows the posterior
+            smc.store.resample(smc.resampler(smc.weights, num_particles, smc.rng))
+            smc.num_particles = num_particles
+            smc.reset_weights()
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize=2):
+        """
+        Bounded queue whose put() never blocks: when full, the oldest item is
+        discarded so downstream stages always work on the freshest data.
+
+        Args:
+            maxsize (int): Maximum number of buffered items.
+        """
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Remove and return the oldest item, raising queue.Empty after timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+
+class StageStats:
+    def __init__(self, name):
+        """
+        Throughput and busy-time counters for one pipeline stage.
+        """
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.processed += 1
+            self.busy_seconds += seconds
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                'processed': self.processed,
+                'errors': self.errors,
+                'throughput_per_s': self.processed / elapsed if elapsed > 0 else 0.0,
+                'mean_ms': 1000 * self.busy_seconds / self.processed if self.processed else 0.0,
+                'utilization': self.busy_seconds / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+class Stage(threading.Thread):
+    def __init__(self, name, fn, inbox=None, outbox=None, stop_event=None, poll_interval=0.1):
+        """
+        A pipeline stage running fn on its own worker thread.
+
+        Args:
+            name (str): Stage name used in reports.
+            fn (callable): With an inbox, ``fn(item)`` returning the item to forward
+                (None forwards nothing). Without an inbox the stage is a source and
+                ``fn()`` is called repeatedly; returning None ends the stream.
+                An exception while processing an item is logged and the item skipped;
+                an exception in a source ends the whole pipeline.
+            inbox: Queue to read from (queue.Queue or DropOldestQueue).
+            outbox: Queue to write results to.
+            stop_event (threading.Event): Shared event signalling shutdown.
+            poll_interval (float): How often an idle stage re-checks the stop event.
+        """
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event or threading.Event()
+        self.poll_interval = poll_interval
+        self.stats = StageStats(name)
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.inbox is not None:
+                    try:
+                        item = self.inbox.get(timeout=self.poll_interval)
+                    except queue.Empty:
+                        continue
+                began = time.perf_counter()
+                if self.inbox is not None:
+                    try:
+                        result = self.fn(item)
+                    except Exception as e:
+                        # One bad item must not silently kill the stage while upstream keeps producing
+                        self.error = e
+                        self.stats.record_error()
+                        print(f"Pipeline stage {self.stats.name} failed on an item: {e!r}")
+                        continue
+                else:
+                    result = self.fn()
+                self.stats.record(time.perf_counter() - began)
+                if result is None:
+                    if self.inbox is None:
+                        break  # Source exhausted
+                    continue
+                if self.outbox is not None:
+                    self.outbox.put(result)
+        except Exception as e:
+            self.error = e
+            self.stats.record_error()
+            print(f"Pipeline stage {self.stats.name} failed: {e!r}")
+        finally:
+            if self.inbox is None:
+                # A finished source ends the whole pipeline
+                self.stop_event.set()
+
+
+class Pipeline:
+    def __init__(self):
+        """
+        A set of stages connected by bounded queues, sharing one stop event.
+        """
+        self.stop_event = threading.Event()
+        self.stages = []
+        self.queues = {}
+        self.extra_stats = []
+
+    def queue(self, name, maxsize=2, drop_oldest=True):
+        """
+        Create a named queue between stages.
+        """
+        self.queues[name] = DropOldestQueue(maxsize) if drop_oldest else queue.Queue(maxsize)
+        return self.queues[name]
+
+    def add_stage(self, name, fn, inbox=None, outbox=None):
+        stage = Stage(name, fn, inbox, outbox, self.stop_event)
+        self.stages.append(stage)
+        return stage
+
+    def add_stats(self, name):
+        # Counters for work done outside the worker threads (e.g. rendering on the main thread)
+        stats = StageStats(name)
+        self.extra_stats.append(stats)
+        return stats
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def report(self):
+        """
+        Returns:
+            dict: Per-stage throughput/latency summaries and per-queue drop counts.
+        """
+        report = {stats.name: stats.summary() for stats in [s.stats for s in self.stages] + self.extra_stats}
+        for name, q in self.queues.items():
+            report.setdefault('dropped', {})[name] = getattr(q, 'dropped', 0)
+        return report
+
+    def print_report(self):
+        report = self.report()
+        dropped = report.pop('dropped', {})
+        print("Pipeline throughput:")
+        for name, summary in report.items():
+            print(f"  {name:<10} {summary['throughput_per_s']:6.1f}/s  {summary['mean_ms']:7.1f} ms/item  "
+                  f"{100 * summary['utilization']:5.1f}% busy  ({summary['processed']} items"
+                  + (f", {summary['errors']} errors)" if summary['errors'] else ")"))
+        if dropped:
+            print("  dropped: " + ", ".join(f"{name}={count}" for name, count in dropped.items()))
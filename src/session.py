@@ -0,0 +1,279 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Session file layout (little-endian):
+#   header   MAGIC, uint32 length, JSON metadata (codec, frame rate, ...)
+#   records  one per event, appended as they happen: RECORD header (kind, timestamp,
+#            payload length) followed by the payload
+#   index    INDEX_DTYPE entries for every record, then TRAILER (index offset, count, END)
+# Records are self-describing, so a file whose writer died before close() is recovered
+# by scanning them; the index lets a reader memory-map the file and seek directly.
+MAGIC = b'ARSESS01'
+END = b'ARSIDX01'
+RECORD = struct.Struct('<BdQ')
+TRAILER = struct.Struct('<QQ8s')
+FRAME_HEADER = struct.Struct('<III')  # height, width, channels
+FIX = struct.Struct('<ddd')  # latitude, longitude, accuracy in meters (NaN if unknown)
+INDEX_DTYPE = np.dtype([('kind', '<u1'), ('timestamp', '<f8'), ('offset', '<u8'), ('length', '<u8')])
+
+FRAME, GPS_FIX, QUERY = 0, 1, 2
+FRAME_CODECS = ('raw', 'jpg', 'png')
+
+
+class SessionRecorder:
+    def __init__(self, path, codec='jpg', quality=90, clock=time.perf_counter, metadata=None):
+        """
+        Writes camera frames, GPS fixes and user queries to a session file as they
+        happen. Thread-safe: pipeline stages may record from their own threads.
+
+        Args:
+            path (str): File to create (overwritten if it exists).
+            codec (str): Frame encoding; 'raw' frames are memory-mapped without decoding
+                on replay, 'jpg' is compact, 'png' is lossless.
+            quality (int): JPEG quality for the 'jpg' codec.
+            clock (callable): Time source for events recorded without a timestamp.
+            metadata (dict): Extra JSON-serializable information stored in the header.
+        """
+        if codec not in FRAME_CODECS:
+            raise ValueError(f"Unknown frame codec '{codec}'. Choose from {FRAME_CODECS}.")
+        self.path = path
+        self.codec = codec
+        self.quality = quality
+        self.clock = clock
+        self.started = clock()
+        self.index = []
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        header = json.dumps(dict(metadata or {}, codec=codec, created=time.time())).encode('utf-8')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def add_frame(self, frame, timestamp=None):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        self._write(FRAME, timestamp, FRAME_HEADER.pack(height, width, channels) + self._encode(frame))
+
+    def add_fix(self, location, timestamp=None, accuracy_m=math.nan):
+        self._write(GPS_FIX, timestamp, FIX.pack(float(location[0]), float(location[1]), accuracy_m))
+
+    def add_query(self, text, timestamp=None):
+        self._write(QUERY, timestamp, text.encode('utf-8'))
+
+    def close(self):
+        # Append the index and trailer; without them readers fall back to a scan
+        with self._lock:
+            if self._file is None:
+                return
+            index_offset = self._file.tell()
+            self._file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+            self._file.write(TRAILER.pack(index_offset, len(self.index), END))
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _encode(self, frame):
+        if self.codec == 'raw':
+            return frame.tobytes()
+        import cv2
+
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality] if self.codec == 'jpg' else []
+        ok, encoded = cv2.imencode(f'.{self.codec}', frame, params)
+        if not ok:
+            raise ValueError(f"Could not encode frame as {self.codec}.")
+        return encoded.tobytes()
+
+    def _write(self, kind, timestamp, payload):
+        with self._lock:
+            if self._file is None:
+                raise ValueError("Session recorder is closed.")
+            # Stamped under the lock so file order and time order agree across threads
+            if timestamp is None:
+                timestamp = self.clock() - self.started
+            offset = self._file.tell() + RECORD.size
+            self._file.write(RECORD.pack(kind, timestamp, len(payload)))
+            self._file.write(payload)
+            self.index.append((kind, timestamp, offset, len(payload)))
+
+
+class SessionReader:
+    def __init__(self, path):
+        """
+        Memory-maps a session file. Frames are decoded on access (raw frames are
+        returned as read-only views into the map); fixes and queries are small and
+        read eagerly.
+
+        Args:
+            path (str): File written by SessionRecorder.
+        """
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.zeros(0, np.uint8)
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a session file.")
+        header_length = struct.unpack('<I', bytes(self.data[len(MAGIC):len(MAGIC) + 4]))[0]
+        self.records_start = len(MAGIC) + 4 + header_length
+        self.metadata = json.loads(bytes(self.data[len(MAGIC) + 4:self.records_start]).decode('utf-8'))
+        self.codec = self.metadata['codec']
+        self.index, self.complete = self._read_index()
+
+        self.frame_records = self.index[self.index['kind'] == FRAME]
+        fixes = self.index[self.index['kind'] == GPS_FIX]
+        self.fix_times = fixes['timestamp'].copy()
+        self.fixes = np.array([FIX.unpack(self._payload(entry)) for entry in fixes], dtype=float).reshape(-1, 3)
+        self.queries = [(float(entry['timestamp']), bytes(self._payload(entry)).decode('utf-8'))
+                        for entry in self.index[self.index['kind'] == QUERY]]
+
+    def __len__(self):
+        return len(self.frame_records)
+
+    @property
+    def duration(self):
+        return float(self.index['timestamp'].max()) if len(self.index) else 0.0
+
+    def frame(self, i):
+        """
+        Returns:
+            numpy.ndarray: Frame i as an (H, W, C) uint8 array (read-only for raw sessions).
+        """
+        payload = self._payload(self.frame_records[i])
+        height, width, channels = FRAME_HEADER.unpack(bytes(payload[:FRAME_HEADER.size]))
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        if self.codec == 'raw':
+            return payload[FRAME_HEADER.size:].view(np.ndarray).reshape(shape)
+        import cv2
+
+        return cv2.imdecode(np.asarray(payload[FRAME_HEADER.size:]), cv2.IMREAD_UNCHANGED)
+
+    def frame_time(self, i):
+        return float(self.frame_records[i]['timestamp'])
+
+    def location_at(self, timestamp):
+        """
+        Returns:
+            tuple: The latest (latitude, longitude) fix at or before timestamp, or None.
+        """
+        i = np.searchsorted(self.fix_times, timestamp, side='right') - 1
+        return None if i < 0 else (float(self.fixes[i, 0]), float(self.fixes[i, 1]))
+
+    def events(self):
+        """
+        Yields:
+            tuple: (timestamp, kind, index within its kind) for every record in order.
+        """
+        counters = [0, 0, 0]
+        for entry in self.index:
+            kind = int(entry['kind'])
+            yield float(entry['timestamp']), kind, counters[kind]
+            counters[kind] += 1
+
+    def _payload(self, entry):
+        return self.data[int(entry['offset']):int(entry['offset']) + int(entry['length'])]
+
+    def _read_index(self):
+        if len(self.data) >= self.records_start + TRAILER.size:
+            index_offset, count, end = TRAILER.unpack(bytes(self.data[-TRAILER.size:]))
+            if end == END:
+                raw = self.data[index_offset:index_offset + count * INDEX_DTYPE.itemsize]
+                return np.frombuffer(raw, dtype=INDEX_DTYPE).copy(), True
+        # The recorder did not finish: rebuild the index from the record headers,
+        # dropping a trailing record that was cut short
+        entries, position = [], self.records_start
+        while position + RECORD.size <= len(self.data):
+            kind, timestamp, length = RECORD.unpack(bytes(self.data[position:position + RECORD.size]))
+            offset = position + RECORD.size
+            if kind not in (FRAME, GPS_FIX, QUERY) or offset + length > len(self.data):
+                break
+            entries.append((kind, timestamp, offset, length))
+            position = offset + length
+        return np.array(entries, dtype=INDEX_DTYPE), False
+
+
+class ReplaySource:
+    def __init__(self, reader, speed=1.0, loop=False, on_query=None, clock=time.perf_counter, sleep=time.sleep):
+        """
+        Feeds a recorded session back through the cv2.VideoCapture interface. Every
+        read() first applies the GPS fixes and queries recorded up to the frame's
+        timestamp, in recorded order, so the event sequence seen by the pipeline is
+        the same on every replay regardless of pacing.
+
+        Args:
+            reader (SessionReader): The recorded session.
+            speed (float): Playback rate relative to real time (2.0 = twice as fast);
+                None or 0 replays as fast as the consumer reads.
+            loop (bool): Start over after the last frame instead of ending the stream.
+            on_query (callable): Called with each recorded query text.
+            clock (callable): Time source for pacing.
+            sleep (callable): Used to wait until an event is due.
+        """
+        self.reader = reader
+        self.speed = speed or None
+        self.loop = loop
+        self.on_query = on_query
+        self.clock = clock
+        self.sleep = sleep
+        self.location = None
+        self.frames_read = 0
+        self.max_lag = 0.0
+        self._events = None
+        self._started = None
+        self._opened = True
+        self._lock = threading.Lock()
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def read(self):
+        """
+        Returns:
+            tuple: (True, frame) for the next recorded frame, or (False, None) at the end.
+        """
+        with self._lock:
+            while self._opened:
+                if self._events is None:
+                    self._events = self.reader.events()
+                for timestamp, kind, i in self._events:
+                    self._wait_until(timestamp)
+                    if kind == FRAME:
+                        self.frames_read += 1
+                        return True, np.array(self.reader.frame(i))
+                    if kind == GPS_FIX:
+                        self.location = tuple(float(x) for x in self.reader.fixes[i, :2])
+                    elif self.on_query is not None:
+                        self.on_query(self.reader.queries[i][1])
+                if not self.loop or not len(self.reader):
+                    break
+                # Looping restarts the schedule, so pacing continues from the current time
+                self._events, self._started = None, None
+            return False, None
+
+    def get_location(self):
+        # Drop-in for SpatialRecognition.get_location: the latest fix replayed so far
+        return self.location
+
+    def stats(self):
+        return {'frames': self.frames_read, 'max_lag_ms': 1000 * self.max_lag}
+
+    def _wait_until(self, timestamp):
+        if self.speed is None:
+            return
+        if self._started is None:
+            self._started = self.clock() - timestamp / self.speed
+        delay = self._started + timestamp / self.speed - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        else:
+            # How far behind schedule the consumer is (dropped real-time budget)
+            self.max_lag = max(self.max_lag, -delay)
@@ -0,0 +1,106 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self):
+        """
+        Records how long each startup phase takes and when milestones such as
+        the first processed frame or the first answer are reached.
+        """
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.milestones = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a block of startup work under the given name.
+        """
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - began
+
+    def mark(self, name):
+        """
+        Record the first time a milestone is reached, relative to process start.
+        """
+        with self._lock:
+            self.milestones.setdefault(name, time.perf_counter() - self.start)
+
+    def report(self):
+        """
+        Returns:
+            dict: Phase durations and milestone times in seconds.
+        """
+        with self._lock:
+            return {'phases': dict(self.phases), 'milestones': dict(self.milestones)}
+
+    def print_report(self):
+        report = self.report()
+        print("Startup timings:")
+        for name, seconds in report['phases'].items():
+            print(f"  {name}: {seconds:.3f}s")
+        for name, seconds in report['milestones'].items():
+            print(f"  {name}: {seconds:.3f}s after start")
+
+
+class LazyComponent:
+    def __init__(self, name, factory, timer=None):
+        """
+        A component that is constructed on first use, or ahead of time in a
+        background thread via warm(). Concurrent callers wait for the single build.
+
+        Args:
+            name (str): Name used in timing reports and error messages.
+            factory (callable): Zero-argument function building the component;
+                heavy imports belong inside it so they are deferred as well.
+            timer (StartupTimer): Optional timer recording the build phase.
+        """
+        self.name = name
+        self.factory = factory
+        self.timer = timer
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._built
+
+    def get(self):
+        """
+        Return the component, building it now if it is not ready yet.
+        """
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    if self.timer is not None:
+                        with self.timer.phase(f"build {self.name}"):
+                            self._value = self.factory()
+                    else:
+                        self._value = self.factory()
+                    self._built = True
+        return self._value
+
+    def warm(self):
+        """
+        Start building the component in a background daemon thread.
+        """
+        if self._thread is None and not self._built:
+            self._thread = threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _warm(self):
+        try:
+            self.get()
+        except Exception as e:
+            # get() retries in the foreground and raises there
+            print(f"Background warm-up of {self.name} failed: {e}")
@@ -1,7 +1,16 @@
 import unittest
-from ar.visual import VisualRecognition
+from ar.batching import BatchScheduler
+from ar.visual import InputSizeController, VisualRecognition, decode_detections, select_dnn_preference, split_batch_outputs
 from ar.spatial import SpatialRecognition
+from ar.tracking import IoUTracker
+from ar.landmarks import LandmarkStore, haversine_km
+from ar.geocoding import OfflineBackend, RateLimiter, ReverseGeocoder
 import cv2
+import numpy as np
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError
 
 class TestVisualRecognition(unittest.TestCase):
 
@@ -47,6 +56,309 @@ class TestVisualRecognition(unittest.TestCase):
         self.assertIn('person', labels, "Expected a person to be detected in the image.")
     
 
+class TestDetectionDecoding(unittest.TestCase):
+
+    def make_row(self, cx, cy, w, h, class_id, score, num_classes=3):
+        row = np.zeros(5 + num_classes, dtype=np.float32)
+        row[:5] = (cx, cy, w, h, 1.0)
+        row[5 + class_id] = score
+        return row
+
+    def test_decode_filters_and_suppresses(self):
+        """
+        Test that weak rows are dropped and overlapping boxes are suppressed on synthetic YOLO output.
+        """
+        outputs = [np.stack([
+            self.make_row(0.5, 0.5, 0.2, 0.2, class_id=0, score=0.9),
+            self.make_row(0.51, 0.5, 0.2, 0.2, class_id=0, score=0.8),  # Overlaps the first box
+            self.make_row(0.1, 0.1, 0.1, 0.1, class_id=2, score=0.3),   # Too weak
+        ]), np.stack([self.make_row(0.8, 0.2, 0.1, 0.1, class_id=1, score=0.7)])]
+
+        boxes, confidences, class_ids = decode_detections(outputs, width=100, height=100)
+
+        self.assertEqual(boxes.tolist(), [[40, 40, 20, 20], [75, 15, 10, 10]])
+        np.testing.assert_allclose(confidences, [0.9, 0.7], rtol=1e-6)
+        self.assertEqual(class_ids.tolist(), [0, 1])
+
+    def test_class_aware_nms_keeps_other_classes(self):
+        """
+        Test that class-aware NMS does not suppress an overlapping box of a different class.
+        """
+        outputs = [np.stack([
+            self.make_row(0.5, 0.5, 0.2, 0.2, class_id=0, score=0.9),
+            self.make_row(0.5, 0.5, 0.2, 0.2, class_id=1, score=0.8),
+        ])]
+
+        self.assertEqual(len(decode_detections(outputs, 100, 100)[0]), 1)
+        self.assertEqual(len(decode_detections(outputs, 100, 100, class_aware=True)[0]), 2)
+
+    def test_split_batch_outputs(self):
+        """
+        Test that batched outputs are split per image for both OpenCV output layouts.
+        """
+        stacked = np.arange(2 * 3 * 8).reshape(2, 3, 8)
+        folded = stacked.reshape(6, 8)
+
+        for outputs in ([stacked], [folded]):
+            per_image = split_batch_outputs(outputs, batch_size=2)
+            self.assertEqual(len(per_image), 2)
+            np.testing.assert_array_equal(per_image[1][0], stacked[1])
+
+
+class TestIoUTracker(unittest.TestCase):
+
+    def detection(self, x, label="person"):
+        return {"label": label, "class_id": 0, "confidence": 0.9, "bounding_box": (x, 10, 20, 40)}
+
+    def test_track_ids_are_stable_across_keyframes(self):
+        """
+        Test that overlapping same-label detections keep their IDs and boxes move between keyframes.
+        """
+        tracker = IoUTracker()
+        first = tracker.update([self.detection(0), self.detection(100)])
+        predicted = tracker.predict()
+        second = tracker.update([self.detection(104), self.detection(4)], frames_elapsed=2)
+
+        ids = {obj["bounding_box"][0]: obj["track_id"] for obj in second}
+        self.assertEqual(ids[4], first[0]["track_id"])
+        self.assertEqual(ids[104], first[1]["track_id"])
+        self.assertEqual(predicted[0]["bounding_box"], (0, 10, 20, 40))
+        self.assertEqual(tracker.predict()[1]["bounding_box"], (6, 10, 20, 40))
+
+    def test_different_labels_get_new_ids(self):
+        """
+        Test that a detection with another label never continues an existing track.
+        """
+        tracker = IoUTracker()
+        first = tracker.update([self.detection(0)])
+        second = tracker.update([self.detection(0, label="car")])
+
+        self.assertNotEqual(first[0]["track_id"], second[0]["track_id"])
+
+
+class TestInputSizeController(unittest.TestCase):
+
+    def objects(self, count, size=100):
+        return [{"label": "person", "bounding_box": (0, 0, size, size)} for _ in range(count)]
+
+    def test_complex_scenes_grow_the_input_after_patience(self):
+        """
+        Test that crowded scenes move to the largest size only once the change persists.
+        """
+        controller = InputSizeController(patience=3)
+        sizes = [controller.update(10.0, self.objects(25), (480, 640, 3)) for _ in range(3)]
+        self.assertEqual(sizes, [416, 416, 608])
+        sizes = [controller.update(10.0, [], (480, 640, 3)) for _ in range(3)]
+        self.assertEqual(sizes, [608, 608, 320])
+
+    def test_budget_caps_and_shrinks_the_input(self):
+        """
+        Test that an over-budget size is left at once and unaffordable sizes are never chosen.
+        """
+        controller = InputSizeController(latency_budget_ms=30.0, patience=1)
+        self.assertEqual(controller.update(60.0, self.objects(25), (480, 640, 3)), 320)
+        # Once detection costs 100 ms per megapixel, 416 (17 ms) fits the budget but 608 (37 ms) never does
+        sizes = [controller.update(1e-4 * controller.size ** 2, self.objects(25), (480, 640, 3)) for _ in range(20)]
+        self.assertEqual(sizes[-1], 416)
+        self.assertNotIn(608, sizes)
+
+    def test_batched_detection_adapts_the_input_size(self):
+        """
+        Test that frames detected through the BatchScheduler drive the controller too.
+        """
+        class Net:
+            def setInput(self, blob):
+                self.blob = blob
+
+            def forward(self, output_layers):
+                # No objects: every row has zero objectness
+                return [np.zeros((len(self.blob), 4, 7), dtype=np.float32)]
+
+        visual_recognition = VisualRecognition.__new__(VisualRecognition)
+        visual_recognition.net, visual_recognition.output_layers = Net(), ['yolo']
+        visual_recognition.box_units, visual_recognition.labels = 'normalized', ['a', 'b']
+        visual_recognition.size_controller = InputSizeController(patience=2)
+        visual_recognition.input_size = visual_recognition.size_controller.size
+
+        scheduler = BatchScheduler(visual_recognition, max_batch_size=2, max_wait_ms=10000)
+        frames = np.zeros((2, 48, 64, 3), dtype=np.uint8)
+        self.assertEqual(scheduler.detect({"left": frames[0], "right": frames[1]}, timeout=5),
+                         {"left": [], "right": []})
+        scheduler.close()
+        # Two empty frames in one batch satisfy the patience for the smallest size
+        self.assertEqual(visual_recognition.input_size, 320)
+        self.assertIsNotNone(visual_recognition.size_controller.ms_per_megapixel)
+
+    def test_unavailable_dnn_target_falls_back_to_cpu(self):
+        """
+        Test that an unsupported backend/target pair falls back to OpenCV on the CPU.
+        """
+        class Net:
+            def setPreferableBackend(self, backend):
+                self.backend = backend
+
+            def setPreferableTarget(self, target):
+                self.target = target
+
+        net = Net()
+        self.assertEqual(select_dnn_preference(net, 'opencv', 'cpu'), ('opencv', 'cpu'))
+        self.assertEqual(select_dnn_preference(net, 'cuda', 'cuda_fp16'), ('opencv', 'cpu'))
+        self.assertEqual((net.backend, net.target), (cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU))
+        with self.assertRaises(ValueError):
+            select_dnn_preference(net, 'tpu', 'cpu')
+
+
+class FakeDetector:
+    def __init__(self, release=None):
+        self.batch_sizes = []
+        self.release = release
+
+    def detect_batch(self, frames, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batch_sizes.append(len(frames))
+        return [[{"label": "frame", "value": int(frame)}] for frame in frames]
+
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def test_full_batches_dispatch_without_waiting(self):
+        """
+        Test that frames from several streams share one forward pass once the batch is full.
+        """
+        detector = FakeDetector()
+        scheduler = BatchScheduler(detector, max_batch_size=4, max_wait_ms=10000)
+        results = scheduler.detect({stream: stream for stream in range(4)}, timeout=5)
+        scheduler.close()
+
+        self.assertEqual(results, {stream: [{"label": "frame", "value": stream}] for stream in range(4)})
+        self.assertEqual(detector.batch_sizes, [4])
+
+    def test_partial_batch_flushes_after_max_wait(self):
+        """
+        Test that a lone frame is dispatched once it has waited max_wait_ms.
+        """
+        detector = FakeDetector()
+        scheduler = BatchScheduler(detector, max_batch_size=8, max_wait_ms=20)
+        self.assertEqual(scheduler.submit("left", 7).result(5), ("left", [{"label": "frame", "value": 7}]))
+        scheduler.close()
+        self.assertEqual(detector.batch_sizes, [1])
+
+    def test_close_cancels_pending_frames(self):
+        """
+        Test that close() lets the batch in flight finish, cancels queued frames and rejects new ones.
+        """
+        release = threading.Event()
+        detector = FakeDetector(release)
+        scheduler = BatchScheduler(detector, max_batch_size=1, max_wait_ms=0)
+        in_flight = scheduler.submit("left", 1)
+        while not scheduler._pending.empty():
+            time.sleep(0.001)  # until the worker has taken the first frame
+        queued = scheduler.submit("right", 2)
+        scheduler.close(timeout=0.05)
+
+        with self.assertRaises(CancelledError):
+            queued.result(5)
+        release.set()
+        self.assertEqual(in_flight.result(5), ("left", [{"label": "frame", "value": 1}]))
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("left", 3)
+
+
+class TestLandmarkStore(unittest.TestCase):
+
+    def test_radius_query_matches_brute_force(self):
+        """
+        Test that the grid index returns exactly the landmarks a full haversine scan finds,
+        including after a save/memory-mapped load round trip.
+        """
+        rng = np.random.default_rng(0)
+        coordinates = np.column_stack([rng.uniform(40.70, 40.80, 2000), rng.uniform(-74.02, -73.93, 2000)])
+        names = [f"poi-{i}" for i in range(len(coordinates))]
+        location = (40.748817, -73.985428)
+        expected = {names[i] for i in np.nonzero(haversine_km(*location, coordinates[:, 0], coordinates[:, 1]) <= 1.5)[0]}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            LandmarkStore.build(names, coordinates).save(tmpdir)
+            store = LandmarkStore.load(tmpdir)
+            indices, distances = store.query_radius(location, 1.5)
+
+            self.assertEqual(set(store.names(indices)), expected)
+            self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_queries_across_the_antimeridian(self):
+        """
+        Test that radius and nearest queries wrap around longitude +/-180.
+        """
+        store = LandmarkStore.build(["east", "west", "far"], [(0.0, 179.999), (0.0, -179.999), (10.0, 0.0)])
+
+        self.assertEqual(set(store.names(store.query_radius((0.0, 180.0), 1.0)[0])), {"east", "west"})
+        self.assertEqual(store.names(store.nearest((9.0, 1.0), k=1)[0]), ["far"])
+
+
+class TestReverseGeocoder(unittest.TestCase):
+
+    def setUp(self):
+        store = LandmarkStore.build(["350 5th Ave", "1 Times Sq"], [(40.748817, -73.985428), (40.758896, -73.985130)])
+        self.backend = OfflineBackend(store, max_distance_km=0.2)
+        self.calls = []
+        lookup = self.backend.reverse
+        self.backend.reverse = lambda location: self.calls.append(location) or lookup(location)
+
+    def test_offline_lookups_are_cached_per_cell(self):
+        """
+        Test nearby fixes share one quantized cache entry and far ones have no address.
+        """
+        geocoder = ReverseGeocoder(self.backend, rate_limit=None)
+        self.assertEqual(geocoder.reverse((40.74882, -73.98543)), "350 5th Ave")
+        self.assertEqual(geocoder.reverse((40.74884, -73.98541)), "350 5th Ave")
+        self.assertEqual(len(self.calls), 1)
+        self.assertIsNone(geocoder.reverse((41.0, -74.5)))
+
+    def test_locations_without_address_are_cached(self):
+        """
+        Test that an empty area is requested once, then answered from the cache until negative_ttl.
+        """
+        geocoder = ReverseGeocoder(self.backend, rate_limit=None, negative_ttl=60)
+        self.assertIsNone(geocoder.reverse((41.0, -74.5)))
+        self.assertIsNone(geocoder.reverse((41.00001, -74.5)))
+        self.assertEqual(geocoder.reverse_batch([(41.0, -74.5), (40.748817, -73.985428)]), [None, "350 5th Ave"])
+        self.assertIsNone(geocoder.cached((41.0, -74.5)))
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(geocoder.stats()['requests'], 2)
+
+        geocoder.cache.clock = lambda: time.time() + 61
+        self.assertIsNone(geocoder.reverse((41.0, -74.5)))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_batch_lookups_dedupe_and_persist(self):
+        """
+        Test batch lookups keep order, request each cell once and survive a restart.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/geocode.sqlite"
+            geocoder = ReverseGeocoder(self.backend, rate_limit=None, cache_path=path)
+            locations = [(40.758896, -73.985130), (40.748817, -73.985428), (40.75889, -73.98513)]
+            self.assertEqual(geocoder.reverse_batch(locations), ["1 Times Sq", "350 5th Ave", "1 Times Sq"])
+            self.assertEqual(len(self.calls), 2)
+            geocoder.close()
+
+            restarted = ReverseGeocoder(self.backend, rate_limit=None, cache_path=path)
+            self.assertEqual(restarted.reverse(locations[1]), "350 5th Ave")
+            self.assertEqual(len(self.calls), 2)
+            restarted.close()
+
+    def test_rate_limiter_spaces_calls(self):
+        """
+        Test the token bucket allows a burst, then one call per 1/rate seconds.
+        """
+        now, waits = [0.0], []
+        limiter = RateLimiter(2.0, burst=2, clock=lambda: now[0], sleep=waits.append)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertEqual(waits, [0.5, 1.0])
+
+
 class TestSpatialRecognition(unittest.TestCase):
 
     @classmethod
@@ -93,6 +405,16 @@ class TestSpatialRecognition(unittest.TestCase):
         # Optionally, check if specific landmarks are found
         self.assertIn("Empire State Building", nearby_landmarks, "Expected 'Empire State Building' to be in the nearby landmarks.")
 
+    def test_get_nearest_landmarks(self):
+        """
+        Test k-nearest landmark lookup returns names with increasing distances.
+        """
+        location = self.spatial_recognition.get_location()
+        nearest = self.spatial_recognition.get_nearest_landmarks(location, k=2)
+
+        self.assertEqual([name for name, _ in nearest], ["Empire State Building", "Bryant Park"])
+        self.assertLessEqual(nearest[0][1], nearest[1][1])
+
     def test_calculate_distance(self):
         """
         Test the distance calculation between two locations.
@@ -107,6 +429,30 @@ class TestSpatialRecognition(unittest.TestCase):
         self.assertGreater(distance, 0, "The distance between two locations should be greater than 0.")
         self.assertLess(distance, 2.0, "The distance between these two locations should be less than 2 km.")
 
+    def test_bulk_distances_match_geodesic(self):
+        """
+        Test one-to-many and many-to-many distances against geopy's geodesic.
+        """
+        from geopy.distance import geodesic
+
+        rng = np.random.default_rng(0)
+        points = np.column_stack([rng.uniform(-80, 80, 50), rng.uniform(-180, 180, 50)])
+        origin = (40.748817, -73.985428)
+        expected = np.array([geodesic(origin, tuple(p)).kilometers for p in points])
+
+        precise = self.spatial_recognition.calculate_distances(origin, points, mode='vincenty')
+        np.testing.assert_allclose(precise, expected, atol=1e-6)
+        fast = self.spatial_recognition.calculate_distances(origin, points)
+        np.testing.assert_allclose(fast, expected, rtol=0.0056)
+
+        matrix = self.spatial_recognition.calculate_distance_matrix(points[:5], points, mode='vincenty')
+        self.assertEqual(matrix.shape, (5, 50))
+        np.testing.assert_allclose(matrix[0, 0], 0.0)
+        np.testing.assert_allclose(matrix[:, 7], [geodesic(tuple(p), tuple(points[7])).kilometers for p in points[:5]],
+                                   atol=1e-6)
+        with self.assertRaises(ValueError):
+            self.spatial_recognition.calculate_distances(origin, points, mode='flat')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from benchmarks import compare_to_baseline, run_benchmarks, synthetic_yolo_outputs
+from ar.visual import decode_detections
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_regressions_are_flagged_against_baseline(self):
+        """
+        Test that only cases slower than the tolerance allows are flagged.
+        """
+        baseline = {"fast": {"median_ms": 1.0}, "slow": {"median_ms": 1.0}, "gone": {"median_ms": 1.0}}
+        results = {"fast": {"median_ms": 1.1}, "slow": {"median_ms": 1.5}, "new": {"median_ms": 3.0},
+                   "lm": {"skipped": "No module named 'torch'"}}
+        comparison = compare_to_baseline(results, baseline, tolerance=0.25)
+
+        self.assertEqual(set(comparison), {"fast", "slow"})
+        self.assertFalse(comparison["fast"]["regression"])
+        self.assertTrue(comparison["slow"]["regression"])
+        self.assertAlmostEqual(comparison["slow"]["ratio"], 1.5)
+
+    def test_quick_smc_run_produces_timings(self):
+        """
+        Test that a quick benchmark run reports timings for every particle count.
+        """
+        results = run_benchmarks(["smc"], quick=True, repeat=3, min_time=0.0, log=lambda line: None)
+
+        self.assertEqual(list(results), ["smc_step[n=100]", "smc_step[n=1000]", "smc_step[n=10000]"])
+        for timing in results.values():
+            self.assertGreater(timing["median_ms"], 0.0)
+            self.assertGreaterEqual(timing["p90_ms"], timing["median_ms"])
+
+    def test_synthetic_yolo_outputs_decode_to_objects(self):
+        """
+        Test that every synthetic object cluster survives decoding as one detection.
+        """
+        boxes, confidences, class_ids = decode_detections(synthetic_yolo_outputs(num_objects=5, seed=1), 640, 480)
+
+        self.assertEqual(len(boxes), 5)
+        self.assertTrue(np.all(np.asarray(confidences) >= 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
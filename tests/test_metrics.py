@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+import unittest
+import urllib.request
+import numpy as np
+from metrics import MetricsRegistry, MetricsServer, SamplingProfiler, _NULL_TIMER
+from nlp.twisted_smc import TwistedSMC
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_exports_cumulative_buckets(self):
+        """
+        Test that observations land in cumulative Prometheus buckets with sum and count.
+        """
+        registry = MetricsRegistry(enabled=True)
+        histogram = registry.histogram('stage_latency_seconds', stage='detect_objects')
+        for value in (0.002, 0.004, 0.3):
+            histogram.observe(value)
+        text = registry.to_prometheus()
+
+        self.assertIn('# TYPE arnav_stage_latency_seconds histogram', text)
+        self.assertIn('arnav_stage_latency_seconds_bucket{stage="detect_objects",le="0.0025"} 1', text)
+        self.assertIn('arnav_stage_latency_seconds_bucket{stage="detect_objects",le="0.005"} 2', text)
+        self.assertIn('arnav_stage_latency_seconds_bucket{stage="detect_objects",le="+Inf"} 3', text)
+        self.assertIn('arnav_stage_latency_seconds_count{stage="detect_objects"} 3', text)
+        self.assertEqual(histogram.quantile(0.5), 0.005)
+
+    def test_disabled_registry_records_nothing(self):
+        """
+        Test that a disabled registry hands out the shared no-op timer and stays empty.
+        """
+        registry = MetricsRegistry()
+        self.assertIs(registry.timer('capture'), _NULL_TIMER)
+        with registry.timer('capture'):
+            pass
+        self.assertEqual(registry.timed('capture')(lambda x: x + 1)(1), 2)
+        self.assertEqual(registry.to_json(), {'histogram': {}, 'gauge': {}, 'counter': {}})
+
+    def test_smc_health_gauges_are_exported(self):
+        """
+        Test that SMC steps publish ESS, entropy, resample frequency and particle count over HTTP.
+        """
+        class GaussianProposal:
+            def sample(self, num_particles, initial_state):
+                return np.random.default_rng(0).normal(initial_state, 1.0, size=(num_particles, 2))
+
+        smc = TwistedSMC(50, GaussianProposal(), lambda particles, context: particles,
+                         lambda particles, context: -np.sum(particles ** 2, axis=1), ess_threshold=2.0)
+        smc.initialize_particles(0.0)
+        smc.metrics = MetricsRegistry(enabled=True)
+        server = MetricsServer(smc.metrics, port=0).start()
+        try:
+            for _ in range(4):
+                diagnostics = smc.step({})
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics.json") as response:
+                exported = json.loads(response.read())
+        finally:
+            server.stop()
+
+        gauges = {name: entries[0]['value'] for name, entries in exported['gauge'].items()}
+        self.assertEqual(gauges['smc_num_particles'], 50)
+        self.assertEqual(gauges['smc_resample_fraction'], 1.0)
+        self.assertAlmostEqual(gauges['smc_ess'], diagnostics['ess'])
+        self.assertAlmostEqual(gauges['smc_weight_entropy'], diagnostics['entropy'])
+        self.assertLessEqual(diagnostics['entropy'], np.log(50) + 1e-9)
+
+    def test_profiler_attributes_samples_to_busy_functions(self):
+        """
+        Test that sampled stacks name the busy thread and function, in collapsed and top form.
+        """
+        def spin_for_profiler(seconds):
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+
+        profiler = SamplingProfiler(interval=0.005).start()
+        worker = threading.Thread(target=spin_for_profiler, args=(0.2,), name="busy-worker")
+        worker.start()
+        worker.join()
+        profiler.stop()
+
+        lines = profiler.collapsed().splitlines()
+        busy = [line for line in lines if line.startswith("busy-worker;") and "spin_for_profiler" in line]
+        self.assertTrue(busy)
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+        self.assertTrue(any(function.startswith("spin_for_profiler") for function, _ in profiler.top()))
+
+
+if __name__ == "__main__":
+    unittest.main()
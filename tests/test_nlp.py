@@ -1,5 +1,17 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
 import unittest
+from unittest import mock
 from nlp.model import LanguageModel
+from nlp import inference_modes
+from nlp.cache import DiskCache, LRUCache, TTLCache, canonical_key
+from nlp.serving import DeadlineExceeded, MicroBatcher, Overloaded, QueryServer
+from nlp.twist_cache import CachedTwist, PrefixTrie
+import numpy as np
+import torch
 
 class TestLanguageModel(unittest.TestCase):
 
@@ -40,6 +52,31 @@ class TestLanguageModel(unittest.TestCase):
             self.assertIsInstance(interpretation, str)
             self.assertTrue(len(interpretation) > 0, "Each interpretation should be a non-empty string.")
 
+    def test_get_weighted_interpretations(self):
+        """
+        Test that token-level twisted SMC returns interpretations with normalized weights.
+        """
+        query = "What is special here?"
+        interpretations = self.language_model.get_weighted_interpretations(query, num_particles=8, max_length=20)
+
+        self.assertIsInstance(interpretations, list)
+        self.assertGreater(len(interpretations), 0)
+        for interpretation, weight in interpretations:
+            self.assertIsInstance(interpretation, str)
+            self.assertGreater(weight, 0.0)
+        self.assertAlmostEqual(sum(weight for _, weight in interpretations), 1.0, places=5)
+
+    def test_stream_weighted_interpretations(self):
+        """
+        Test that streaming SMC yields one update per decoded token and ends when done.
+        """
+        updates = list(self.language_model.stream_weighted_interpretations(
+            "What is special here?", num_particles=4, max_length=10, num_results=2))
+
+        self.assertEqual([update['step'] for update in updates], list(range(1, len(updates) + 1)))
+        self.assertTrue(updates[-1]['done'])
+        self.assertLessEqual(len(updates[-1]['interpretations']), 2)
+
     def test_interpret_with_context(self):
         """
         Test that the language model correctly integrates context into query interpretation.
@@ -56,6 +93,383 @@ class TestLanguageModel(unittest.TestCase):
         # Check if the response incorporates the context (e.g., mentions the landmark)
         self.assertIn("Empire State Building", refined_interpretation, "The response should mention the landmark from the context.")
 
+    def test_encoder_cache_reused_for_repeated_queries(self):
+        """
+        Test that repeated queries (modulo whitespace) hit the encoder cache.
+        """
+        self.language_model.encoder_cache.clear()
+        first = self.language_model.encode_query("What is   special here?")
+        second = self.language_model.encode_query("What is special here?")
+
+        self.assertIs(first, second)
+        self.assertGreaterEqual(self.language_model.encoder_cache.stats()['hits'], 1)
+
+    def test_interpret_with_context_batch_matches_single_queries(self):
+        """
+        Test that a padded batch gives the same interpretations as one query at a time.
+        """
+        queries = ["What is special here?", "Where can I eat?", "Tell me about this building."]
+        contexts = [{"landmark": "Bryant Park"}, {}, {"landmark": "Empire State Building"}]
+        batched = self.language_model.interpret_with_context_batch(queries, contexts, use_cache=False)
+        single = [self.language_model.interpret_with_context(q, c, use_cache=False) for q, c in zip(queries, contexts)]
+
+        self.assertEqual(batched, single)
+
+
+class TestInferenceModes(unittest.TestCase):
+
+    def model(self):
+        torch.manual_seed(0)
+        return torch.nn.Sequential(torch.nn.Linear(8, 16), torch.nn.ReLU(), torch.nn.Linear(16, 4))
+
+    def test_int8_quantizes_linear_layers(self):
+        """
+        Test that int8 swaps nn.Linear for dynamically quantized layers with close outputs.
+        """
+        model = self.model()
+        inputs = torch.randn(3, 8)
+        expected = model(inputs)
+        quantized, mode = inference_modes.apply_inference_mode(model, 'int8')
+
+        self.assertEqual(mode, 'int8')
+        self.assertNotIsInstance(quantized[0], torch.nn.Linear)
+        self.assertTrue(torch.allclose(quantized(inputs), expected, atol=0.1))
+
+    def test_bf16_falls_back_to_fp32_when_unsupported(self):
+        """
+        Test that bf16 converts the weights when supported and otherwise keeps fp32.
+        """
+        with mock.patch.object(inference_modes, 'bf16_supported', return_value=False):
+            model, mode = inference_modes.apply_inference_mode(self.model(), 'bf16')
+        self.assertEqual((mode, model[0].weight.dtype), ('fp32', torch.float32))
+        with mock.patch.object(inference_modes, 'bf16_supported', return_value=True):
+            model, mode = inference_modes.apply_inference_mode(self.model(), 'bf16')
+        self.assertEqual((mode, model[0].weight.dtype), ('bf16', torch.bfloat16))
+        with self.assertRaises(ValueError):
+            inference_modes.apply_inference_mode(self.model(), 'fp8')
+
+    def test_pick_cheapest(self):
+        """
+        Test that the fastest mode within tolerance wins, and fp32 when none qualifies.
+        """
+        reports = [
+            {'mode': 'fp32', 'latency_ms_median': 30.0, 'similarity': 1.0},
+            {'mode': 'int8', 'latency_ms_median': 12.0, 'similarity': 0.95},
+            {'mode': 'bf16', 'latency_ms_median': 8.0, 'similarity': 0.7},
+        ]
+        self.assertEqual(inference_modes.pick_cheapest(reports, min_similarity=0.9), 'int8')
+        self.assertEqual(inference_modes.pick_cheapest(reports, min_similarity=0.5), 'bf16')
+        self.assertEqual(inference_modes.pick_cheapest([], min_similarity=0.9), 'fp32')
+        self.assertEqual(inference_modes.pick_cheapest(reports[1:], min_similarity=0.99), 'fp32')
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_snapshot_round_trip(self):
+        """
+        Test that a restored snapshot answers like the original, and compiled models save without their compiled forward.
+        """
+        from benchmarks import build_tiny_checkpoint
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint, path = os.path.join(directory, "tiny"), os.path.join(directory, "lm.pt")
+            build_tiny_checkpoint(checkpoint)
+            original = LanguageModel(checkpoint)
+            original.save_snapshot(path)
+            restored = LanguageModel.from_snapshot(path)
+
+            self.assertEqual(restored.model_name, checkpoint)
+            self.assertFalse(restored.model.training)
+            query = "Where is the nearest subway station?"
+            self.assertEqual(restored.generate_response(query), original.generate_response(query))
+
+            compiled = LanguageModel(checkpoint, compile=True)
+            compiled_forward = compiled.model.forward
+            compiled.save_snapshot(path)
+            self.assertIs(compiled.model.forward, compiled_forward)
+            self.assertNotIn('forward', vars(LanguageModel.from_snapshot(path).model))
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_memory_budget_eviction(self):
+        """
+        Test that least recently used entries are evicted once the byte budget is exceeded.
+        """
+        cache = LRUCache(max_entries=10, max_bytes=10, size_fn=len)
+        cache.put("a", "xxxx")
+        cache.put("b", "xxxx")
+        cache.get("a")
+        cache.put("c", "xxxx")
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.total_bytes, 8)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_entries_expire_after_ttl(self):
+        """
+        Test that entries are served until their time-to-live runs out.
+        """
+        now = [0.0]
+        cache = TTLCache(ttl=10, clock=lambda: now[0])
+        cache.put("key", "value")
+
+        now[0] = 9.0
+        self.assertEqual(cache.get("key"), "value")
+        now[0] = 10.0
+        self.assertIsNone(cache.get("key"))
+
+    def test_disk_tier_survives_restart(self):
+        """
+        Test that results persisted on disk are served by a fresh cache instance.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "results.sqlite")
+            key = canonical_key("What is special here?", {"landmark": "Bryant Park", "radius": 1})
+            cache = TTLCache(ttl=60, path=path)
+            cache.put(key, "A park in Midtown.")
+            cache.close()
+
+            restarted = TTLCache(ttl=60, path=path)
+            same_key = canonical_key("What is special here?", {"radius": 1, "landmark": "Bryant Park"})
+            self.assertEqual(restarted.get(same_key), "A park in Midtown.")
+
+            restarted.invalidate(same_key)
+            restarted.close()
+            cache = TTLCache(ttl=60, path=path)
+            self.assertIsNone(cache.get(key))
+            cache.close()
+
+    def test_disk_tier_purges_expired_and_oldest_rows(self):
+        """
+        Test that periodic purges drop expired rows and keep the newest max_entries.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            disk = DiskCache(os.path.join(tmpdir, "results.sqlite"), max_entries=3, purge_every=5)
+            disk.put("expired", "old", expires=5.0, now=0.0)
+            for i in range(3):
+                disk.put(f"key{i}", i, expires=100.0, now=0.0)
+            self.assertEqual(len(disk), 4)
+            disk.put("key3", 3, expires=100.0, now=10.0)  # fifth write: purge
+
+            self.assertEqual(len(disk), 3)
+            self.assertIsNone(disk.get("expired"))
+            self.assertIsNone(disk.get("key0"))
+            self.assertEqual(disk.get("key3", now=10.0), (3, 100.0))
+            disk.put("key4", 4)
+            self.assertEqual(disk.purge(now=10.0), 1)
+            disk.close()
+
+
+class TestCachedTwist(unittest.TestCase):
+
+    def test_each_distinct_prefix_is_evaluated_once_per_context(self):
+        """
+        Test that duplicates and repeated prefixes are served from the trie, per context.
+        """
+        evaluated = []
+
+        def twist(prefixes, context):
+            evaluated.append(len(prefixes))
+            return np.asarray(prefixes).sum(axis=1) * context["scale"]
+
+        cached = CachedTwist(twist)
+        tokens = np.array([[0, 5, 7], [0, 5, 7], [0, 5, 8], [0, 5, 7]])
+        np.testing.assert_array_equal(cached(tokens, {"scale": 1.0}), [12, 12, 13, 12])
+        np.testing.assert_array_equal(cached(tokens[::-1], {"scale": 1.0}), [12, 13, 12, 12])
+        np.testing.assert_array_equal(cached(tokens, {"scale": 2.0}), [24, 24, 26, 24])
+
+        self.assertEqual(evaluated, [2, 2])
+        self.assertEqual(cached.stats()["contexts"], 2)
+
+    def test_torch_module_twists_are_batched(self):
+        """
+        Test that module twists receive LongTensor batches no larger than batch_size.
+        """
+        class LastTokenTwist(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.scale = torch.nn.Parameter(torch.tensor(0.5))
+                self.batches = []
+
+            def forward(self, tokens):
+                self.batches.append(tuple(tokens.shape))
+                return (tokens[:, -1:].float() * self.scale)
+
+        module = LastTokenTwist()
+        cached = CachedTwist(module, batch_size=2)
+        values = cached(np.array([[1, 2], [1, 4], [1, 6], [1, 2]]))
+
+        np.testing.assert_allclose(values, [1.0, 2.0, 3.0, 1.0])
+        self.assertEqual(module.batches, [(2, 2), (1, 2)])
+
+    def test_trie_evicts_least_recently_used_prefixes(self):
+        """
+        Test that exceeding the node budget prunes the stalest branches first.
+        """
+        trie = PrefixTrie(max_nodes=6, prune_fraction=0.7)
+        trie.put((1, 2, 3), 0.1)
+        trie.put((4, 5, 6), 0.2)
+        self.assertEqual(trie.get((1, 2, 3)), 0.1)
+        trie.put((7,), 0.3)
+
+        self.assertEqual(len(trie), 4)
+        self.assertEqual(trie.get((1, 2, 3)), 0.1)
+        self.assertIsNone(trie.get((4, 5, 6)))
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def run_with_batcher(self, scenario, process_batch, **kwargs):
+        async def main():
+            batcher = MicroBatcher(process_batch, **kwargs)
+            batcher.start()
+            try:
+                return await scenario(batcher)
+            finally:
+                await batcher.stop()
+        return asyncio.run(main())
+
+    def test_concurrent_requests_are_coalesced(self):
+        """
+        Test that concurrent submits share batches and each gets its own result back.
+        """
+        sizes = []
+
+        def process(payloads):
+            sizes.append(len(payloads))
+            return [p * 2 for p in payloads]
+
+        async def scenario(batcher):
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+        results = self.run_with_batcher(scenario, process, max_batch_size=4, max_wait_ms=50)
+        self.assertEqual(results, [i * 2 for i in range(10)])
+        self.assertEqual(sizes, [4, 4, 2])
+
+    def test_backpressure_and_deadlines(self):
+        """
+        Test that a full queue refuses requests and late requests fail with their deadline.
+        """
+        release = threading.Event()
+
+        def process(payloads):
+            release.wait(1.0)
+            return payloads
+
+        async def scenario(batcher):
+            loop = asyncio.get_running_loop()
+            first = asyncio.ensure_future(batcher.submit("busy"))
+            await asyncio.sleep(0.05)  # the worker is now blocked on the first batch
+            queued = asyncio.ensure_future(batcher.submit("late", deadline=loop.time() + 0.05))
+            await asyncio.sleep(0)
+            with self.assertRaises(Overloaded):
+                await batcher.submit("refused")
+            with self.assertRaises(DeadlineExceeded):
+                await queued
+            release.set()
+            return await first
+
+        self.assertEqual(self.run_with_batcher(scenario, process, max_batch_size=1, max_queue=1), "busy")
+
+
+class TestQueryServer(unittest.TestCase):
+
+    class EchoModel:
+        # Stand-in exposing the LanguageModel methods the server calls
+        def __init__(self):
+            self.result_cache = LRUCache()
+            self.batches = []
+
+        def interpret_with_context_batch(self, queries, contexts):
+            self.batches.append(len(queries))
+            return [LanguageModel.contextual_query(q, c) for q, c in zip(queries, contexts)]
+
+        def get_weighted_interpretations(self, query, num_particles=16, context=None):
+            return [[query, float(num_particles)]]
+
+    def test_http_requests_are_batched(self):
+        """
+        Test concurrent HTTP clients get their own answers from shared generate batches.
+        """
+        model = self.EchoModel()
+
+        async def post(port, body):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            payload = json.dumps(body).encode()
+            writer.write(b"POST /interpret HTTP/1.1\r\nConnection: close\r\n"
+                         + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+            response = await reader.read()
+            writer.close()
+            status = int(response.split(b" ", 2)[1])
+            return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+        async def main():
+            server = await QueryServer(model, port=0, max_batch_size=8, max_wait_ms=50).start()
+            try:
+                bodies = [{"query": f"q{i}", "context": {"landmark": "Bryant Park"}} for i in range(5)]
+                responses = await asyncio.gather(*(post(server.port, body) for body in bodies))
+                bad = await post(server.port, {"context": {}})
+                return responses, bad
+            finally:
+                await server.close()
+
+        responses, bad = asyncio.run(main())
+        self.assertEqual(responses, [(200, {"interpretation": f"q{i} about Bryant Park"}) for i in range(5)])
+        self.assertEqual(model.batches, [5])
+        self.assertEqual(bad[0], 400)
+
+    def test_invalid_parameters_are_rejected_and_particles_clamped(self):
+        """
+        Test that malformed deadline_ms/num_particles get a 400 and num_particles is capped.
+        """
+        model = self.EchoModel()
+
+        async def main():
+            server = QueryServer(model, port=0, max_particles=32)
+            await server.start()
+            try:
+                return [
+                    await server.handle('/interpret', {"query": "q", "deadline_ms": "soon"}),
+                    await server.handle('/interpret', {"query": "q", "deadline_ms": -5}),
+                    await server.handle('/interpret/weighted', {"query": "q", "num_particles": "many"}),
+                    await server.handle('/interpret/weighted', {"query": "q", "num_particles": 0}),
+                    await server.handle('/interpret/weighted', {"query": "q", "num_particles": 10 ** 9}),
+                ]
+            finally:
+                await server.close()
+
+        responses = asyncio.run(main())
+        self.assertEqual([status for status, _ in responses], [400, 400, 400, 400, 200])
+        self.assertEqual(responses[-1][1], {"interpretations": [["q", 32.0]]})
+
+    def test_bad_context_does_not_fail_its_batch(self):
+        """
+        Test that a non-object context gets a 400 while a request batched alongside it succeeds.
+        """
+        model = self.EchoModel()
+
+        async def main():
+            server = await QueryServer(model, port=0, max_batch_size=8, max_wait_ms=50).start()
+            try:
+                return await asyncio.gather(
+                    server.handle('/interpret', {"query": "q", "context": {"landmark": "Bryant Park"}}),
+                    server.handle('/interpret', {"query": "q", "context": "landmark"}),
+                    server.handle('/interpret', {"query": "q", "context": ["landmark"]}),
+                )
+            finally:
+                await server.close()
+
+        good, bad_string, bad_list = asyncio.run(main())
+        self.assertEqual(good, (200, {"interpretation": "q about Bryant Park"}))
+        self.assertEqual((bad_string[0], bad_list[0]), (400, 400))
+        self.assertEqual(LanguageModel.contextual_query("q", "landmark"), "q")
+
+
 if __name__ == "__main__":
     unittest.main()
 
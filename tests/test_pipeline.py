@@ -0,0 +1,74 @@
+import queue
+import time
+import unittest
+from pipeline import DropOldestQueue, Pipeline, Stage
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_drop_oldest_under_backpressure(self):
+        """
+        Test that a full queue discards its oldest items so readers see the freshest data.
+        """
+        q = DropOldestQueue(maxsize=2)
+        for i in range(5):
+            q.put(i)
+
+        self.assertEqual(q.dropped, 3)
+        self.assertEqual([q.get(timeout=0), q.get(timeout=0)], [3, 4])
+        with self.assertRaises(queue.Empty):
+            q.get(timeout=0.01)
+
+    def test_clean_shutdown(self):
+        """
+        Test that stop() ends every stage thread, and that an exhausted source stops the pipeline.
+        """
+        seen = []
+        pipeline = Pipeline()
+        frames = pipeline.queue('frames')
+        pipeline.add_stage('source', lambda: time.sleep(0.001) or 1, outbox=frames)
+        pipeline.add_stage('sink', seen.append, inbox=frames)
+        pipeline.start()
+        deadline = time.monotonic() + 5
+        while not seen and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.stop(timeout=5)
+
+        self.assertTrue(seen)
+        self.assertFalse(pipeline.running)
+        self.assertFalse(any(stage.is_alive() for stage in pipeline.stages))
+        self.assertTrue(all(stage.error is None for stage in pipeline.stages))
+
+        items = iter(range(3))
+        pipeline = Pipeline()
+        pipeline.add_stage('source', lambda: next(items, None))
+        pipeline.start()
+        pipeline.stages[0].join(5)
+        self.assertFalse(pipeline.running)
+        self.assertEqual(pipeline.report()['source']['processed'], 4)  # three items, then the end of stream
+
+    def test_raising_stage_skips_the_item_and_keeps_running(self):
+        """
+        Test that an exception in a processing stage is recorded without killing its thread.
+        """
+        inbox, outbox = queue.Queue(), queue.Queue()
+
+        def invert(item):
+            return 1 / item
+
+        stage = Stage('invert', invert, inbox=inbox, outbox=outbox, poll_interval=0.01)
+        stage.start()
+        for item in (1, 0, 2):
+            inbox.put(item)
+
+        self.assertEqual([outbox.get(timeout=5), outbox.get(timeout=5)], [1.0, 0.5])
+        self.assertTrue(stage.is_alive())
+        self.assertIsInstance(stage.error, ZeroDivisionError)
+        self.assertEqual(stage.stats.summary()['errors'], 1)
+        stage.stop_event.set()
+        stage.join(5)
+        self.assertFalse(stage.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
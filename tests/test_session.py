@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from session import FRAME, GPS_FIX, QUERY, ReplaySource, SessionReader, SessionRecorder
+
+
+def record_walk(path, codec='raw', num_frames=5):
+    # Frames every 100 ms, a fix every other frame and one query mid-walk
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(24, 32, 3), dtype=np.uint8) for _ in range(num_frames)]
+    with SessionRecorder(path, codec=codec) as recorder:
+        for i, frame in enumerate(frames):
+            if i % 2 == 0:
+                recorder.add_fix((40.0 + i / 1000, -73.0), timestamp=0.1 * i)
+            if i == 2:
+                recorder.add_query("what is that tower", timestamp=0.1 * i)
+            recorder.add_frame(frame, timestamp=0.1 * i + 0.01)
+    return frames
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "walk.session")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_through_memory_map(self):
+        """
+        Test that frames, fixes and queries read back unchanged and in recorded order.
+        """
+        frames = record_walk(self.path, codec='png')
+        reader = SessionReader(self.path)
+
+        self.assertTrue(reader.complete)
+        self.assertEqual(len(reader), len(frames))
+        for i, frame in enumerate(frames):
+            np.testing.assert_array_equal(reader.frame(i), frame)
+        self.assertEqual(reader.queries, [(0.2, "what is that tower")])
+        self.assertEqual(reader.location_at(0.35), (40.002, -73.0))
+        self.assertIsNone(reader.location_at(-1.0))
+        self.assertEqual([kind for _, kind, _ in reader.events()][:4], [GPS_FIX, FRAME, FRAME, GPS_FIX])
+
+    def test_unfinished_recording_is_recovered(self):
+        """
+        Test that a file whose recorder never closed is read by scanning, minus the cut-off record.
+        """
+        recorder = SessionRecorder(self.path, codec='raw')
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+        for i in range(3):
+            recorder.add_frame(frame + i, timestamp=float(i))
+        recorder._file.flush()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x00' * 10)  # a record header cut short
+        reader = SessionReader(self.path)
+
+        self.assertFalse(reader.complete)
+        self.assertEqual(len(reader), 3)
+        np.testing.assert_array_equal(reader.frame(2), frame + 2)
+        recorder.close()
+
+    def test_replay_is_deterministic_and_paced(self):
+        """
+        Test that replays deliver identical events in order, at recorded pace or as fast as possible.
+        """
+        frames = record_walk(self.path)
+        reader = SessionReader(self.path)
+
+        def replay(speed, clock=None):
+            queries, seen = [], []
+            source = ReplaySource(reader, speed=speed, on_query=queries.append,
+                                  **({'clock': clock, 'sleep': clock.sleep} if clock else {}))
+            while True:
+                ok, frame = source.read()
+                if not ok:
+                    return seen, queries
+                seen.append((frame.copy(), source.get_location(), len(queries)))
+
+        fast, fast_queries = replay(None)
+        clock = FakeClock()
+        paced, paced_queries = replay(2.0, clock)
+
+        self.assertEqual(len(fast), len(frames))
+        self.assertEqual(fast_queries, paced_queries)
+        for (a, location_a, queries_a), (b, location_b, queries_b), frame in zip(fast, paced, frames):
+            np.testing.assert_array_equal(a, frame)
+            np.testing.assert_array_equal(b, frame)
+            self.assertEqual((location_a, queries_a), (location_b, queries_b))
+        self.assertEqual([queries for _, _, queries in fast], [0, 0, 1, 1, 1])
+        # Twice real time: the last frame (recorded at 0.41 s) is due 0.205 s after the first event
+        self.assertAlmostEqual(clock.now, 0.205)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,295 @@
+import unittest
+import numpy as np
+from nlp.twisted_smc import TwistedSMC
+from nlp.resampling import RESAMPLERS, effective_sample_size
+from nlp.particles import ParticleStore
+from nlp.parallel_smc import ParallelTwistedSMC
+from nlp.warm_start import ContextChangeDetector, MetropolisMove, WarmStartSMC, context_distance
+
+
+class IdentityProposal:
+    def sample(self, num_particles, initial_state):
+        return [initial_state + i for i in range(num_particles)]
+
+
+class TestTwistedSMC(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a small SMC engine with an identity twist for each test.
+        """
+        np.random.seed(0)
+        self.smc = TwistedSMC(
+            num_particles=8,
+            proposal_dist=IdentityProposal(),
+            twist_function=lambda particles, context: particles
+        )
+        self.smc.initialize_particles(0)
+
+    def test_compute_weights_normalized(self):
+        """
+        Test that weights from the scalar likelihood adapter sum to one.
+        """
+        weights = self.smc.compute_weights(self.smc.particles, context={})
+
+        self.assertEqual(weights.shape, (8,))
+        self.assertAlmostEqual(weights.sum(), 1.0)
+
+    def test_log_weights_do_not_underflow(self):
+        """
+        Test that very small likelihoods are normalized in log-space without underflow.
+        """
+        self.smc.log_likelihood_fn = lambda particles, context: -1000.0 - np.arange(len(particles))
+        weights = self.smc.compute_weights(self.smc.particles, context={})
+
+        self.assertTrue(np.all(np.isfinite(weights)))
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertEqual(np.argmax(weights), 0, "The least unlikely particle should carry the most weight.")
+
+    def test_incremental_weights_accumulate(self):
+        """
+        Test that log-weight increments accumulate across updates along with the evidence.
+        """
+        self.smc.log_likelihood_fn = lambda particles, context: np.log(np.arange(1, len(particles) + 1))
+        self.smc.compute_weights(self.smc.particles, context={})
+        weights = self.smc.compute_weights(self.smc.particles, context={})
+
+        expected = np.arange(1, 9) ** 2
+        np.testing.assert_allclose(weights, expected / expected.sum())
+        self.assertGreater(self.smc.log_evidence, 0.0)
+
+    def test_resample_only_below_ess_threshold(self):
+        """
+        Test that uniform weights skip resampling while degenerate weights trigger it.
+        """
+        self.smc.log_likelihood_fn = lambda particles, context: np.zeros(len(particles))
+        diagnostics = self.smc.step(context={})
+        self.assertFalse(diagnostics['resampled'])
+        self.assertAlmostEqual(diagnostics['ess'], 8.0)
+
+        self.smc.log_likelihood_fn = lambda particles, context: np.where(np.arange(len(particles)) == 3, 0.0, -50.0)
+        diagnostics = self.smc.step(context={})
+        self.assertTrue(diagnostics['resampled'])
+        self.assertEqual(self.smc.resample_count, 1)
+        np.testing.assert_array_equal(self.smc.particles, np.full(8, 3))
+
+    def test_iterate_yields_summary_per_step(self):
+        """
+        Test that anytime inference yields a posterior summary after every step.
+        """
+        self.smc.log_likelihood_fn = lambda particles, context: -np.abs(particles - 5.0)
+        self.smc.ess_threshold = 0.0  # keep the weights informative
+        summaries = list(self.smc.iterate(context={}, num_steps=3, top_k=2))
+
+        self.assertEqual([summary['step'] for summary in summaries], [1, 2, 3])
+        self.assertEqual(summaries[0]['top'][0][0], 5, "The particle at the target should rank first.")
+        self.assertAlmostEqual(sum(weight for _, weight in self.smc.summary(top_k=8)['top']), 1.0)
+        self.assertEqual(summaries[-1]['log_evidence'], self.smc.log_evidence)
+
+    def test_run_until_stops_before_deadline(self):
+        """
+        Test that a deadline stops inference before a step that would overrun it.
+        """
+        now = [0.0]
+
+        def slow_twist(particles, context):
+            now[0] += 1.0  # every step takes one second
+            return particles
+
+        self.smc.twist_function = slow_twist
+        summary = self.smc.run_until(deadline=2.5, context={}, clock=lambda: now[0])
+
+        self.assertEqual(summary['step'], 2, "A third step would finish after the deadline.")
+        self.assertTrue(summary['timed_out'])
+        self.assertLessEqual(now[0], 2.5)
+        self.assertFalse(self.smc.run_until(deadline=100.0, context={}, max_steps=2, clock=lambda: now[0])['timed_out'])
+
+
+class GaussianProposal:
+    def sample(self, num_particles, initial_state):
+        return initial_state + np.random.default_rng(1).normal(size=(num_particles, 2))
+
+
+def drift(particles, context):
+    return particles + 0.1 * np.sin(particles)
+
+
+def gaussian_log_likelihood(particles, context):
+    return -0.5 * np.sum((particles - context['target']) ** 2, axis=1)
+
+
+def noisy(particles, context):
+    # Module level, so worker processes can unpickle it under the spawn start method
+    return particles + np.random.normal(scale=0.5, size=particles.shape)
+
+
+class IndexProposal:
+    def sample(self, num_particles, initial_state):
+        # Particle i starts out as the value i, and stays there: its value names its origin
+        return np.arange(num_particles, dtype=float).reshape(-1, 1)
+
+
+def stay(particles, context):
+    return particles
+
+
+def favour_even(particles, context):
+    return np.where(particles[:, 0] % 2 == 0, 0.0, -3.0)
+
+
+class TestParallelTwistedSMC(unittest.TestCase):
+
+    def run_smc(self, smc, steps=6):
+        with smc:
+            smc.initialize_particles(0.0)
+            for _ in range(steps):
+                smc.step({'target': 1.0})
+            return smc.particles.copy(), smc.log_evidence, smc.resample_count
+
+    def test_global_mode_matches_serial_smc(self):
+        """
+        Test that sharded global-barrier SMC reproduces the single-process result.
+        """
+        serial = TwistedSMC(32, GaussianProposal(), drift, gaussian_log_likelihood)
+        serial.rng = np.random.default_rng(np.random.SeedSequence(7).spawn(1)[0])
+        serial.initialize_particles(0.0)
+        for _ in range(6):
+            serial.step({'target': 1.0})
+
+        particles, log_evidence, resample_count = self.run_smc(
+            ParallelTwistedSMC(32, GaussianProposal(), drift, gaussian_log_likelihood, num_workers=3, seed=7))
+        np.testing.assert_allclose(particles, serial.particles)
+        self.assertAlmostEqual(log_evidence, serial.log_evidence)
+        self.assertEqual(resample_count, serial.resample_count)
+
+    def test_island_mode_is_reproducible(self):
+        """
+        Test that island runs with random moves repeat exactly under a fixed seed.
+        """
+        runs = [self.run_smc(ParallelTwistedSMC(32, GaussianProposal(), noisy, gaussian_log_likelihood,
+                                                num_workers=2, mode='island', exchange_interval=2, seed=3))
+                for _ in range(2)]
+        np.testing.assert_array_equal(runs[0][0], runs[1][0])
+        self.assertEqual(runs[0][1], runs[1][1])
+        self.assertGreaterEqual(runs[0][2], 3, "Every exchange resamples the pooled islands.")
+
+    def test_island_resampling_is_recorded_in_lineages(self):
+        """
+        Test that ancestors chosen inside the workers and at exchanges trace back to each particle's origin.
+        """
+        with ParallelTwistedSMC(16, IndexProposal(), stay, favour_even, num_workers=2, mode='island',
+                                exchange_interval=3, seed=5, ess_threshold=1.0) as smc:
+            smc.initialize_particles(None)
+            history = [smc.step({}) for _ in range(4)]
+            np.testing.assert_array_equal(smc.store.origins(), smc.particles[:, 0])
+            lineage = smc.store.lineage()
+        self.assertTrue(history[0]['resampled'] and not history[0]['exchanged'])
+        self.assertEqual(lineage.shape, (5, 16))
+        # Islands resample locally: before the first exchange no particle crosses its shard
+        self.assertTrue(np.all((lineage[0] < 8) == (lineage[2] < 8)))
+
+
+class UniformProposal:
+    def sample(self, num_particles, initial_state):
+        return np.random.default_rng(0).uniform(-10, 10, size=(num_particles, 2))
+
+
+def location_log_likelihood(particles, context):
+    return -0.5 * np.sum((particles - context['location']) ** 2, axis=1) / 0.3 ** 2
+
+
+class TestWarmStartSMC(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        smc = TwistedSMC(1000, UniformProposal(),
+                         lambda particles, context: particles + np.random.normal(scale=0.15, size=particles.shape),
+                         location_log_likelihood)
+        move = MetropolisMove(location_log_likelihood, lambda p, rng: p + rng.normal(scale=0.05, size=p.shape),
+                              rng=np.random.default_rng(1))
+        self.warm = WarmStartSMC(smc, detector=ContextChangeDetector(0.5, scales={'location': 1.0}), move=move,
+                                 cold_steps=8, warm_steps=1, warm_particles=100)
+
+    def test_small_changes_reuse_a_smaller_population(self):
+        """
+        Test that a slowly moving context is tracked by warm one-step updates.
+        """
+        location = np.array([1.0, 1.0])
+        self.assertEqual(self.warm.update({'location': tuple(location)})['reset'], 'initial')
+        for _ in range(10):
+            location += 0.05
+            summary = self.warm.update({'location': tuple(location)})
+            self.assertIsNone(summary['reset'])
+            self.assertEqual(summary['steps'], 1)
+
+        smc = self.warm.smc
+        self.assertEqual(smc.num_particles, 100)
+        estimate = np.average(smc.particles, axis=0, weights=smc.weights)
+        self.assertLess(np.linalg.norm(estimate - location), 0.3)
+        self.assertGreater(self.warm.move.acceptance_rate, 0.0)
+
+    def test_scene_changes_reset_the_population(self):
+        """
+        Test that a jump in any context entry restarts from the full population.
+        """
+        self.warm.update({'location': (1.0, 1.0), 'landmarks': ['Bryant Park']})
+        summary = self.warm.update({'location': (6.0, -3.0), 'landmarks': ['Bryant Park']})
+        self.assertEqual(summary['reset'], 'location')
+        self.assertEqual(summary['steps'], 8)
+        self.assertEqual(self.warm.update({'location': (6.0, -3.0), 'landmarks': ['Times Square']})['reset'],
+                         'landmarks')
+        self.assertEqual(self.warm.resets, 3)
+        self.assertAlmostEqual(context_distance({'landmarks': ['a', 'b']}, {'landmarks': ['b', 'c']})['landmarks'], 2 / 3)
+
+
+class TestResampling(unittest.TestCase):
+
+    def test_resamplers_preserve_expected_counts(self):
+        """
+        Test that every strategy returns N valid indices with counts close to N * w.
+        """
+        rng = np.random.default_rng(0)
+        weights = np.array([0.5, 0.25, 0.125, 0.125])
+        for name, resampler in RESAMPLERS.items():
+            indices = resampler(weights, 1000, rng)
+            self.assertEqual(len(indices), 1000, name)
+            counts = np.bincount(indices, minlength=4)
+            np.testing.assert_allclose(counts / 1000, weights, atol=0.05, err_msg=name)
+
+    def test_effective_sample_size(self):
+        """
+        Test ESS at the uniform and fully degenerate extremes.
+        """
+        self.assertAlmostEqual(effective_sample_size(np.full(10, 0.1)), 10.0)
+        self.assertAlmostEqual(effective_sample_size(np.eye(10)[0]), 1.0)
+
+
+class TestParticleStore(unittest.TestCase):
+
+    def test_structured_particles_gather_by_field(self):
+        """
+        Test that dict particles become per-field arrays and resample by index gather.
+        """
+        store = ParticleStore([{"token": t, "score": float(t)} for t in range(4)])
+        store.resample([3, 3, 1, 0])
+
+        np.testing.assert_array_equal(store.data["token"], [3, 3, 1, 0])
+        np.testing.assert_array_equal(store.data["score"], [3.0, 3.0, 1.0, 0.0])
+        self.assertEqual(store.particle(2), {"token": 1, "score": 1.0})
+
+    def test_lineage_and_paths(self):
+        """
+        Test that ancestor indices reconstruct lineages and paths across generations.
+        """
+        store = ParticleStore(np.arange(4), keep_history=True)
+        store.resample([1, 1, 2, 3])
+        store.advance(store.data * 10)
+        store.resample([0, 2, 2, 3])
+
+        np.testing.assert_array_equal(store.lineage(), [[0, 2, 2, 3], [0, 1, 2, 3]])
+        np.testing.assert_array_equal(store.origins(), [1, 2, 2, 3])
+        self.assertEqual([int(x) for x in store.path(1)], [2, 20])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+from startup import LazyComponent, StartupTimer
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_concurrent_get_builds_once(self):
+        """
+        Test that callers racing on get() all wait for a single build and share its result.
+        """
+        builds = []
+
+        def factory():
+            builds.append(threading.current_thread().name)
+            time.sleep(0.05)
+            return object()
+
+        component = LazyComponent("model", factory)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(component.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertTrue(component.ready)
+
+    def test_failed_warm_up_is_retried_by_get(self):
+        """
+        Test that a background build failure is not cached: get() builds again and raises if that fails too.
+        """
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("weights not found")
+            return "model"
+
+        component = LazyComponent("model", factory)
+        component.warm()._thread.join(5)
+        self.assertFalse(component.ready)
+        with self.assertRaises(RuntimeError):
+            component.get()
+        self.assertEqual(component.get(), "model")
+        self.assertEqual(len(attempts), 3)
+
+    def test_phases_and_milestones_are_recorded(self):
+        """
+        Test that builds are timed as phases and only the first mark of a milestone counts.
+        """
+        timer = StartupTimer()
+        with timer.phase("load config"):
+            time.sleep(0.01)
+        LazyComponent("tracker", lambda: "tracker", timer=timer).get()
+        timer.mark("time to first frame")
+        first = timer.milestones["time to first frame"]
+        timer.mark("time to first frame")
+        report = timer.report()
+
+        self.assertEqual(set(report['phases']), {"load config", "build tracker"})
+        self.assertGreaterEqual(report['phases']["load config"], 0.01)
+        self.assertEqual(report['milestones'], {"time to first frame": first})
+
+
+if __name__ == "__main__":
+    unittest.main()